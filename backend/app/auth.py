@@ -1,33 +1,34 @@
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from .hashing import pwd_context
 
 # 👉 Load .env from the backend folder explicitly
 BASE_DIR = Path(__file__).resolve().parent.parent  # points to .../backend
 env_path = BASE_DIR / ".env"
 load_dotenv(dotenv_path=env_path)
 
-print("ENV PATH:", env_path)
-print("ENV EXISTS:", env_path.exists())
-
 SECRET_KEY = os.getenv("SECRET_KEY")
-print("SK =", SECRET_KEY)
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
+# Tokens that may appear in a URL (?access_token= on EventSource streams) are
+# short-lived and carry this scope; they are not accepted anywhere else
+STREAM_SCOPE = "stream"
+STREAM_TOKEN_EXPIRE_MINUTES = int(os.getenv("STREAM_TOKEN_EXPIRE_MINUTES", "5"))
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
+# Synchronous helpers; request handlers use the hashing pool instead
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# jose is imported on first use to keep it out of worker start-up
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -37,6 +38,8 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str):
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -0,0 +1,126 @@
+"""
+Block representation of section content, shared by the LLM cleaner, both
+exporters and the streaming DOCX writer.
+
+Provider output is read once, line by line, into a tuple of Blocks
+(headings, paragraphs, bullets, numbered items), each holding runs of text
+with bold/italic flags. Section content is stored as the canonical light
+markdown written by to_markdown(), so parsing it again gives the same blocks;
+parse() is memoised on the content string, so exporting a project does not
+re-parse sections that have not changed.
+
+Only unambiguous markdown is recognised: `#` needs a following space to be a
+heading and `*` must hug its text, with no word character or `*` outside it,
+to be emphasis, so "C#", "5 * 3", "2*3*4", "f(*args, **kwargs)" and
+snake_case names come through untouched.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+
+BOLD = 1
+ITALIC = 2
+
+HEADING = "heading"
+PARAGRAPH = "paragraph"
+BULLET = "bullet"
+NUMBER = "number"
+
+_HEADING = re.compile(r"(#{1,6})\s+(.*?)(?:\s+#+)?$")
+_BULLET = re.compile(r"[-*•+]\s+(.*)$")
+_NUMBER = re.compile(r"(\d{1,3})[.)]\s+(.*)$")
+_RULE = re.compile(r"(?:-{3,}|\*{3,}|_{3,})$")
+# Markers must hug their text and not touch a word character or another `*`
+# on the outside. frontend/src/components/SectionContent.js uses the same
+# patterns (tests/test_blocks.py checks); keep them in step.
+_EMPHASIS = re.compile(
+    r"(?<![\w*])\*\*\*(?=\S)(.+?)(?<=\S)\*\*\*(?![\w*])"    # bold italic
+    r"|(?<![\w*])\*\*(?=\S)(.+?)(?<=\S)\*\*(?![\w*])"       # bold
+    r"|(?<![\w*])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![\w*])"   # italic
+)
+TAB_SIZE = 4  # a tab-indented bullet is nested
+_MARKERS = {0: "", BOLD: "**", ITALIC: "*", BOLD | ITALIC: "***"}
+
+
+class Block(NamedTuple):
+    kind: str
+    runs: tuple     # ((text, style flags), ...)
+    level: int = 0  # heading level (1-3), bullet depth (0-1) or item number
+
+    @property
+    def text(self) -> str:
+        return "".join(text for text, _ in self.runs)
+
+
+def parse_inline(text: str) -> tuple:
+    """Split a line into (text, style) runs on **bold**, *italic* and ***both***."""
+    runs = []
+    pos = 0
+    for m in _EMPHASIS.finditer(text):
+        if m.start() > pos:
+            runs.append((text[pos:m.start()], 0))
+        if m.group(1) is not None:
+            runs.append((m.group(1), BOLD | ITALIC))
+        elif m.group(2) is not None:
+            runs.append((m.group(2), BOLD))
+        else:
+            runs.append((m.group(3), ITALIC))
+        pos = m.end()
+    if pos < len(text):
+        runs.append((text[pos:], 0))
+    return tuple(runs)
+
+
+def iter_blocks(lines: Iterable[str]):
+    """Yield Blocks for an iterable of lines, e.g. a provider response as it arrives."""
+    for raw in lines:
+        line = raw.strip()
+        if not line or _RULE.match(line):
+            continue
+        m = _HEADING.match(line)
+        if m:
+            yield Block(HEADING, parse_inline(m.group(2)), min(len(m.group(1)), 3))
+            continue
+        m = _BULLET.match(line)
+        if m:
+            indent = len(raw[:len(raw) - len(raw.lstrip())].expandtabs(TAB_SIZE))
+            yield Block(BULLET, parse_inline(m.group(1)), 1 if indent >= 2 else 0)
+            continue
+        m = _NUMBER.match(line)
+        if m:
+            yield Block(NUMBER, parse_inline(m.group(2)), int(m.group(1)))
+            continue
+        yield Block(PARAGRAPH, parse_inline(line))
+
+
+@lru_cache(maxsize=4096)
+def parse(text: str) -> tuple:
+    """Blocks of a section's content (memoised per content string)."""
+    return tuple(iter_blocks((text or "").splitlines()))
+
+
+def _inline_markdown(runs) -> str:
+    return "".join(f"{_MARKERS[style]}{text}{_MARKERS[style]}" for text, style in runs)
+
+
+def to_markdown(blocks) -> str:
+    """Canonical light markdown for blocks; parsing it gives the same blocks back."""
+    lines = []
+    for block in blocks:
+        text = _inline_markdown(block.runs)
+        if block.kind == HEADING:
+            if lines:
+                lines.append("")
+            lines.append(f"{'#' * block.level} {text}")
+        elif block.kind == BULLET:
+            lines.append(f"{'  ' * block.level}- {text}")
+        elif block.kind == NUMBER:
+            lines.append(f"{block.level}. {text}")
+        else:
+            lines.append(text)
+    return "\n".join(lines)
+
+
+def normalize(text: str) -> str:
+    """Provider output as canonical light markdown."""
+    return to_markdown(iter_blocks(text.splitlines()))
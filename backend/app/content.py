@@ -0,0 +1,198 @@
+import json
+import math
+import os
+from dotenv import load_dotenv
+
+from . import images, llm_client, models, metrics
+from .fingerprints import fingerprint
+
+load_dotenv()
+
+# Batched generation: one JSON response covers several sections, sharing the
+# topic/instructions preamble and saving a round trip per section. Used when a
+# project has at least GENERATE_BATCH_MIN_SECTIONS sections; larger projects
+# are split into batches of at most GENERATE_BATCH_MAX_SECTIONS. Sections a
+# batch response leaves out or garbles are generated one by one.
+GENERATE_BATCH = os.getenv("GENERATE_BATCH", "0").lower() in ("1", "true", "yes", "on")
+BATCH_MIN_SECTIONS = int(os.getenv("GENERATE_BATCH_MIN_SECTIONS", "3"))
+BATCH_MAX_SECTIONS = int(os.getenv("GENERATE_BATCH_MAX_SECTIONS", "10"))
+SECTION_MAX_TOKENS = 600
+
+# Bump fingerprints.PROMPT_VERSION when section_prompt / batch_prompt change
+# enough that existing content should be regenerated
+
+
+def section_prompt(project, section) -> str:
+    base_topic = project.topic or project.title
+    return (
+        f"Generate content for a {'slide' if project.doc_type=='pptx' else 'document section'} titled '{section.title}'.\n"
+        f"Main topic: {base_topic}.\n"
+        "Write clear, structured, business-style content. Use bullet points for PPT, paragraphs for DOCX. "
+        "Make it concise but informative."
+    )
+
+
+def image_prompt(project, section) -> str:
+    base_topic = project.topic or project.title
+    return (
+        f"A clean, professional illustration for a {'slide' if project.doc_type=='pptx' else 'document section'} "
+        f"titled '{section.title}' about {base_topic}. No text in the image."
+    )
+
+
+def batch_prompt(project, sections) -> str:
+    base_topic = project.topic or project.title
+    kind = "slide" if project.doc_type == "pptx" else "document section"
+    titles = "\n".join(f"{n}. {s.title}" for n, s in enumerate(sections, 1))
+    return (
+        f"Generate content for each {kind} listed below.\n"
+        f"Main topic: {base_topic}.\n"
+        "Write clear, structured, business-style content. Use bullet points for PPT, paragraphs for DOCX. "
+        "Make each one concise but informative.\n\n"
+        f"{titles}\n\n"
+        "Return ONLY a JSON object mapping each number to that item's content as a string, "
+        'e.g. {"1": "...", "2": "..."}.'
+    )
+
+
+def parse_batch(text: str, count: int) -> dict:
+    """{position (1-based): content} for every well-formed entry of a batch response."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if isinstance(data, list):
+        data = {str(n): value for n, value in enumerate(data, 1)}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for key, value in data.items():
+        try:
+            n = int(str(key).strip().rstrip("."))
+        except ValueError:
+            continue
+        if 1 <= n <= count and isinstance(value, str) and value.strip():
+            # Entries are markdown in their own right; the response as a whole was JSON
+            parsed[n] = llm_client.clean_markdown(value)
+    return parsed
+
+
+def use_batch(sections) -> bool:
+    return GENERATE_BATCH and len(sections) >= BATCH_MIN_SECTIONS
+
+
+def _split(sections, size: int):
+    # Near-equal batches rather than e.g. 10 + 1
+    count = math.ceil(len(sections) / size)
+    per = math.ceil(len(sections) / count)
+    return [sections[i:i + per] for i in range(0, len(sections), per)]
+
+
+def _iter_batched(project, sections, use_cache: bool, heartbeat: float | None):
+    """Yield (section, content, None) for sections a batch call answered; returns the rest."""
+    batches = _split(sections, max(1, BATCH_MAX_SECTIONS))
+    prompts = [batch_prompt(project, b) for b in batches]
+    max_tokens = SECTION_MAX_TOKENS * max(len(b) for b in batches)
+    missing = []
+    for i, text, error in llm_client.iter_llm_many(prompts, max_tokens=max_tokens, use_cache=use_cache,
+                                                   heartbeat=heartbeat, user=project.owner_id):
+        if i is None:
+            yield None, None, None
+            continue
+        parsed = {} if error or llm_client.is_error_response(text) else parse_batch(text, len(batches[i]))
+        for n, s in enumerate(batches[i], 1):
+            if n in parsed:
+                yield s, parsed[n], None
+            else:
+                missing.append(s)
+        outcome = "full" if len(parsed) == len(batches[i]) else ("partial" if parsed else "failed")
+        metrics.generate_batches.inc(outcome)
+    return missing
+
+
+def ordered_sections(project):
+    return sorted(project.sections, key=lambda s: s.order)
+
+
+def stale_sections(project, sections, force: bool = False):
+    """
+    Sections generate should (re)write: empty ones and ones whose inputs changed
+    since their content was generated. Everything with force=True.
+    """
+    if force:
+        stale = list(sections)
+    else:
+        stale = [s for s in sections if not (s.content or "").strip() or s.fingerprint != fingerprint(project, s)]
+    metrics.generate_sections.inc("generated", amount=len(stale))
+    metrics.generate_sections.inc("skipped", amount=len(sections) - len(stale))
+    return stale
+
+
+def apply_generated(project, section, text: str):
+    section.content = text
+    section.fingerprint = fingerprint(project, section)
+
+
+def iter_generate(project, sections, use_cache: bool = True, heartbeat: float | None = None):
+    """
+    Generate sections concurrently, yielding (section, content, error) as each
+    one finishes. Yields (None, None, None) on heartbeat timeouts.
+    """
+    if use_batch(sections):
+        sections = yield from _iter_batched(project, sections, use_cache, heartbeat)
+        if not sections:
+            return
+    prompts = [section_prompt(project, s) for s in sections]
+    for i, text, error in llm_client.iter_llm_many(prompts, use_cache=use_cache, heartbeat=heartbeat, user=project.owner_id):
+        yield (sections[i] if i is not None else None), text, error
+
+
+def generate_sections(project, sections, use_cache: bool = True):
+    """
+    Generate content for every section concurrently.
+    Returns [(section, content, error), ...] in the order given.
+    """
+    results = {id(s): (s, text, error) for s, text, error in iter_generate(project, sections, use_cache)}
+    return [results[id(s)] for s in sections]
+
+
+def image_sections(sections, stale):
+    """Sections that need an image: the ones being regenerated, and any still without one."""
+    stale = {id(s) for s in stale}
+    return [s for s in sections if id(s) in stale or not s.image_id]
+
+
+def start_images(project, sections, use_cache: bool = True) -> list:
+    """Start fetching an image per section in the background (alongside text generation)."""
+    return images.fetch_many([image_prompt(project, s) for s in sections], use_cache=use_cache, user=project.owner_id)
+
+
+def apply_images(sections, futures) -> int:
+    """Wait for start_images and attach the images; returns how many sections got one."""
+    attached = 0
+    for s, future in zip(sections, futures):
+        blob_id = future.result()
+        if blob_id:
+            s.image_id = blob_id
+            attached += 1
+    return attached
+
+
+def refine_prompt(section, instruction: str) -> str:
+    return (
+        f"Original content:\n{section.content}\n\n"
+        f"Instruction: {instruction}\n"
+        "Return ONLY the improved content, without any explanation."
+    )
+
+
+def apply_refinement(section, instruction: str, new_content: str):
+    """Record the refinement in the section's history and replace its content."""
+    section.revisions.add(models.SectionRevision(instruction=instruction, result=new_content))
+    section.content = new_content
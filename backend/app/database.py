@@ -1,21 +1,117 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
+from . import metrics
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Optional replica for read-only endpoints; defaults to the primary database
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or DATABASE_URL
+
+# ---------------- Pool (server databases and file-backed SQLite) ---------------- #
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+
+# ---------------- SQLite pragmas ---------------- #
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def _set_sqlite_pragmas(dbapi_conn, read_only: bool):
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cur.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        # Off by default in SQLite; without it ON DELETE CASCADE does nothing
+        cur.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+    finally:
+        cur.close()
+
+
+def make_engine(url: str, read_only: bool = False):
+    """Engine with the pool settings above, plus pragmas for SQLite."""
+    if not _is_sqlite(url):
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    if _is_memory(url):
+        # Each connection would get its own empty database; keep the defaults
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+        return engine
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(engine, "connect", lambda conn, _: _set_sqlite_pragmas(conn, read_only))
+    return engine
+
+
+engine = make_engine(DATABASE_URL)
+if _is_sqlite(DATABASE_READ_URL) and not _is_memory(DATABASE_READ_URL):
+    # A separate query_only pool on the same file, so readers never queue
+    # behind connections held by writes (WAL lets them run concurrently)
+    read_engine = make_engine(DATABASE_READ_URL, read_only=True)
+elif DATABASE_READ_URL != DATABASE_URL:
+    read_engine = make_engine(DATABASE_READ_URL)
+else:
+    read_engine = engine
+
+metrics.instrument_engine(engine, "primary")
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "read")
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
 def get_db():
     db = SessionLocal()
+    metrics.db_sessions.inc("primary")
+    try:
+        with metrics.db_session_duration.time("primary"):
+            yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """Session for read-only endpoints; may lag the primary when a replica is configured."""
+    db = ReadSessionLocal()
+    metrics.db_sessions.inc("read")
     try:
-        yield db
+        with metrics.db_session_duration.time("read"):
+            yield db
     finally:
         db.close()
@@ -1,28 +1,120 @@
-from fastapi import Depends, HTTPException, status
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, SessionLocal
+from .cache import TTLCache
 from . import models, auth
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Resolved tokens are cached briefly so most requests skip the JWT decode and
+# the users lookup. Entries are dropped early when a user changes password or
+# is deleted (in this process; other workers catch up within the TTL).
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+class Principal(NamedTuple):
+    """The authenticated user as far as most routes care."""
+    id: int
+    email: str
+
+_principals = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+_user_generations = {}  # user id -> bumped on invalidation
+_generations_lock = threading.Lock()
+
+def invalidate_user(user_id: int):
+    """Forget every cached principal for a user."""
+    with _generations_lock:
+        _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
+def _unauthorized(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _user_id_from_token(token: str, scope: Optional[str] = None):
     payload = auth.decode_access_token(token)
     if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-        )
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload",
-        )
+        raise _unauthorized("Invalid or expired token")
+    if payload.get("scope") != scope:
+        raise _unauthorized("Token not valid here")
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        raise _unauthorized("Invalid token payload")
+    return user_id, payload.get("exp")
+
+def _user_from_token(token: str, db: Session):
+    user_id, _ = _user_id_from_token(token)
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
+        raise _unauthorized("User not found")
     return user
+
+def _principal_from_token(token: str, scope: Optional[str] = None) -> Principal:
+    key = (scope, token)
+    cached = _principals.get(key)
+    if cached is not None:
+        principal, generation, expires_at = cached
+        if _user_generations.get(principal.id, 0) == generation and (expires_at is None or expires_at > time.time()):
+            return principal
+        _principals.pop(key)
+
+    user_id, expires_at = _user_id_from_token(token, scope)
+    generation = _user_generations.get(user_id, 0)
+    db = SessionLocal()
+    try:
+        row = db.query(models.User.id, models.User.email).filter(models.User.id == user_id).first()
+    finally:
+        db.close()
+    if not row:
+        raise _unauthorized("User not found")
+
+    principal = Principal(id=row.id, email=row.email)
+    _principals.set(key, (principal, generation, expires_at))
+    return principal
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """The full User row. Prefer get_current_principal when only the id is needed."""
+    return _user_from_token(token, db)
+
+def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Authenticated Principal; served from cache without touching the database."""
+    return _principal_from_token(token)
+
+def get_stream_principal(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+) -> Principal:
+    """
+    For Server-Sent Events routes: like get_current_principal, but also
+    accepts ?access_token= (EventSource can't set headers). Only stream tokens
+    (POST /api/auth/stream-token) work there; login tokens in a URL would end
+    up in access logs and Referer headers.
+    """
+    if token:
+        return _principal_from_token(token)
+    if access_token:
+        return _principal_from_token(access_token, scope=auth.STREAM_SCOPE)
+    raise _unauthorized("Not authenticated")
+
+
+# ---------------- Invalidation ---------------- #
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.hashed_password.history.has_changes() or state.attrs.email.history.has_changes():
+        invalidate_user(target.id)
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate_user(target.id)
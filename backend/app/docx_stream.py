@@ -0,0 +1,208 @@
+"""
+Streaming DOCX writer.
+
+Writes word/document.xml directly into a zip that is emitted in chunks while
+it is being built, instead of building a python-docx object tree and holding
+the saved file in memory. Every other package part (styles, numbering, theme,
+settings) is copied from the same template prototype assemble_docx uses, so
+headings, bullet lists and fonts match.
+"""
+import io
+import itertools
+import re
+import zipfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from . import blocks, images, templates
+
+CHUNK_SIZE = 64 * 1024
+
+# Section images span 6in, the text width of the built-in template
+IMAGE_WIDTH_EMU = 6 * 914400
+_IMAGE_CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png"}
+
+# Characters XML 1.0 does not allow (python-docx rejects them too)
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _template(name: str | None):
+    return _template_parts(name, templates.fingerprint("docx", name))
+
+
+@lru_cache(maxsize=32)
+def _template_parts(name: str | None, fingerprint: str):
+    """(parts, document_head, document_tail) of a template prototype."""
+    with zipfile.ZipFile(io.BytesIO(templates.package_bytes("docx", name))) as zf:
+        parts = [(info.filename, zf.read(info)) for info in zf.infolist() if info.filename != "word/document.xml"]
+        document = zf.read("word/document.xml").decode("utf-8")
+
+    # New paragraphs go after any template body content, before the final sectPr
+    sect = document.rindex("<w:sectPr")
+    return parts, document[:sect].encode("utf-8"), document[sect:].encode("utf-8")
+
+
+def _run(text: str, style: int = 0) -> str:
+    pieces = []
+    for i, chunk in enumerate(_INVALID_XML.sub("", text).split("\t")):
+        if i:
+            pieces.append("<w:tab/>")
+        if chunk:
+            space = ' xml:space="preserve"' if chunk != chunk.strip() else ""
+            pieces.append(f"<w:t{space}>{escape(chunk)}</w:t>")
+    rpr = ""
+    if style:
+        rpr = "<w:rPr>" + ("<w:b/>" if style & blocks.BOLD else "") + ("<w:i/>" if style & blocks.ITALIC else "") + "</w:rPr>"
+    return f"<w:r>{rpr}{''.join(pieces)}</w:r>"
+
+
+def _paragraph(text: str = "", style_id: str | None = None) -> str:
+    ppr = f'<w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>' if style_id else ""
+    if not text:
+        return f"<w:p>{ppr}</w:p>" if ppr else "<w:p/>"
+    return f"<w:p>{ppr}{_run(text)}</w:p>"
+
+
+def _block_xml(block, styles: dict) -> str:
+    # Same styles as assemble_docx
+    if block.kind == blocks.HEADING:
+        style_id = styles["subheading"]
+    elif block.kind == blocks.BULLET:
+        style_id = styles["bullet2" if block.level else "bullet"]
+    else:
+        style_id = None
+    ppr = f'<w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>' if style_id else ""
+    runs = [_run(f"{block.level}. ")] if block.kind == blocks.NUMBER else []
+    runs.extend(_run(text, style) for text, style in block.runs)
+    return f"<w:p>{ppr}{''.join(runs)}</w:p>"
+
+
+def _picture_xml(n: int, rel_id: str, width: int, height: int) -> str:
+    cx = IMAGE_WIDTH_EMU
+    cy = cx * height // width
+    return (
+        '<w:p><w:r><w:drawing>'
+        '<wp:inline distT="0" distB="0" distL="0" distR="0" '
+        'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing">'
+        f'<wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{n}" name="Picture {n}"/>'
+        '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+        '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:nvPicPr><pic:cNvPr id="{n}" name="Picture {n}"/><pic:cNvPicPr/></pic:nvPicPr>'
+        '<pic:blipFill><a:blip r:embed="' + rel_id + '" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"/>'
+        '<a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+        '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+        '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>'
+    )
+
+
+def _section_xml(section, styles: dict, pictures: dict, drawing_ids) -> str:
+    out = [_paragraph(section.title or "Section", styles["heading"])]
+    out.extend(_block_xml(block, styles) for block in blocks.parse(section.content or ""))
+    picture = pictures.get(section.image_id)
+    if picture:
+        out.append(_picture_xml(next(drawing_ids), picture["rel_id"], picture["width"], picture["height"]))
+    out.append(_paragraph())
+    return "".join(out)
+
+
+def _pictures(sections) -> dict:
+    """Page variants of the sections' images, keyed by blob id, with relationship ids and media names."""
+    pictures = {}
+    for s in sections:
+        if s.image_id and s.image_id not in pictures:
+            found = images.variant(s.image_id, "page")
+            if found:
+                path, width, height, fmt = found
+                n = len(pictures) + 1
+                pictures[s.image_id] = {
+                    "rel_id": f"rIdSectionImage{n}", "media": f"word/media/section_image{n}.{fmt}",
+                    "path": path, "width": width, "height": height, "format": fmt,
+                }
+    return pictures
+
+
+def _with_pictures(name: str, data: bytes, pictures: dict) -> bytes:
+    """Add the pictures' relationships and content types to the template parts that declare them."""
+    if name == "word/_rels/document.xml.rels":
+        rels = "".join(
+            f'<Relationship Id="{p["rel_id"]}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+            f'Target="{p["media"][len("word/"):]}"/>'
+            for p in pictures.values()
+        )
+        return data.replace(b"</Relationships>", rels.encode("utf-8") + b"</Relationships>")
+    if name == "[Content_Types].xml":
+        defaults = "".join(
+            f'<Default Extension="{fmt}" ContentType="{_IMAGE_CONTENT_TYPES[fmt]}"/>'
+            for fmt in sorted({p["format"] for p in pictures.values()})
+            if f'Extension="{fmt}"'.encode("utf-8") not in data
+        )
+        return data.replace(b"</Types>", defaults.encode("utf-8") + b"</Types>")
+    return data
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink; zipfile then streams entries with data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_docx(project, sections, template=None, chunk_size: int = CHUNK_SIZE):
+    """Yield the .docx file for a project as byte chunks of roughly `chunk_size`."""
+    parts, head, tail = _template(template)
+    styles = templates.docx_style_ids(template)
+    sections = sorted(sections, key=lambda x: x.order)
+    pictures = _pictures(sections)
+    drawing_ids = itertools.count(1)
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in parts:
+            zf.writestr(name, _with_pictures(name, data, pictures) if pictures else data)
+        if sink.size >= chunk_size:
+            yield sink.drain()
+        for picture in pictures.values():
+            # The stored variant byte for byte; it is compressed already, so deflate lightly
+            zf.write(picture["path"], picture["media"], compresslevel=1)
+            if sink.size >= chunk_size:
+                yield sink.drain()
+
+        with zf.open("word/document.xml", "w") as doc:
+            doc.write(head)
+            doc.write(_paragraph(project.title or "Document", styles["title"]).encode("utf-8"))
+            if project.topic:
+                doc.write(_paragraph(f"Topic: {project.topic}", styles["topic"]).encode("utf-8"))
+                doc.write(_paragraph().encode("utf-8"))
+
+            for s in sections:
+                doc.write(_section_xml(s, styles, pictures, drawing_ids).encode("utf-8"))
+                if sink.size >= chunk_size:
+                    yield sink.drain()
+            doc.write(tail)
+
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def write_docx(project, sections, fp, template=None):
+    """Write the .docx to a binary file object without holding it all in memory."""
+    for chunk in iter_docx(project, sections, template):
+        fp.write(chunk)
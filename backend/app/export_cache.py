@@ -0,0 +1,186 @@
+"""
+On-disk cache of rendered DOCX/PPTX exports.
+
+Entries are keyed by a hash of everything that affects the rendered file
+(project fields, sections and format), which doubles as a strong ETag.
+Files for a project are dropped as soon as its sections change.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from dotenv import load_dotenv
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import models, templates, singleflight
+from .generator import export_format, export_filename, iter_export, MEDIA_TYPES
+
+load_dotenv()
+
+ENABLED = os.getenv("EXPORT_CACHE", "1").lower() not in ("0", "false", "no", "off")
+CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "./export_cache")
+
+# Bump whenever generator output changes so old artifacts stop matching
+RENDER_VERSION = "3"
+
+# Concurrent exports of the same content wait for one render instead of each writing the file
+_flights = singleflight.Group("export")
+
+_RENDER_FIELDS = {
+    models.Project: ("title", "topic", "doc_type"),
+    models.Section: ("title", "content", "order", "project_id", "image_id"),
+}
+
+
+def content_hash(project, sections, fmt: str, template: str | None = None) -> str:
+    payload = [
+        RENDER_VERSION,
+        fmt,
+        template,
+        templates.fingerprint(fmt, template),
+        project.id,
+        project.title,
+        project.topic,
+        project.doc_type,
+        [[s.id, s.order, s.title, s.content, s.image_id] for s in sorted(sections, key=lambda x: (x.order, x.id))],
+    ]
+    raw = json.dumps(payload, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, digest: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag(digest) in tags
+
+
+def _prefix(project_id: int, fmt: str, template: str | None) -> str:
+    variant = f"{fmt}.{template}" if template else fmt
+    return os.path.join(CACHE_DIR, f"{project_id}-{variant}-")
+
+
+def _path(project_id: int, fmt: str, template: str | None, digest: str) -> str:
+    return f"{_prefix(project_id, fmt, template)}{digest}.{fmt}"
+
+
+def lookup(project_id: int, fmt: str, template: str | None, digest: str):
+    path = _path(project_id, fmt, template, digest)
+    return path if os.path.exists(path) else None
+
+
+def store(project_id: int, fmt: str, template: str | None, digest: str, chunks) -> str:
+    """Write an artifact from an iterable of byte chunks; returns its path."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(project_id, fmt, template, digest)
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        _remove(tmp)
+        raise
+
+    # Older renders of the same project/format/template can never match again
+    pattern = _prefix(project_id, fmt, template) + "?" * len(digest) + f".{fmt}"
+    for old in glob.glob(pattern):
+        if old != path:
+            _remove(old)
+    return path
+
+
+def invalidate(project_id: int):
+    for path in glob.glob(os.path.join(CACHE_DIR, f"{project_id}-*")):
+        _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def render(project, sections, format: str = "auto", template: str | None = None):
+    """
+    Return (path, filename, media_type, digest) for an export, rendering it
+    only when no artifact exists for the current content.
+    """
+    fmt = export_format(project, format)
+    digest = content_hash(project, sections, fmt, template)
+    path = lookup(project.id, fmt, template, digest)
+    if path is None:
+        path = _flights.do((project.id, fmt, template, digest), _render_and_store, project, sections, fmt, template, digest)
+    return path, export_filename(project, fmt), MEDIA_TYPES[fmt], digest
+
+
+def open_render(project, sections, format: str = "auto", template: str | None = None):
+    """
+    Like render(), but returns an open binary file instead of a path. The
+    artifact can be invalidated (unlinked) by a concurrent commit at any time;
+    an open handle keeps its contents readable, and a file removed before it
+    could be opened is rendered again.
+    """
+    for attempt in range(3):
+        path, filename, media_type, digest = render(project, sections, format, template)
+        try:
+            return open(path, "rb"), filename, media_type, digest
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+
+
+def iter_file(f, chunk_size: int = 64 * 1024):
+    """Yield an open file's contents in chunks, closing it at the end."""
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def _render_and_store(project, sections, fmt, template, digest):
+    # A render that finished between our lookup and taking the flight is reused
+    path = lookup(project.id, fmt, template, digest)
+    if path is None:
+        path = store(project.id, fmt, template, digest, iter_export(project, sections, fmt, template))
+    return path
+
+
+# ---------------- Invalidation ---------------- #
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_projects(session, flush_context, instances):
+    changed = session.info.setdefault("export_cache_dirty", set())
+    for obj in list(session.dirty) + list(session.new) + list(session.deleted):
+        fields = _RENDER_FIELDS.get(type(obj))
+        if not fields:
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[f].history.has_changes() for f in fields):
+            continue
+        project_id = obj.id if isinstance(obj, models.Project) else obj.project_id
+        if project_id is not None:
+            changed.add(project_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_projects(session):
+    for project_id in session.info.pop("export_cache_dirty", set()):
+        invalidate(project_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_projects(session):
+    session.info.pop("export_cache_dirty", None)
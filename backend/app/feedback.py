@@ -0,0 +1,121 @@
+"""
+Like/dislike counters.
+
+Counters are bumped with `UPDATE ... SET likes = likes + n`, so concurrent
+clicks never overwrite each other. With FEEDBACK_FLUSH_MS > 0 clicks are
+buffered in memory and written in one transaction per interval instead of
+one per click; the buffer is flushed on shutdown. Counts read back through
+the API may then lag by up to one interval.
+"""
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, func, select, update
+
+from . import models
+from .database import SessionLocal
+
+load_dotenv()
+
+FLUSH_MS = int(os.getenv("FEEDBACK_FLUSH_MS", "0"))
+
+log = logging.getLogger(__name__)
+
+_pending = {}  # section id -> [likes, dislikes]
+_lock = threading.Lock()
+_flusher = None
+_stop = threading.Event()
+
+_sections = models.Section.__table__
+_projects = models.Project.__table__
+_increment = (
+    update(_sections)
+    .where(_sections.c.id == bindparam("section_id"))
+    .values(
+        likes=func.coalesce(_sections.c.likes, 0) + bindparam("add_likes"),
+        dislikes=func.coalesce(_sections.c.dislikes, 0) + bindparam("add_dislikes"),
+    )
+)
+
+
+def _write(db, counts: dict):
+    conn = db.connection()
+    conn.execute(
+        _increment,
+        [{"section_id": sid, "add_likes": likes, "add_dislikes": dislikes} for sid, (likes, dislikes) in counts.items()],
+    )
+    # Counts are part of the project's API representation. Bump its version
+    # (not updated_at, so likes don't reorder the project list)
+    conn.execute(
+        update(_projects)
+        .where(_projects.c.id.in_(select(_sections.c.project_id).where(_sections.c.id.in_(list(counts)))))
+        .values(version=_projects.c.version + 1)
+    )
+
+
+def record(db, section_id: int, action: str):
+    """Count a 'like' or 'dislike'; other actions are ignored."""
+    if action not in ("like", "dislike"):
+        return
+    delta = [1, 0] if action == "like" else [0, 1]
+    if FLUSH_MS <= 0:
+        # Part of the caller's transaction
+        _write(db, {section_id: delta})
+        return
+    with _lock:
+        counts = _pending.setdefault(section_id, [0, 0])
+        counts[0] += delta[0]
+        counts[1] += delta[1]
+    _ensure_flusher()
+
+
+def flush():
+    """Write buffered counts in a single transaction."""
+    with _lock:
+        if not _pending:
+            return
+        counts = dict(_pending)
+        _pending.clear()
+    db = SessionLocal()
+    try:
+        _write(db, counts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the counts back so the next flush retries them
+        with _lock:
+            for sid, (likes, dislikes) in counts.items():
+                pending = _pending.setdefault(sid, [0, 0])
+                pending[0] += likes
+                pending[1] += dislikes
+        raise
+    finally:
+        db.close()
+
+
+def _run():
+    while not _stop.wait(FLUSH_MS / 1000):
+        try:
+            flush()
+        except Exception:
+            log.exception("feedback flush failed")
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None:
+        with _lock:
+            if _flusher is None:
+                _stop.clear()
+                _flusher = threading.Thread(target=_run, name="feedback-flush", daemon=True)
+                _flusher.start()
+
+
+def shutdown():
+    global _flusher
+    _stop.set()
+    if _flusher is not None:
+        _flusher.join()
+        _flusher = None
+    flush()
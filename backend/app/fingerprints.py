@@ -0,0 +1,18 @@
+"""
+Fingerprints of what a section's generated content depends on.
+
+Kept free of other app imports so migrations can backfill fingerprints
+without loading the LLM client, image store or their settings.
+"""
+import hashlib
+import json
+
+# Bump when content.section_prompt / batch_prompt change enough that existing
+# content should be regenerated
+PROMPT_VERSION = "1"
+
+
+def fingerprint(project, section) -> str:
+    """Hash of everything a section's generated content depends on."""
+    raw = json.dumps([PROMPT_VERSION, section.title, project.topic or project.title, project.doc_type], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
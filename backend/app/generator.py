@@ -1,48 +1,131 @@
+import os
+import time
 from io import BytesIO
-from docx import Document
-from docx.shared import Pt
-from pptx import Presentation
-from pptx.util import Pt, Inches
+
+from . import blocks, docx_stream, images, templates, metrics
+
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+MEDIA_TYPES = {"docx": DOCX_MEDIA_TYPE, "pptx": PPTX_MEDIA_TYPE}
+
+# Section images span the text width in DOCX and the right part of a slide in PPTX
+DOCX_IMAGE_WIDTH_EMU = docx_stream.IMAGE_WIDTH_EMU
+PPTX_IMAGE_AREA = 0.4  # fraction of the slide width
+
+# 'auto' uses the streaming DOCX writer for large documents only,
+# 'stream' / 'python-docx' force one writer
+DOCX_WRITER = os.getenv("DOCX_WRITER", "auto").lower()
+DOCX_STREAM_MIN_SECTIONS = int(os.getenv("DOCX_STREAM_MIN_SECTIONS", "20"))
+
+
+def export_format(project, format: str = "auto") -> str:
+    """Resolve the requested format ('docx', 'pptx' or 'auto') for a project."""
+    if format in ("docx", "pptx"):
+        return format
+    return "pptx" if project.doc_type == "pptx" else "docx"
+
+
+def export_filename(project, fmt: str) -> str:
+    return f"project_{project.id}.{fmt}"
+
+
+def render_export(project, sections, format: str = "auto", template=None):
+    """Render a project; returns (BytesIO, filename, media_type)."""
+    fmt = export_format(project, format)
+    start = time.perf_counter()
+    if fmt == "pptx":
+        bio = assemble_pptx(project, sections, template)
+    else:
+        bio = assemble_docx(project, sections, template)
+    metrics.export_render.observe(time.perf_counter() - start, fmt, "python-" + fmt)
+    metrics.export_bytes.observe(bio.getbuffer().nbytes, fmt, "python-" + fmt)
+    return bio, export_filename(project, fmt), MEDIA_TYPES[fmt]
+
+
+def use_docx_stream(sections) -> bool:
+    if DOCX_WRITER == "stream":
+        return True
+    if DOCX_WRITER == "auto":
+        return len(sections) >= DOCX_STREAM_MIN_SECTIONS
+    return False
+
+
+def iter_export(project, sections, format: str = "auto", template=None):
+    """Render a project as an iterator of byte chunks."""
+    fmt = export_format(project, format)
+    if fmt == "docx" and use_docx_stream(sections):
+        # Time spent producing chunks, excluding however long the consumer takes
+        elapsed, size = 0.0, 0
+        chunks = docx_stream.iter_docx(project, sections, template)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            elapsed += time.perf_counter() - start
+            if chunk is None:
+                break
+            size += len(chunk)
+            yield chunk
+        metrics.export_render.observe(elapsed, fmt, "stream")
+        metrics.export_bytes.observe(size, fmt, "stream")
+        return
+    bio, _, _ = render_export(project, sections, fmt, template)
+    yield bio.getvalue()
 
 
 # ---------------- DOCX (Beautiful & Clean) ---------------- #
-def assemble_docx(project, sections):
-    doc = Document()
+def _docx_style(doc, name, fallback="Normal"):
+    # Brand templates may not define every style we use
+    try:
+        return doc.styles[name]
+    except KeyError:
+        return doc.styles[fallback]
+
+
+def _add_runs(paragraph, runs):
+    for text, style in runs:
+        run = paragraph.add_run(text)
+        if style & blocks.BOLD:
+            run.bold = True
+        if style & blocks.ITALIC:
+            run.italic = True
+
+
+def assemble_docx(project, sections, template=None):
+    doc = templates.document(template)
+    # Fonts and sizes live in the template styles; resolve them once
+    title_style = _docx_style(doc, "Heading 1")
+    heading_style = _docx_style(doc, "Heading 2")
+    subheading_style = _docx_style(doc, "Heading 3")
+    bullet_styles = (_docx_style(doc, "List Bullet"), _docx_style(doc, "List Bullet 2"))
+    topic_style = _docx_style(doc, templates.TOPIC_STYLE)
 
     # Title
-    title = doc.add_heading(project.title or "Document", level=1)
-    for run in title.runs:
-        run.font.name = "Segoe UI"
-        run.font.size = Pt(28)
+    doc.add_paragraph(project.title or "Document", style=title_style)
 
     if project.topic:
-        topic_para = doc.add_paragraph(f"Topic: {project.topic}")
-        topic_para.runs[0].font.size = Pt(13)
-        topic_para.runs[0].font.name = "Segoe UI"
+        doc.add_paragraph(f"Topic: {project.topic}", style=topic_style)
         doc.add_paragraph("")
 
     # Sections
     for s in sorted(sections, key=lambda x: x.order):
-        heading = doc.add_heading(s.title or "Section", level=2)
-        for run in heading.runs:
-            run.font.name = "Segoe UI"
-            run.font.size = Pt(20)
-
-        lines = (s.content or "").split("\n")
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            # Bullet formatting if PPT bullet-style content comes from LLM
-            if line.startswith("-") or line.startswith("•"):
-                p = doc.add_paragraph(line.strip("-• "), style="List Bullet")
-                p.runs[0].font.name = "Segoe UI"
-                p.runs[0].font.size = Pt(11)
+        doc.add_paragraph(s.title or "Section", style=heading_style)
+
+        for block in blocks.parse(s.content or ""):
+            if block.kind == blocks.HEADING:
+                p = doc.add_paragraph(style=subheading_style)
+            elif block.kind == blocks.BULLET:
+                p = doc.add_paragraph(style=bullet_styles[block.level])
             else:
-                p = doc.add_paragraph(line)
-                p.runs[0].font.name = "Segoe UI"
-                p.runs[0].font.size = Pt(12)
+                p = doc.add_paragraph()
+            if block.kind == blocks.NUMBER:
+                p.add_run(f"{block.level}. ")
+            _add_runs(p, block.runs)
+
+        image = images.variant(s.image_id, "page") if s.image_id else None
+        if image:
+            # The stored variant goes into the package byte for byte
+            doc.add_picture(image[0], width=DOCX_IMAGE_WIDTH_EMU)
 
         doc.add_paragraph("")
 
@@ -54,40 +137,114 @@ def assemble_docx(project, sections):
 
 
 # ---------------- PPTX (Professional + Business Style) ---------------- #
-def assemble_pptx(project, sections):
-    prs = Presentation()
+def _add_slide_image(prs, slide, body, image):
+    """Narrow the body placeholder and fit the picture into the freed area on the right."""
+    path, width, height, _ = image
+    # Placeholders inherit their geometry from the layout; set all of it, not just the width
+    left, top, box_height = body.left, body.top, body.height
+    area_left = int(prs.slide_width * (1 - PPTX_IMAGE_AREA))
+    area_width = prs.slide_width - area_left - left  # same margin on the right as on the left
+    body.left, body.top, body.width, body.height = left, top, area_left - int(prs.slide_width * 0.02) - left, box_height
 
-    # Title Slide
-    title_slide = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(title_slide)
-    slide.shapes.title.text = project.title or "Untitled Presentation"
+    scale = min(area_width / width, box_height / height)
+    pic_width, pic_height = int(width * scale), int(height * scale)
+    slide.shapes.add_picture(path, area_left, top + (box_height - pic_height) // 2, pic_width, pic_height)
+
+
+def _placeholder(slide, *kinds):
+    """First placeholder of one of the PP_PLACEHOLDER kinds on a slide or layout, or None."""
+    for ph in slide.placeholders:
+        if ph.placeholder_format.type in kinds:
+            return ph
+    return None
+
+
+def _body_placeholder(slide):
+    from pptx.enum.shapes import PP_PLACEHOLDER
+
+    return _placeholder(slide, PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.OBJECT, PP_PLACEHOLDER.SUBTITLE)
+
+
+def _has_title(layout) -> bool:
+    from pptx.enum.shapes import PP_PLACEHOLDER
+
+    return _placeholder(layout, PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE) is not None
 
-    if project.topic and len(slide.placeholders) > 1:
-        slide.placeholders[1].text = f"Topic: {project.topic}"
 
-    # Style for bullets
-    font_size = Pt(24)
-    font_name = "Segoe UI"
+def _content_layout(prs):
+    """
+    Layout for section slides: "Title and Content" (layouts[1]) in the default
+    template; in brand templates the first layout with a title and a body,
+    else one with just a title, else the first one.
+    """
+    layouts = list(prs.slide_layouts)
+    candidates = layouts[1:2] + layouts
+    for layout in candidates:
+        if _has_title(layout) and _body_placeholder(layout) is not None:
+            return layout
+    for layout in candidates:
+        if _has_title(layout):
+            return layout
+    return layouts[0]
 
-    # Content Slides
+
+def _set_title(prs, slide, text: str):
+    if slide.shapes.title is not None:
+        slide.shapes.title.text = text
+        return
+    box = slide.shapes.add_textbox(int(prs.slide_width * 0.05), int(prs.slide_height * 0.04),
+                                   int(prs.slide_width * 0.9), int(prs.slide_height * 0.14))
+    box.text_frame.text = text
+    box.text_frame.paragraphs[0].runs[0].font.bold = True
+
+
+def _body_box(prs, slide):
+    """The slide's body placeholder, or a textbox where one would be."""
+    body = _body_placeholder(slide)
+    if body is None:
+        body = slide.shapes.add_textbox(int(prs.slide_width * 0.05), int(prs.slide_height * 0.22),
+                                        int(prs.slide_width * 0.9), int(prs.slide_height * 0.7))
+        body.text_frame.word_wrap = True
+    return body
+
+
+def assemble_pptx(project, sections, template=None):
+    prs = templates.presentation(template)
+
+    # Title Slide
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    _set_title(prs, slide, project.title or "Untitled Presentation")
+
+    subtitle = _body_placeholder(slide)
+    if project.topic and subtitle is not None:
+        subtitle.text = f"Topic: {project.topic}"
+
+    # Content Slides (bullet font and size come from the template's master)
+    layout = _content_layout(prs)
     for s in sorted(sections, key=lambda x: x.order):
-        layout = prs.slide_layouts[1]
         slide = prs.slides.add_slide(layout)
-        slide.shapes.title.text = s.title or "Slide"
+        _set_title(prs, slide, s.title or "Slide")
 
-        textbox = slide.shapes.placeholders[1].text_frame
+        body = _body_box(prs, slide)
+        image = images.variant(s.image_id, "slide") if s.image_id else None
+        if image:
+            _add_slide_image(prs, slide, body, image)
+
+        textbox = body.text_frame
         textbox.clear()
 
-        lines = [l.strip() for l in (s.content or "").split("\n") if l.strip()]
-        for i, line in enumerate(lines):
-            if i == 0:
-                p = textbox.paragraphs[0]
-            else:
-                p = textbox.add_paragraph()
-            p.text = line
-            p.level = 0
-            p.font.size = font_size
-            p.font.name = font_name
+        for i, block in enumerate(blocks.parse(s.content or "")):
+            p = textbox.paragraphs[0] if i == 0 else textbox.add_paragraph()
+            p.level = block.level if block.kind == blocks.BULLET else 0
+            if block.kind == blocks.NUMBER:
+                p.add_run().text = f"{block.level}. "
+            for text, style in block.runs:
+                run = p.add_run()
+                run.text = text
+                if style & blocks.BOLD or block.kind == blocks.HEADING:
+                    run.font.bold = True
+                if style & blocks.ITALIC:
+                    run.font.italic = True
 
     # Export to bytes
     bio = BytesIO()
@@ -0,0 +1,146 @@
+"""
+Password hashing off the request threads.
+
+pbkdf2 is pure CPU work, and a burst of logins would otherwise fill the
+shared threadpool and contend for the GIL with every other request. Hashes
+are computed in a small process pool instead. Only a bounded number of
+hashes can be queued at once; past that, callers get HashingBusy (a 503)
+rather than waiting in an ever-growing queue.
+"""
+import asyncio
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv()
+
+# pbkdf2_sha256 iterations for new hashes. Stored hashes with fewer rounds are
+# upgraded on the next successful login.
+HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Worker processes; 0 hashes on the request threadpool instead
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashes allowed in flight (running + queued) before callers are turned away
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, WORKERS) * 8)))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=HASH_ROUNDS,
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("Too many sign-in attempts in progress, try again shortly")
+        self.retry_after = retry_after
+
+
+# ---------------- Worker functions ---------------- #
+# Top-level so they can be pickled into the pool
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+def verify_and_update(password: str, hashed: str):
+    """(ok, new_hash); new_hash is set when the stored hash should be replaced."""
+    return pwd_context.verify_and_update(password, hashed)
+
+
+# ---------------- Pool ---------------- #
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that already runs threads is unsafe
+                _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=mp.get_context("spawn"))
+    return _pool
+
+
+def _discard_pool(pool):
+    """Drop a pool that lost a worker; a broken pool fails every later submit."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+async def _run(fn, *args):
+    try:
+        return await _run_once(fn, *args)
+    except BrokenProcessPool:
+        # A worker died (OOM kill, crash); _run_once dropped the pool, so this
+        # attempt starts a fresh one
+        return await _run_once(fn, *args)
+
+
+async def _run_once(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    if WORKERS <= 0:
+        try:
+            return await run_in_threadpool(fn, *args)
+        finally:
+            _slots.release()
+    pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _discard_pool(pool)
+        raise
+    except BaseException:
+        _slots.release()
+        raise
+    # Free the slot when the work is done, even if the caller went away first
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+async def hash_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_and_update_async(password: str, hashed: str):
+    return await _run(verify_and_update, password, hashed)
+
+
+def warm_up():
+    """Start the worker processes now rather than on the first login."""
+    if WORKERS > 0:
+        pool = _get_pool()
+        for future in [pool.submit(_ready) for _ in range(WORKERS)]:
+            future.result()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,186 @@
+"""
+Shared HTTP transport for LLM/image providers: one keep-alive session per
+provider, bounded retries with jittered backoff on 429/5xx and a circuit
+breaker that fails fast while a provider is down.
+
+requests is imported when the first client is created, so processes that
+never call a provider (or use the mock one) don't pay for it at start-up.
+"""
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import requests
+
+load_dotenv()
+
+CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("LLM_HTTP_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("LLM_HTTP_BACKOFF", "0.5"))  # seconds
+BACKOFF_MAX = float(os.getenv("LLM_HTTP_BACKOFF_MAX", "8"))
+BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive failed calls
+BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))  # seconds before a trial call
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is unavailable, retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; half-open after `reset_timeout`."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                # Let exactly one trial call through
+                self._trial_running = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class ProviderClient:
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        pool_size: int = 10,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        # Retries are handled below so that they feed the circuit breaker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt: int, resp=None) -> float:
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        # Full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, path: str, **kwargs) -> "requests.Response":
+        """
+        POST to base_url + path. Returns the final response (callers check the
+        status); raises CircuitOpenError or the last transport error.
+        """
+        import requests
+
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        resp = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            except BaseException:
+                # Anything else still has to settle the breaker, or a failed
+                # half-open trial would keep the provider locked out
+                self.breaker.record_failure()
+                raise
+
+            if resp.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                return resp
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, resp))
+
+        self.breaker.record_failure()
+        return resp
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str, base_url: str, **kwargs) -> ProviderClient:
+    """Process-wide client per provider name, created on first use."""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = ProviderClient(name, base_url, **kwargs)
+            _clients[name] = client
+        return client
+
+
+def close_all():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
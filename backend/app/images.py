@@ -0,0 +1,169 @@
+"""
+Content-addressed on-disk store for section images.
+
+A blob is identified by the sha256 of the provider's bytes, so the same image
+is stored once however many sections use it. When a blob is stored it is
+decoded once and downscaled into the variants the exporters embed ("page"
+for DOCX, "slide" for PPTX); exports then copy those files into the package
+as-is, without decoding or re-encoding anything. A prompt index maps the hash
+of (provider, model, size, prompt) to a blob, so regenerating a project does
+not ask the provider for an image it already made.
+
+    IMAGE_STORE_DIR/ab/abcd....json        metadata, written last
+    IMAGE_STORE_DIR/ab/abcd....page.jpg    variants (png when the image has alpha)
+    IMAGE_STORE_DIR/prompts/<prompt hash>  blob id
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from dotenv import load_dotenv
+
+from . import llm_client, metrics, singleflight
+
+load_dotenv()
+
+STORE_DIR = os.getenv("IMAGE_STORE_DIR", "./image_store")
+CONCURRENCY = max(1, int(os.getenv("IMAGE_CONCURRENCY", "4")))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Longest edge in pixels: 6in of page at ~250dpi, half of a 1920px-wide slide
+VARIANTS = {"page": 1500, "slide": 960}
+
+logger = logging.getLogger(__name__)
+
+# Sections asking for the same prompt at once share one provider call
+_flights = singleflight.Group("image")
+
+
+def _blob_path(blob_id: str, suffix: str) -> str:
+    return os.path.join(STORE_DIR, blob_id[:2], f"{blob_id}{suffix}")
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _encode(img, fmt: str) -> bytes:
+    bio = BytesIO()
+    if fmt == "png":
+        img.save(bio, "PNG", optimize=True)
+    else:
+        img.convert("RGB").save(bio, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return bio.getvalue()
+
+
+def put(data: bytes) -> str:
+    """Store image bytes and their variants; returns the blob id. Storing the same bytes again is a no-op."""
+    blob_id = hashlib.sha256(data).hexdigest()
+    if os.path.exists(_blob_path(blob_id, ".json")):
+        metrics.images.inc("deduplicated")
+        return blob_id
+
+    from PIL import Image
+
+    img = Image.open(BytesIO(data))
+    img.load()
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    fmt = "png" if has_alpha else "jpg"
+    meta = {"width": img.width, "height": img.height, "variants": {}}
+    for name, edge in VARIANTS.items():
+        variant = img.copy()
+        variant.thumbnail((edge, edge), Image.LANCZOS)
+        filename = f"{blob_id}.{name}.{fmt}"
+        _write_atomic(_blob_path(blob_id, f".{name}.{fmt}"), _encode(variant, fmt))
+        meta["variants"][name] = {"file": filename, "width": variant.width, "height": variant.height, "format": fmt}
+    _write_atomic(_blob_path(blob_id, ".json"), json.dumps(meta).encode("utf-8"))
+    return blob_id
+
+
+@lru_cache(maxsize=1024)
+def _load_meta(blob_id: str) -> dict:
+    # Blobs never change once stored; a missing one raises and so is not cached
+    with open(_blob_path(blob_id, ".json")) as f:
+        return json.load(f)
+
+
+def meta(blob_id: str) -> dict | None:
+    """Original and variant sizes and files for a blob, or None if it is not stored."""
+    try:
+        return _load_meta(blob_id)
+    except FileNotFoundError:
+        return None
+
+
+def variant(blob_id: str, name: str):
+    """(path, width, height, format) of a stored variant, or None."""
+    info = meta(blob_id)
+    if info is None:
+        return None
+    v = info["variants"][name]
+    return os.path.join(STORE_DIR, blob_id[:2], v["file"]), v["width"], v["height"], v["format"]
+
+
+def prompt_key(prompt: str) -> str:
+    raw = json.dumps([llm_client.IMAGE_PROVIDER, llm_client.IMAGE_MODEL, llm_client.IMAGE_SIZE, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _generate(key: str, prompt: str, user=None) -> str | None:
+    data = llm_client.generate_image(prompt, user=user)
+    if not data:
+        metrics.images.inc("failed")
+        return None
+    blob_id = put(data)
+    _write_atomic(os.path.join(STORE_DIR, "prompts", key), blob_id.encode("ascii"))
+    metrics.images.inc("generated")
+    return blob_id
+
+
+def for_prompt(prompt: str, use_cache: bool = True, user=None) -> str | None:
+    """
+    Blob id of the image for a prompt, generating it (for `user`, see
+    llm_client.generate_image) when needed; None if the provider gave nothing.
+    """
+    key = prompt_key(prompt)
+    if use_cache:
+        try:
+            with open(os.path.join(STORE_DIR, "prompts", key)) as f:
+                blob_id = f.read().strip()
+            if meta(blob_id) is not None:
+                metrics.images.inc("prompt_hit")
+                return blob_id
+        except FileNotFoundError:
+            pass
+    return _flights.do(key, _generate, key, prompt, user)
+
+
+def _fetch(prompt: str, use_cache: bool, user=None):
+    try:
+        return for_prompt(prompt, use_cache, user)
+    except Exception:
+        logger.exception("Image generation failed")
+        metrics.images.inc("failed")
+        return None
+
+
+def fetch_many(prompts, use_cache: bool = True, user=None) -> list:
+    """Start fetching images for prompts concurrently; returns a Future (blob id or None) per prompt."""
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    pool = ThreadPoolExecutor(max_workers=min(len(prompts), CONCURRENCY), thread_name_prefix="image")
+    try:
+        return [pool.submit(_fetch, prompt, use_cache, user) for prompt in prompts]
+    finally:
+        # Workers exit once the queued prompts are done
+        pool.shutdown(wait=False)
@@ -0,0 +1,310 @@
+"""
+In-process background jobs for generate, refine-all and export.
+
+Jobs are persisted in the `jobs` table and executed by a small worker pool,
+so long work no longer holds a request thread. Each unfinished job is leased
+to the process running it, which renews the lease every JOB_LEASE_SECONDS / 3.
+Jobs whose lease has expired (their process stopped, crashed or hung) are
+claimed and queued again by a live process, at startup and on every renewal,
+so several workers or a rolling restart never run the same job twice.
+
+Finished jobs, and the files export jobs wrote, are deleted
+JOB_RETENTION_HOURS after they finish (at startup and on every renewal).
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from sqlalchemy import delete, or_, update
+
+from . import models, content, llm_client, export_cache
+from .database import SessionLocal
+
+load_dotenv()
+
+WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+RESULT_DIR = os.getenv("JOB_RESULT_DIR", "./job_results")
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# 0 keeps finished jobs and their results forever
+RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("generate", "refine_all", "export")
+FINISHED = ("succeeded", "failed")
+UNFINISHED = ("queued", "running")
+
+_pool = None
+_pool_lock = threading.Lock()
+_heartbeat = None
+_heartbeat_lock = threading.Lock()
+_stop = threading.Event()
+
+_jobs = models.Job.__table__
+
+
+def worker_id() -> str:
+    # Per process (not per import): forked workers each get their own
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="job")
+        return _pool
+
+
+def submit(db, owner_id: int, project_id: int, kind: str, params: dict) -> models.Job:
+    job = models.Job(
+        owner_id=owner_id,
+        project_id=project_id,
+        kind=kind,
+        params=json.dumps(params),
+        status="queued",
+        worker=worker_id(),
+        heartbeat_at=datetime.datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _ensure_heartbeat()
+    _executor().submit(run, job.id)
+    return job
+
+
+def recover():
+    """Claim and re-queue unfinished jobs whose lease has expired."""
+    now = datetime.datetime.utcnow()
+    expired = now - datetime.timedelta(seconds=LEASE_SECONDS)
+    me = worker_id()
+    db = SessionLocal()
+    try:
+        candidates = [
+            job_id for (job_id,) in db.query(models.Job.id)
+            .filter(
+                models.Job.status.in_(UNFINISHED),
+                or_(models.Job.heartbeat_at.is_(None), models.Job.heartbeat_at < expired),
+            )
+            .order_by(models.Job.id)
+        ]
+        ids = []
+        for job_id in candidates:
+            # Conditional per row, so only one process wins a job
+            claimed = db.execute(
+                update(_jobs)
+                .where(
+                    _jobs.c.id == job_id,
+                    _jobs.c.status.in_(UNFINISHED),
+                    or_(_jobs.c.heartbeat_at.is_(None), _jobs.c.heartbeat_at < expired),
+                )
+                .values(status="queued", progress=0, started_at=None, worker=me, heartbeat_at=now)
+            )
+            if claimed.rowcount:
+                ids.append(job_id)
+        db.commit()
+    finally:
+        db.close()
+
+    _ensure_heartbeat()
+    for job_id in ids:
+        _executor().submit(run, job_id)
+    return len(ids)
+
+
+def purge() -> int:
+    """Delete finished jobs older than RETENTION_HOURS and their export files."""
+    if RETENTION_HOURS <= 0:
+        return 0
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=RETENTION_HOURS)
+    db = SessionLocal()
+    try:
+        old = (
+            db.query(models.Job.id, models.Job.kind, models.Job.result)
+            .filter(models.Job.status.in_(FINISHED), models.Job.finished_at < cutoff)
+            .all()
+        )
+        if not old:
+            return 0
+        # Files first: a file without its row would never be cleaned up
+        for _, kind, result in old:
+            path = (json.loads(result) if result else {}).get("path") if kind == "export" else None
+            if path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        db.execute(delete(_jobs).where(_jobs.c.id.in_([job_id for job_id, _, _ in old])))
+        db.commit()
+    finally:
+        db.close()
+    logger.info("purged %d finished jobs", len(old))
+    return len(old)
+
+
+def _renew():
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(_jobs)
+            .where(_jobs.c.worker == worker_id(), _jobs.c.status.in_(UNFINISHED))
+            .values(heartbeat_at=datetime.datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _run_heartbeat():
+    while not _stop.wait(LEASE_SECONDS / 3):
+        try:
+            _renew()
+            recover()
+            purge()
+        except Exception:
+            logger.exception("job lease renewal failed")
+
+
+def _ensure_heartbeat():
+    global _heartbeat
+    with _heartbeat_lock:
+        if _heartbeat is None:
+            _stop.clear()
+            _heartbeat = threading.Thread(target=_run_heartbeat, name="job-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+def shutdown():
+    global _pool, _heartbeat
+    _stop.set()
+    with _heartbeat_lock:
+        heartbeat, _heartbeat = _heartbeat, None
+    if heartbeat is not None:
+        heartbeat.join()
+    with _pool_lock:
+        if _pool is not None:
+            # Unfinished jobs keep their lease until it expires, then another
+            # process (or this one after a restart) picks them up in recover()
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run(job_id: int):
+    db = SessionLocal()
+    try:
+        # Start only jobs still queued for this process
+        claimed = db.execute(
+            update(_jobs)
+            .where(_jobs.c.id == job_id, _jobs.c.status == "queued", _jobs.c.worker == worker_id())
+            .values(status="running", started_at=datetime.datetime.utcnow(), heartbeat_at=datetime.datetime.utcnow())
+        )
+        db.commit()
+        if not claimed.rowcount:
+            return
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+
+        try:
+            project = (
+                db.query(models.Project)
+                .filter(models.Project.id == job.project_id, models.Project.owner_id == job.owner_id)
+                .first()
+            )
+            if not project:
+                raise ValueError("Project not found")
+            params = json.loads(job.params) if job.params else {}
+            result = HANDLERS[job.kind](db, job, project, params)
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        else:
+            job.status = "succeeded"
+            job.result = json.dumps(result)
+        job.finished_at = datetime.datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _set_progress(db, job, done: int, total: int):
+    job.progress = done
+    job.total = total
+    db.commit()
+
+
+# ---------------- Handlers ---------------- #
+
+def _generate(db, job, project, params):
+    sections = content.ordered_sections(project)
+    stale = content.stale_sections(project, sections, params.get("force", False))
+    _set_progress(db, job, 0, len(stale))
+    use_cache = params.get("use_cache", True)
+    with_images = content.image_sections(sections, stale) if params.get("images") else []
+    pending_images = content.start_images(project, with_images, use_cache)
+    errors = []
+    done = 0
+    for s, text, error in content.iter_generate(project, stale, use_cache=use_cache):
+        done += 1
+        if error:
+            errors.append({"section_id": s.id, "title": s.title, "error": error})
+        else:
+            content.apply_generated(project, s, text)
+        _set_progress(db, job, done, len(stale))
+    images = content.apply_images(with_images, pending_images)
+
+    if stale and len(errors) == len(stale):
+        raise RuntimeError("Content generation failed for every section.")
+    result = {"generated": len(stale) - len(errors), "skipped": len(sections) - len(stale), "errors": errors}
+    if params.get("images"):
+        result["images"] = images
+    return result
+
+
+def _refine_all(db, job, project, params):
+    instruction = params.get("instruction")
+    if not instruction:
+        raise ValueError("instruction is required")
+    sections = content.ordered_sections(project)
+    _set_progress(db, job, 0, len(sections))
+    prompts = [content.refine_prompt(s, instruction) for s in sections]
+    errors = []
+    done = 0
+    for i, text, error in llm_client.iter_llm_many(prompts, use_cache=params.get("use_cache", True), user=project.owner_id):
+        s = sections[i]
+        done += 1
+        if error:
+            errors.append({"section_id": s.id, "title": s.title, "error": error})
+        else:
+            content.apply_refinement(s, instruction, text)
+        _set_progress(db, job, done, len(sections))
+
+    if sections and len(errors) == len(sections):
+        raise RuntimeError("Refinement failed for every section.")
+    return {"refined": len(sections) - len(errors), "errors": errors}
+
+
+def _export(db, job, project, params):
+    _set_progress(db, job, 0, 1)
+    cached, filename, media_type, _ = export_cache.open_render(
+        project, project.sections, params.get("format", "auto"), params.get("template")
+    )
+    # Copy out of the cache, which drops the file once the project changes
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    path = os.path.join(RESULT_DIR, f"job_{job.id}_{filename}")
+    with cached, open(path, "wb") as out:
+        shutil.copyfileobj(cached, out)
+    _set_progress(db, job, 1, 1)
+    return {"filename": filename, "media_type": media_type, "path": path}
+
+
+HANDLERS = {
+    "generate": _generate,
+    "refine_all": _refine_all,
+    "export": _export,
+}
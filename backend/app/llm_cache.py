@@ -0,0 +1,100 @@
+"""
+Two-tier cache for LLM responses: an in-process LRU in front of a SQLite
+table that survives restarts. Keys are content hashes of the request.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+from .cache import TTLCache
+
+load_dotenv()
+
+ENABLED = os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no", "off")
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds, disk tier
+MEMORY_TTL = int(os.getenv("LLM_CACHE_MEMORY_TTL", "3600"))
+MEMORY_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+
+_memory = TTLCache(maxsize=MEMORY_SIZE, ttl=min(MEMORY_TTL, TTL))
+_conn = None
+_conn_lock = threading.Lock()
+
+_counters = {"disk_hits": 0, "disk_misses": 0, "disk_evictions": 0, "writes": 0}
+
+
+def make_key(provider: str, model: str, prompt: str, max_tokens: int, temperature: float) -> str:
+    raw = json.dumps([provider, model, prompt, max_tokens, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        cur = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - TTL,))
+        _counters["disk_evictions"] += cur.rowcount
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def get(key: str):
+    value = _memory.get(key)
+    if value is not None:
+        return value
+
+    with _conn_lock:
+        row = _db().execute(
+            "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[1] < time.time() - TTL:
+            _db().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            _db().commit()
+            _counters["disk_evictions"] += 1
+            row = None
+        _counters["disk_hits" if row else "disk_misses"] += 1
+
+    if row is None:
+        return None
+    _memory.set(key, row[0])
+    return row[0]
+
+
+def put(key: str, value: str):
+    _memory.set(key, value)
+    with _conn_lock:
+        _db().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        _db().commit()
+        _counters["writes"] += 1
+
+
+def clear():
+    _memory.clear()
+    with _conn_lock:
+        _db().execute("DELETE FROM llm_cache")
+        _db().commit()
+
+
+def stats() -> dict:
+    memory = _memory.stats()
+    return {
+        "enabled": ENABLED,
+        "memory_size": memory["size"],
+        "memory_hits": memory["hits"],
+        "memory_misses": memory["misses"],
+        "memory_evictions": memory["evictions"],
+        **_counters,
+    }
@@ -1,35 +1,198 @@
 import os
-import requests
 import base64
+import hashlib
+import io
 import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 
+from . import blocks, llm_cache, http_client, metrics, scheduler, singleflight
+
 load_dotenv()
 
 PROVIDER = os.getenv("LLM_PROVIDER", "mock").lower()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1")
+
+# Simulated behaviour of the mock provider (offline testing and benchmarks):
+# each call takes LATENCY plus up to JITTER ms, and fails with ERROR_RATE (0-1)
+MOCK_LATENCY_MS = float(os.getenv("LLM_MOCK_LATENCY_MS", "0"))
+MOCK_JITTER_MS = float(os.getenv("LLM_MOCK_JITTER_MS", "0"))
+MOCK_ERROR_RATE = float(os.getenv("LLM_MOCK_ERROR_RATE", "0"))
+
+# Section images: 'openai', or 'stub' for locally drawn placeholders (offline testing)
+IMAGE_PROVIDER = os.getenv("IMAGE_PROVIDER", "stub" if PROVIDER == "mock" else PROVIDER).lower()
+IMAGE_MODEL = os.getenv("IMAGE_MODEL", "gpt-image-1")
+IMAGE_SIZE = os.getenv("IMAGE_SIZE", "1024x1024")
+
+# Provider failures come back as text rather than exceptions; never cache them
+ERROR_PREFIXES = ("[ERROR]", "[GEMINI API ERROR]", "[GEMINI PARSE ERROR]")
+
+# Max in-flight calls per provider, shared by every request in the process.
+# Override with LLM_CONCURRENCY_<PROVIDER>, e.g. LLM_CONCURRENCY_OPENAI=8
+DEFAULT_CONCURRENCY = {"mock": 16, "openai": 4, "gemini": 4}
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+# Identical prompts in flight at the same time share one provider call
+_flights = singleflight.Group("llm")
 
 
 def clean_markdown(text: str) -> str:
-    """Remove markdown symbols like **, *, #'s etc."""
-    replacements = [
-        ("**", ""),
-        ("*", ""),
-        ("###", ""),
-        ("##", ""),
-        ("#", ""),
-    ]
-    for old, new in replacements:
-        text = text.replace(old, new)
-    return text.strip()
-
-
-def call_llm(prompt: str, max_tokens: int = 600, temperature: float = 0.7) -> str:
-    """Wrapper for different LLM providers."""
+    """Normalise provider markdown to the light markdown sections are stored in (see blocks)."""
+    return blocks.normalize(text)
+
+
+def concurrency_limit(provider: str = PROVIDER) -> int:
+    default = DEFAULT_CONCURRENCY.get(provider, 4)
+    try:
+        return max(1, int(os.getenv(f"LLM_CONCURRENCY_{provider.upper()}", default)))
+    except ValueError:
+        return default
+
+
+def _rate_limit(kind: str, provider: str) -> int:
+    try:
+        return max(0, int(os.getenv(f"LLM_{kind}_{provider.upper()}", "0")))
+    except ValueError:
+        return 0
+
+
+def provider_scheduler(provider: str = PROVIDER) -> scheduler.Scheduler:
+    """Fair scheduler capping concurrency and rate of calls to one provider."""
+    with _schedulers_lock:
+        sched = _schedulers.get(provider)
+        if sched is None:
+            sched = scheduler.Scheduler(
+                provider,
+                concurrency_limit(provider),
+                rpm=_rate_limit("RPM", provider),
+                tpm=_rate_limit("TPM", provider),
+                user_concurrency=scheduler.USER_CONCURRENCY,
+            )
+            _schedulers[provider] = sched
+        return sched
+
+
+def provider_client(provider: str = PROVIDER) -> http_client.ProviderClient:
+    base_url = {"openai": OPENAI_BASE_URL, "gemini": GEMINI_BASE_URL}[provider]
+    return http_client.get_client(provider, base_url, pool_size=concurrency_limit(provider))
+
+
+def model_name(provider: str = PROVIDER) -> str:
+    return {"openai": OPENAI_MODEL, "gemini": GEMINI_MODEL}.get(provider, provider)
+
+
+def is_error_response(text: str) -> bool:
+    return text.startswith(ERROR_PREFIXES)
+
+
+def call_llm(prompt: str, max_tokens: int = 600, temperature: float = 0.7, use_cache: bool = True, user=None) -> str:
+    """
+    Wrapper for different LLM providers. Pass use_cache=False to force a fresh
+    call. `user` (the owner's id) is who the call is queued and rate-limited for.
+    """
+    key = llm_cache.make_key(PROVIDER, model_name(PROVIDER), prompt, max_tokens, temperature)
+    cache = use_cache and llm_cache.ENABLED
+    if cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            metrics.llm_cache_hits.inc(PROVIDER)
+            return cached
+    # Cached and cache-bypassing calls never share a flight: a bypass caller
+    # wants a fresh answer, and only the leader decides whether it is stored
+    return _flights.do((key, cache), _call_and_store, key if cache else None, prompt, max_tokens, temperature, user)
+
+
+def _call_and_store(key, prompt: str, max_tokens: int, temperature: float, user=None) -> str:
+    metrics.llm_prompt_chars.observe(len(prompt), PROVIDER)
+    with provider_scheduler(PROVIDER).slot(user, scheduler.estimate_tokens(prompt, max_tokens)):
+        start = time.perf_counter()
+        try:
+            text = _call_provider(prompt, max_tokens, temperature)
+        except Exception:
+            metrics.llm_latency.observe(time.perf_counter() - start, PROVIDER, "error")
+            metrics.llm_errors.inc(PROVIDER)
+            raise
+    outcome = "error" if is_error_response(text) else "ok"
+    metrics.llm_latency.observe(time.perf_counter() - start, PROVIDER, outcome)
+    if outcome == "error":
+        metrics.llm_errors.inc(PROVIDER)
+    metrics.llm_response_chars.observe(len(text), PROVIDER)
+
+    if key is not None and outcome == "ok":
+        llm_cache.put(key, text)
+    return text
+
+
+def iter_llm_many(
+    prompts,
+    max_tokens: int = 600,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    heartbeat: float | None = None,
+    user=None,
+):
+    """
+    Run several prompts concurrently (bounded by the provider cap).
+    Yields (index, text, error) as each call finishes; error is None on success.
+    With `heartbeat` set, yields (None, None, None) whenever that many seconds
+    pass without a result, so streaming callers can keep the connection alive.
+    Raises scheduler.QueueFull, rather than yielding it, when the queue is full.
+    """
+    prompts = list(prompts)
+    if not prompts:
+        return
+    pool = ThreadPoolExecutor(max_workers=min(len(prompts), concurrency_limit(PROVIDER)))
+    try:
+        futures = {
+            pool.submit(call_llm, prompt, max_tokens, temperature, use_cache, user): i
+            for i, prompt in enumerate(prompts)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=heartbeat, return_when=FIRST_COMPLETED)
+            if not done:
+                yield None, None, None
+            for fut in done:
+                try:
+                    yield futures[fut], fut.result(), None
+                except scheduler.QueueFull:
+                    raise
+                except Exception as e:
+                    yield futures[fut], None, str(e) or type(e).__name__
+    finally:
+        # Don't start queued prompts if the consumer went away
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def call_llm_many(prompts, max_tokens: int = 600, temperature: float = 0.7, use_cache: bool = True, user=None):
+    """Concurrent call_llm; returns [(text, error), ...] in prompt order."""
+    prompts = list(prompts)
+    results = [(None, None)] * len(prompts)
+    for i, text, error in iter_llm_many(prompts, max_tokens, temperature, use_cache, user=user):
+        results[i] = (text, error)
+    return results
+
+
+def _call_provider(prompt: str, max_tokens: int, temperature: float) -> str:
 
     # ----- MOCK -----
     if PROVIDER == "mock":
+        delay = MOCK_LATENCY_MS + (random.uniform(0, MOCK_JITTER_MS) if MOCK_JITTER_MS else 0)
+        if delay:
+            time.sleep(delay / 1000)
+        if MOCK_ERROR_RATE and random.random() < MOCK_ERROR_RATE:
+            # Like a failed HTTP call to a real provider
+            raise RuntimeError("Simulated mock provider failure")
         return f"[MOCK LLM RESPONSE]\nPrompt: {prompt[:180]}..."
 
     # ----- OPENAI -----
@@ -37,19 +200,18 @@ def call_llm(prompt: str, max_tokens: int = 600, temperature: float = 0.7) -> st
         if not OPENAI_API_KEY:
             return "[ERROR] OPENAI_API_KEY not set"
 
-        url = "https://api.openai.com/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {OPENAI_API_KEY}",
             "Content-Type": "application/json",
         }
         data = {
-            "model": "gpt-4o-mini",
+            "model": OPENAI_MODEL,
             "messages": [{"role": "user", "content": prompt}],
             "max_tokens": max_tokens,
             "temperature": temperature,
         }
 
-        resp = requests.post(url, headers=headers, json=data, timeout=60)
+        resp = provider_client("openai").post("/chat/completions", headers=headers, json=data)
         resp.raise_for_status()
         raw = resp.json()["choices"][0]["message"]["content"]
         return clean_markdown(raw)
@@ -59,10 +221,7 @@ def call_llm(prompt: str, max_tokens: int = 600, temperature: float = 0.7) -> st
         if not GEMINI_API_KEY:
             return "[ERROR] GEMINI_API_KEY not set"
 
-        model = "gemini-2.0-flash"
-        url = f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent?key={GEMINI_API_KEY}"
-
-        headers = {"Content-Type": "application/json"}
+        headers = {"Content-Type": "application/json", "x-goog-api-key": GEMINI_API_KEY}
         data = {
             "contents": [{"parts": [{"text": prompt}]}],
             "generationConfig": {
@@ -71,7 +230,9 @@ def call_llm(prompt: str, max_tokens: int = 600, temperature: float = 0.7) -> st
             }
         }
 
-        resp = requests.post(url, headers=headers, json=data, timeout=60)
+        resp = provider_client("gemini").post(
+            f"/models/{GEMINI_MODEL}:generateContent", headers=headers, json=data
+        )
         if resp.status_code != 200:
             return f"[GEMINI API ERROR]\n{resp.text}"
 
@@ -87,31 +248,52 @@ def call_llm(prompt: str, max_tokens: int = 600, temperature: float = 0.7) -> st
 # -------------------------
 # IMAGE GENERATION
 # -------------------------
-def generate_image(prompt: str):
+def generate_image(prompt: str, user=None):
     """
-    Generates a high-resolution professional image using AI (OpenAI DALL·E 3).
-    Returns raw PNG bytes (ready for DOCX/PPTX).
+    Generates a high-resolution professional image for a prompt.
+    Returns raw image bytes (ready for DOCX/PPTX), or None when unavailable.
+    Calls take a slot from the image provider's scheduler, shared with text
+    calls to the same provider, on behalf of `user`.
     """
+    if IMAGE_PROVIDER not in ("stub", "openai"):
+        return None  # Image supported only with the OpenAI or stub provider
 
-    if PROVIDER != "openai":
-        return None  # Image supported only when OpenAI provider is selected
-
-    if not OPENAI_API_KEY:
+    if IMAGE_PROVIDER == "openai" and not OPENAI_API_KEY:
         return None
 
-    url = "https://api.openai.com/v1/images/generations"
+    with provider_scheduler(IMAGE_PROVIDER).slot(user, scheduler.estimate_tokens(prompt, 0)):
+        if IMAGE_PROVIDER == "stub":
+            return _stub_image(prompt)
+        return _openai_image(prompt)
+
+
+def _openai_image(prompt: str) -> bytes:
     headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
     data = {
-        "model": "gpt-image-1",
+        "model": IMAGE_MODEL,
         "prompt": prompt,
-        "size": "1024x1024",
+        "size": IMAGE_SIZE,
     }
 
-    try:
-        resp = requests.post(url, json=data, headers=headers, timeout=60)
-        resp.raise_for_status()
-        b64 = resp.json()["data"][0]["b64_json"]
-        return base64.b64decode(b64)
-    except Exception as e:
-        print("Image generation failed:", e)
-        return None
+    resp = provider_client("openai").post("/images/generations", json=data, headers=headers)
+    resp.raise_for_status()
+    b64 = resp.json()["data"][0]["b64_json"]
+    return base64.b64decode(b64)
+
+
+def _stub_image(prompt: str) -> bytes:
+    """A PNG of IMAGE_SIZE whose colours depend on the prompt, after the mock latency."""
+    from PIL import Image, ImageDraw
+
+    if MOCK_LATENCY_MS or MOCK_JITTER_MS:
+        time.sleep((MOCK_LATENCY_MS + random.uniform(0, MOCK_JITTER_MS)) / 1000)
+    width, height = (int(n) for n in IMAGE_SIZE.split("x"))
+    seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+    img = Image.new("RGB", (width, height), tuple(seed[:3]))
+    draw = ImageDraw.Draw(img)
+    for i in range(8):
+        x, y = seed[3 + i] * width // 256, seed[11 + i] * height // 256
+        draw.ellipse((x - width // 6, y - height // 6, x + width // 6, y + height // 6), fill=tuple(seed[19 + i:22 + i]))
+    bio = io.BytesIO()
+    img.save(bio, "PNG")
+    return bio.getvalue()
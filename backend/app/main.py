@@ -1,16 +1,50 @@
 from dotenv import load_dotenv
 import os
+import threading
 
 load_dotenv()  # FIRST
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware, DEFAULT_EXCLUDED_CONTENT_TYPES
+from fastapi.responses import JSONResponse, PlainTextResponse
+from . import metrics, profiling
 
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000"
 ]
-app = FastAPI(title="AI-Assisted Document Authoring Platform")  # FIRST
+
+# Create/upgrade the schema on startup; turn off when deploys run `python -m app.migrations` instead
+MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "1").lower() not in ("0", "false", "no", "off")
+# Load python-docx/pptx and parse export templates in the background after startup
+TEMPLATE_WARM_UP = os.getenv("TEMPLATE_WARM_UP", "0").lower() in ("1", "true", "yes", "on")
+# Compress responses of at least GZIP_MIN_SIZE bytes for clients that accept it; GZIP_LEVEL=0 turns it off
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+@asynccontextmanager
+async def lifespan(app):
+    from . import jobs, hashing, feedback, migrations, templates, search
+    from .database import engine
+
+    if MIGRATE_ON_STARTUP:
+        migrations.upgrade()
+    # Index writes depend on this; it must be set even when migrations ran elsewhere
+    with engine.connect() as conn:
+        search.detect(conn)
+    jobs.recover()
+    jobs.purge()
+    hashing.warm_up()
+    if TEMPLATE_WARM_UP:
+        threading.Thread(target=templates.warm_up, name="template-warm-up", daemon=True).start()
+    yield
+    jobs.shutdown()
+    hashing.shutdown()
+    feedback.shutdown()
+
+app = FastAPI(title="AI-Assisted Document Authoring Platform", lifespan=lifespan)  # FIRST
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,19 +54,70 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+if GZIP_LEVEL > 0:
+    from .generator import MEDIA_TYPES
 
+    # Exports are already zip packages and section images are PNG/JPEG (SSE is
+    # excluded by default); image/* is listed so that holds whatever the defaults are
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=GZIP_MIN_SIZE,
+        compresslevel=GZIP_LEVEL,
+        exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("image/*",) + tuple(MEDIA_TYPES.values()),
+    )
+# Outermost, so latency includes CORS handling
+app.add_middleware(metrics.MetricsMiddleware, profiler=profiling.from_env())
 
-from .database import Base, engine            # AFTER MIDDLEWARE
-from .routers import auth_router, projects_router, export_router
 
-Base.metadata.create_all(bind=engine)
+from .routers import auth_router, projects_router, export_router, jobs_router
+from .http_client import CircuitOpenError
+from .hashing import HashingBusy
+from .scheduler import QueueFull
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+# /api/metrics requires "Authorization: Bearer <token>"; without a token it is
+# off (404) unless METRICS_PUBLIC=1, e.g. when only an internal network reaches it
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0").lower() in ("1", "true", "yes", "on")
 
 app.include_router(auth_router.router)
 app.include_router(projects_router.router)
 app.include_router(export_router.router)
+app.include_router(jobs_router.router)
+
+@app.exception_handler(CircuitOpenError)
+def provider_unavailable(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+@app.exception_handler(HashingBusy)
+def hashing_busy(request: Request, exc: HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+@app.exception_handler(QueueFull)
+def llm_queue_full(request: Request, exc: QueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
 
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/api/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    if METRICS_TOKEN:
+        if request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+            raise HTTPException(status_code=401, detail="Not authenticated")
+    elif not METRICS_PUBLIC:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,195 @@
+"""
+In-process metrics in the Prometheus text format, served at /api/metrics.
+
+Deliberately tiny: counters, gauges and fixed-bucket histograms keyed by a
+label tuple, each guarded by its own lock. Recording a value is a dict
+lookup, a bisect and an add, cheap enough to leave on for every request.
+Values are per process; with several workers, scrape each one.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+from . import profiling
+
+# Seconds; covers fast DB reads up to slow LLM calls and large exports
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Metrics ---------------- #
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served.")
+
+llm_latency = Histogram("llm_call_duration_seconds", "LLM provider call latency.", ("provider", "outcome"))
+llm_errors = Counter("llm_errors_total", "Failed LLM provider calls.", ("provider",))
+llm_cache_hits = Counter("llm_cache_hits_total", "LLM calls answered from the response cache.", ("provider",))
+llm_prompt_chars = Histogram("llm_prompt_chars", "Prompt size in characters.", ("provider",), SIZE_BUCKETS)
+llm_response_chars = Histogram("llm_response_chars", "Response size in characters.", ("provider",), SIZE_BUCKETS)
+llm_queue_wait = Histogram("llm_queue_wait_seconds", "Time LLM calls waited for a provider slot.", ("provider",))
+llm_queue_depth = Gauge("llm_queue_depth", "LLM calls waiting for a provider slot.", ("provider",))
+llm_rejected = Counter("llm_rejected_total", "LLM calls rejected because the queue was full.", ("provider", "reason"))
+singleflight_calls = Counter("singleflight_calls_total", "Coalesced work by group; 'shared' calls reused another caller's result.", ("group", "role"))
+generate_sections = Counter("generate_sections_total", "Sections seen by generate, regenerated or skipped as up to date.", ("outcome",))
+generate_batches = Counter("generate_batches_total", "Batched generation calls by how much of the response was usable.", ("outcome",))
+images = Counter("section_images_total", "Section image lookups by outcome (prompt_hit, generated, deduplicated, failed).", ("outcome",))
+
+export_render = Histogram("export_render_duration_seconds", "Export render time.", ("format", "writer"))
+export_bytes = Histogram("export_output_bytes", "Rendered export size.", ("format", "writer"), SIZE_BUCKETS)
+
+db_sessions = Counter("db_sessions_total", "Request-scoped DB sessions opened.", ("engine",))
+db_session_duration = Histogram("db_session_duration_seconds", "Lifetime of request-scoped DB sessions.", ("engine",))
+db_checkouts = Counter("db_connection_checkouts_total", "Connections taken from the pool.", ("engine",))
+db_in_use = Gauge("db_connections_in_use", "Pooled connections currently checked out.", ("engine",))
+db_hold = Histogram("db_connection_hold_seconds", "How long a pooled connection stays checked out.", ("engine",))
+
+
+def instrument_engine(engine, name: str):
+    """Track pool checkouts, connections in use and how long each is held (one per session transaction)."""
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        record.info["metrics_checkout"] = time.perf_counter()
+        db_checkouts.inc(name)
+        db_in_use.inc(name)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        start = record.info.pop("metrics_checkout", None)
+        if start is not None:
+            db_in_use.dec(name)
+            db_hold.observe(time.perf_counter() - start, name)
+
+
+# ---------------- HTTP middleware ---------------- #
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency; works with streaming responses."""
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        sample = self.profiler.start() if self.profiler else None
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            with profiling.activate(sample):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(scope["method"], route, status["code"])
+            http_latency.observe(elapsed, scope["method"], route)
+            if sample is not None:
+                await run_in_threadpool(self.profiler.finish, sample, elapsed, scope["method"], route)
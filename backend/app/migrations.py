@@ -0,0 +1,116 @@
+"""
+Minimal schema upgrades for existing databases.
+
+Base.metadata.create_all only creates missing tables. This also adds columns
+and indexes that were introduced after a table was first created, and runs
+one-off data backfills. Every step is idempotent.
+
+Runs in the app's startup (unless DB_MIGRATE_ON_STARTUP=0) or on its own:
+
+    python -m app.migrations
+"""
+import datetime
+import json
+from types import SimpleNamespace
+
+from sqlalchemy import inspect, text, select, update, or_
+
+from . import fingerprints, models, search  # models registers the tables on Base.metadata
+from .database import Base, engine
+
+
+def _add_missing_columns(conn):
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {ddl_type}'))
+            added.append((table.name, column.name))
+    return added
+
+
+def _create_missing_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _backfill(conn, added):
+    if ("projects", "updated_at") in added:
+        conn.execute(text("UPDATE projects SET updated_at = created_at WHERE updated_at IS NULL"))
+    if ("projects", "version") in added:
+        conn.execute(text("UPDATE projects SET version = 1 WHERE version IS NULL"))
+    if ("sections", "fingerprint") in added:
+        _fingerprint_sections(conn)
+
+
+def _fingerprint_sections(conn):
+    """Treat content written before fingerprints existed as up to date, so generate keeps it."""
+    sections, projects = models.Section.__table__, models.Project.__table__
+    rows = conn.execute(
+        select(sections.c.id, sections.c.title, projects.c.title.label("project_title"), projects.c.topic, projects.c.doc_type)
+        .join(projects, projects.c.id == sections.c.project_id)
+        .where(sections.c.content != "")
+    ).all()
+    for row in rows:
+        project = SimpleNamespace(title=row.project_title, topic=row.topic, doc_type=row.doc_type)
+        conn.execute(
+            update(sections).where(sections.c.id == row.id)
+            .values(fingerprint=fingerprints.fingerprint(project, SimpleNamespace(title=row.title)))
+        )
+
+
+def _json_list(raw):
+    try:
+        items = json.loads(raw) if raw else []
+    except ValueError:
+        return []
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def _move_section_blobs(conn):
+    """Copy the legacy JSON history/comment lists into their own tables, then clear them."""
+    sections = models.Section.__table__
+    pending = or_(sections.c.refinement_history != "", sections.c.comments != "")
+    rows = conn.execute(
+        select(sections.c.id, sections.c.refinement_history, sections.c.comments).where(pending)
+    ).all()
+    if not rows:
+        return
+    # The blobs carry no timestamps; ids keep their original order
+    now = datetime.datetime.utcnow()
+    revisions, comments = [], []
+    for section_id, history, notes in rows:
+        revisions += [
+            {"section_id": section_id, "instruction": item.get("instruction") or "", "result": item.get("result") or "", "created_at": now}
+            for item in _json_list(history)
+        ]
+        comments += [
+            {"section_id": section_id, "comment": item["comment"], "created_at": now}
+            for item in _json_list(notes) if item.get("comment")
+        ]
+    if revisions:
+        conn.execute(models.SectionRevision.__table__.insert(), revisions)
+    if comments:
+        conn.execute(models.SectionComment.__table__.insert(), comments)
+    conn.execute(update(sections).where(pending).values(refinement_history="", comments=""))
+
+
+def upgrade(bind=engine):
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        added = _add_missing_columns(conn)
+        _create_missing_indexes(conn)
+        _backfill(conn, added)
+        _move_section_blobs(conn)
+        search.ensure_index(conn)
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Index, event, update, literal_column
+from sqlalchemy.orm import relationship, deferred, Session
 from .database import Base
 import datetime
 
@@ -20,20 +20,99 @@ class Project(Base):
     doc_type = Column(String, nullable=False)  # 'docx' or 'pptx'
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # Bumped by every write to the project or its sections; the API's ETags are built from it
+    version = Column(Integer, nullable=False, default=1, onupdate=literal_column("version + 1"))
 
     owner = relationship("User", back_populates="projects")
     sections = relationship("Section", back_populates="project", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of a user's projects, newest first
+        Index("ix_projects_owner_updated", "owner_id", "updated_at", "id"),
+    )
+
 class Section(Base):
     __tablename__ = "sections"
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
     title = Column(String, nullable=False)
     content = Column(Text, default="")
-    refinement_history = Column(Text, default="")  # JSON list
+    # Legacy JSON lists, moved to section_revisions / section_comments by migrations
+    refinement_history = deferred(Column(Text, default=""))
     likes = Column(Integer, default=0)
     dislikes = Column(Integer, default=0)
-    comments = Column(Text, default="")  # JSON list
+    comments = deferred(Column(Text, default=""))
     order = Column(Integer, default=0)
+    # Blob id in the image store (see images.py), embedded by the exporters
+    image_id = Column(String, nullable=True)
+    # Hash of the inputs the content was generated from (see fingerprints.py);
+    # generate skips sections whose fingerprint still matches
+    fingerprint = Column(String, nullable=True)
 
     project = relationship("Project", back_populates="sections")
+    # Write-only: appends are plain INSERTs and never load the existing rows
+    revisions = relationship("SectionRevision", lazy="write_only", cascade="all, delete-orphan", passive_deletes=True)
+    comment_entries = relationship("SectionComment", lazy="write_only", cascade="all, delete-orphan", passive_deletes=True)
+
+class SectionRevision(Base):
+    __tablename__ = "section_revisions"
+    id = Column(Integer, primary_key=True)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"), nullable=False)
+    instruction = Column(Text, nullable=False)
+    result = Column(Text, default="")
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_section_revisions_section_created", "section_id", "created_at", "id"),
+    )
+
+class SectionComment(Base):
+    __tablename__ = "section_comments"
+    id = Column(Integer, primary_key=True)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"), nullable=False)
+    comment = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_section_comments_section_created", "section_id", "created_at", "id"),
+    )
+
+# Section writes (generate, refine, ...) also bump their project's updated_at and version
+@event.listens_for(Session, "before_flush")
+def _collect_touched_projects(session, flush_context, instances):
+    touched = session.info.setdefault("touched_projects", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Section) and obj.project_id is not None:
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            touched.add(obj.project_id)
+
+@event.listens_for(Session, "after_flush")
+def _touch_projects(session, flush_context):
+    touched = session.info.pop("touched_projects", None)
+    if touched:
+        session.connection().execute(
+            update(Project.__table__)
+            .where(Project.__table__.c.id.in_(touched))
+            .values(updated_at=datetime.datetime.utcnow(), version=Project.__table__.c.version + 1)
+        )
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    kind = Column(String, nullable=False)  # 'generate', 'refine_all' or 'export'
+    params = Column(Text, default="")  # JSON object
+    status = Column(String, default="queued", index=True)  # queued / running / succeeded / failed
+    progress = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    result = Column(Text, default="")  # JSON object
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Lease: the process that owns an unfinished job and when it last said so
+    worker = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
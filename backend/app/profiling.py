@@ -0,0 +1,159 @@
+"""
+Optional sampling profiler for slow requests.
+
+With PROFILE_SLOW_MS > 0, a fraction (PROFILE_SAMPLE_RATE) of requests is
+profiled. While such a request runs, a background thread samples the stack of
+the thread running its endpoint every PROFILE_INTERVAL_MS; other requests'
+threads are left out. If the request took at least PROFILE_SLOW_MS, the
+samples are written to PROFILE_DIR in collapsed-stack format, one
+`frame;frame;frame count` line per stack, which flamegraph.pl and speedscope
+read directly. Requests that turn out fast are discarded.
+
+Endpoints are tracked by routers created with route_class=ProfiledRoute.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+
+load_dotenv()
+
+SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Sampler of the request being handled; copied into threadpool workers with the context
+_current = contextvars.ContextVar("profile_sampler", default=None)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.threads = Counter()  # thread id -> endpoint calls running on it
+        self._threads_lock = threading.Lock()
+        self._done = threading.Event()
+
+    def attach(self, thread_id: int):
+        with self._threads_lock:
+            self.threads[thread_id] += 1
+
+    def detach(self, thread_id: int):
+        with self._threads_lock:
+            self.threads[thread_id] -= 1
+            if not self.threads[thread_id]:
+                del self.threads[thread_id]
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            with self._threads_lock:
+                thread_ids = list(self.threads)
+            if not thread_ids:
+                continue
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+@contextmanager
+def activate(sampler):
+    """Make `sampler` the current request's sampler (None is a no-op)."""
+    token = _current.set(sampler)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def _tracked_thread():
+    sampler = _current.get()
+    if sampler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    sampler.attach(thread_id)
+    try:
+        yield
+    finally:
+        sampler.detach(thread_id)
+
+
+def _track(endpoint):
+    """Wrap an endpoint so the thread it runs on is sampled for a profiled request."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def tracked(*args, **kwargs):
+            with _tracked_thread():
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def tracked(*args, **kwargs):
+            with _tracked_thread():
+                return endpoint(*args, **kwargs)
+    return tracked
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint registers its thread (event loop or threadpool worker) with the profiler."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _track(endpoint), **kwargs)
+
+
+class SlowRequestProfiler:
+    def __init__(self, slow_ms: float = SLOW_MS, sample_rate: float = SAMPLE_RATE,
+                 interval_ms: float = INTERVAL_MS, directory: str = PROFILE_DIR):
+        self.slow = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.directory = directory
+
+    def start(self):
+        if random.random() >= self.sample_rate:
+            return None
+        sampler = _Sampler(self.interval)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler, elapsed: float, method: str, route: str):
+        """Stop sampling and save the profile of a slow request; blocking, so run it off the event loop."""
+        sampler.stop()
+        if elapsed < self.slow or not sampler.stacks:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{method}-{_UNSAFE.sub('_', route).strip('_')}.txt"
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def from_env():
+    """The configured profiler, or None when PROFILE_SLOW_MS is unset."""
+    return SlowRequestProfiler() if SLOW_MS > 0 else None
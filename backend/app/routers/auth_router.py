@@ -1,25 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
-from .. import schemas, models, auth
+from .. import schemas, models, auth, hashing, profiling
 from ..database import get_db
+from ..deps import get_current_principal
 
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], route_class=profiling.ProfiledRoute)
 
-@router.post("/register", response_model=schemas.Token)
-def register(u: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.email == u.email).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
+# Handlers are async so a pending hash waits on the hashing pool without
+# holding a threadpool thread; database work is handed back to the threadpool.
 
-    user = models.User(
-        email=u.email,
-        hashed_password=auth.get_password_hash(u.password),
-    )
+def _find_user(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def _create_user(db: Session, email: str, hashed_password: str):
+    user = models.User(email=email, hashed_password=hashed_password)
     db.add(user)
     db.commit()
     db.refresh(user)
+    return user
 
+def _update_hash(db: Session, user, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+def _token_for(user) -> schemas.Token:
     # ⭐ FIX — convert user.id to string
     token = auth.create_access_token(
         {"sub": str(user.id)},
@@ -27,15 +33,36 @@ def register(u: schemas.UserCreate, db: Session = Depends(get_db)):
     )
     return schemas.Token(access_token=token)
 
+@router.post("/register", response_model=schemas.Token)
+async def register(u: schemas.UserCreate, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(_find_user, db, u.email)
+    if existing:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    hashed_password = await hashing.hash_async(u.password)
+    user = await run_in_threadpool(_create_user, db, u.email, hashed_password)
+    return _token_for(user)
+
 @router.post("/login", response_model=schemas.Token)
-def login(u: schemas.UserCreate, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == u.email).first()
-    if not user or not auth.verify_password(u.password, user.hashed_password):
+async def login(u: schemas.UserCreate, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, u.email)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    # ⭐ FIX — convert user.id to string
+    ok, new_hash = await hashing.verify_and_update_async(u.password, user.hashed_password)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored with an older scheme or fewer rounds than PASSWORD_HASH_ROUNDS
+        await run_in_threadpool(_update_hash, db, user, new_hash)
+
+    return _token_for(user)
+
+@router.post("/stream-token", response_model=schemas.Token)
+def stream_token(user=Depends(get_current_principal)):
+    """Short-lived token for ?access_token= on event streams, which can't send headers."""
     token = auth.create_access_token(
-        {"sub": str(user.id)},
-        timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+        {"sub": str(user.id), "scope": auth.STREAM_SCOPE},
+        timedelta(minutes=auth.STREAM_TOKEN_EXPIRE_MINUTES),
     )
     return schemas.Token(access_token=token)
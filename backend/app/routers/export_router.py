@@ -1,22 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..deps import get_current_user
-from .. import models
-from ..generator import assemble_docx, assemble_pptx
+from sqlalchemy.orm import Session, selectinload
+from ..database import get_read_db
+from ..deps import get_current_principal
+from .. import models, export_cache, templates, profiling
+from ..generator import iter_export, export_format, export_filename, MEDIA_TYPES
 
-router = APIRouter(prefix="/api/export", tags=["export"])
+router = APIRouter(prefix="/api/export", tags=["export"], route_class=profiling.ProfiledRoute)
+
+@router.get("/templates")
+def list_templates(user=Depends(get_current_principal)):
+    return templates.available()
 
 @router.get("/{project_id}")
 def export_project(
     project_id: int,
     format: str = "auto",  # 'docx', 'pptx', or 'auto'
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    template: Optional[str] = None,  # brand template name, see /templates
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
 ):
     project = (
         db.query(models.Project)
+        .options(selectinload(models.Project.sections))
         .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
         .first()
     )
@@ -24,21 +33,32 @@ def export_project(
         raise HTTPException(status_code=404, detail="Project not found")
 
     sections = project.sections
+    fmt = export_format(project, format)
+    try:
+        digest = export_cache.content_hash(project, sections, fmt, template)
+    except templates.TemplateNotFound:
+        raise HTTPException(status_code=404, detail=f"Template '{template}' not found for {fmt}")
+    cache_headers = {
+        "ETag": export_cache.etag(digest),
+        "Cache-Control": "private, no-cache",
+    }
+    if export_cache.etag_matches(if_none_match, digest):
+        return Response(status_code=304, headers=cache_headers)
 
-    doc_type = project.doc_type
-    if format in ("docx", "pptx"):
-        doc_type = format
-
-    if doc_type == "pptx":
-        bio = assemble_pptx(project, sections)
-        filename = f"project_{project.id}.pptx"
-        media_type = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-    else:
-        bio = assemble_docx(project, sections)
-        filename = f"project_{project.id}.docx"
-        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    if export_cache.ENABLED:
+        # Opened here rather than by FileResponse after we return, so a concurrent
+        # invalidation can't remove the file before it is sent
+        f, filename, media_type, _ = export_cache.open_render(project, sections, fmt, template)
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(os.fstat(f.fileno()).st_size),
+            **cache_headers,
+        }
+        return StreamingResponse(export_cache.iter_file(f), media_type=media_type, headers=headers)
 
+    filename = export_filename(project, fmt)
     headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"'
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        **cache_headers,
     }
-    return StreamingResponse(bio, media_type=media_type, headers=headers)
+    return StreamingResponse(iter_export(project, sections, fmt, template), media_type=MEDIA_TYPES[fmt], headers=headers)
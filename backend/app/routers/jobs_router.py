@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from .. import schemas, models, jobs, sse, templates, profiling
+from ..generator import export_format
+from ..database import get_db, SessionLocal
+from ..deps import get_current_principal, get_stream_principal
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"], route_class=profiling.ProfiledRoute)
+
+POLL_SECONDS = 0.5
+
+def _job_out(job: models.Job) -> schemas.JobOut:
+    result = json.loads(job.result) if job.result else None
+    if result:
+        result.pop("path", None)  # server-side file location
+    return schemas.JobOut(
+        id=job.id,
+        kind=job.kind,
+        project_id=job.project_id,
+        status=job.status,
+        progress=job.progress or 0,
+        total=job.total or 0,
+        result=result,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+def _get_job(db: Session, job_id: int, user) -> models.Job:
+    job = (
+        db.query(models.Job)
+        .filter(models.Job.id == job_id, models.Job.owner_id == user.id)
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/", response_model=schemas.JobOut, status_code=202)
+def create_job(body: schemas.JobCreate, db: Session = Depends(get_db), user=Depends(get_current_principal)):
+    if body.kind not in jobs.KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(jobs.KINDS)}")
+    if body.kind == "refine_all" and not body.instruction:
+        raise HTTPException(status_code=400, detail="instruction is required for refine_all")
+
+    project = (
+        db.query(models.Project)
+        .filter(models.Project.id == body.project_id, models.Project.owner_id == user.id)
+        .first()
+    )
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if body.kind == "export" and body.template:
+        try:
+            templates.fingerprint(export_format(project, body.format), body.template)
+        except templates.TemplateNotFound:
+            raise HTTPException(status_code=404, detail=f"Template '{body.template}' not found")
+
+    params = {"use_cache": body.use_cache}
+    if body.kind == "generate":
+        params["images"] = body.images
+        params["force"] = body.force
+    if body.kind == "refine_all":
+        params["instruction"] = body.instruction
+    if body.kind == "export":
+        params["format"] = body.format
+        params["template"] = body.template
+    job = jobs.submit(db, user.id, project.id, body.kind, params)
+    return _job_out(job)
+
+@router.get("/{job_id}", response_model=schemas.JobOut)
+def get_job(job_id: int, db: Session = Depends(get_db), user=Depends(get_current_principal)):
+    return _job_out(_get_job(db, job_id, user))
+
+@router.get("/{job_id}/stream")
+def stream_job(job_id: int, db: Session = Depends(get_db), user=Depends(get_stream_principal)):
+    """Server-Sent Events: a `status` event on every change, ending once the job finishes."""
+    _get_job(db, job_id, user)
+    return StreamingResponse(_job_events(job_id), media_type="text/event-stream", headers=sse.HEADERS)
+
+def _job_events(job_id: int):
+    db = SessionLocal()
+    try:
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            db.expire_all()
+            job = db.query(models.Job).filter(models.Job.id == job_id).first()
+            if job is None:
+                return
+            data = _job_out(job).model_dump(mode="json")
+            if data != last:
+                yield sse.event("status", data)
+                last = data
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= sse.HEARTBEAT_SECONDS:
+                yield sse.comment()
+                last_sent = time.monotonic()
+            if job.status in jobs.FINISHED:
+                return
+            time.sleep(POLL_SECONDS)
+    finally:
+        db.close()
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: int, db: Session = Depends(get_db), user=Depends(get_current_principal)):
+    job = _get_job(db, job_id, user)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    result = json.loads(job.result) if job.result else {}
+    if job.kind == "export":
+        path = result.get("path")
+        if not path or not os.path.exists(path):
+            raise HTTPException(status_code=410, detail="Export file is no longer available")
+        return FileResponse(path, media_type=result["media_type"], filename=result["filename"])
+    return result
@@ -1,21 +1,170 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from datetime import datetime
+import base64
 import json
 
-from .. import schemas, models, llm_client
-from ..database import get_db
-from ..deps import get_current_user
+from .. import schemas, models, llm_client, content, sse, feedback, search, images, profiling
+from ..database import get_db, get_read_db, SessionLocal
+from ..deps import get_current_principal, get_stream_principal
+from ..http_client import CircuitOpenError
+from ..scheduler import QueueFull
 
-router = APIRouter(prefix="/api/projects", tags=["projects"])
+router = APIRouter(prefix="/api/projects", tags=["projects"], route_class=profiling.ProfiledRoute)
+
+def _encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _keyset_page(q, ts_col, id_col, limit: int, cursor: Optional[str]):
+    """Newest-first page of q ordered by (ts_col, id_col); returns (rows, next_cursor)."""
+    if cursor:
+        timestamp, last_id = _decode_cursor(cursor)
+        q = q.filter(or_(ts_col < timestamp, and_(ts_col == timestamp, id_col < last_id)))
+    rows = q.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(getattr(last, ts_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
+
+# Project reads are polled by the editor. They carry weak ETags built from the
+# projects' version counters, and a matching If-None-Match is answered with a
+# 304 after a single small query, before any section is loaded.
+
+def _etag(*parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+def _not_modified(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or tag.removeprefix("W/") in tags
+
+def _list_etag(db: Session, user_id: int, kind: str, *page) -> str:
+    # Any write bumps a version; creating a project raises max(id), deleting one lowers the count.
+    # `page` (limit, cursor) tells pages of the same list apart
+    count, versions, last_id = (
+        db.query(func.count(models.Project.id), func.coalesce(func.sum(models.Project.version), 0), func.coalesce(func.max(models.Project.id), 0))
+        .filter(models.Project.owner_id == user_id)
+        .one()
+    )
+    return _etag(kind, user_id, count, versions, last_id, *page)
+
+def _conditional(response: Response, if_none_match: Optional[str], tag: str):
+    """Set the validator headers; returns a 304 response when the client's copy is current."""
+    headers = {"ETag": tag, "Cache-Control": "private, no-cache"}
+    if _not_modified(if_none_match, tag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def _call_llm(prompt: str, failure: str, **kwargs) -> str:
+    """call_llm for a single-call endpoint; a failed provider call is a 502, as in /generate."""
+    try:
+        text = llm_client.call_llm(prompt, **kwargs)
+    except (QueueFull, CircuitOpenError):
+        raise  # 429 / 503 from their exception handlers
+    except Exception as e:
+        raise HTTPException(status_code=502, detail={"message": failure, "error": str(e) or type(e).__name__})
+    if llm_client.is_error_response(text):
+        raise HTTPException(status_code=502, detail={"message": failure, "error": text})
+    return text
+
+def _owned_section(db: Session, user, project_id: int, section_id: int):
+    section = (
+        db.query(models.Section)
+        .join(models.Project)
+        .filter(
+            models.Section.id == section_id,
+            models.Section.project_id == project_id,
+            models.Project.owner_id == user.id,
+        )
+        .first()
+    )
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+    return section
 
 @router.get("/", response_model=List[schemas.ProjectOut])
-def list_projects(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    projects = db.query(models.Project).filter(models.Project.owner_id == user.id).all()
+def list_projects(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    not_modified = _conditional(response, if_none_match, _list_etag(db, user.id, "projects"))
+    if not_modified:
+        return not_modified
+    projects = (
+        db.query(models.Project)
+        .options(selectinload(models.Project.sections))
+        .filter(models.Project.owner_id == user.id)
+        .all()
+    )
     return projects
 
+@router.get("/summary", response_model=schemas.ProjectPage)
+def list_project_summaries(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    """Newest-first project list without section content, paginated by an opaque cursor."""
+    # Re-encoded, so the tag only holds base64url characters whatever the client sent
+    page_cursor = _encode_cursor(*_decode_cursor(cursor)) if cursor else ""
+    not_modified = _conditional(response, if_none_match, _list_etag(db, user.id, "summary", limit, page_cursor))
+    if not_modified:
+        return not_modified
+    section_count = (
+        select(func.count(models.Section.id))
+        .where(models.Section.project_id == models.Project.id)
+        .correlate(models.Project)
+        .scalar_subquery()
+    )
+    q = db.query(
+        models.Project.id,
+        models.Project.title,
+        models.Project.topic,
+        models.Project.doc_type,
+        models.Project.updated_at,
+        models.Project.version,
+        section_count.label("section_count"),
+    ).filter(models.Project.owner_id == user.id)
+
+    rows, next_cursor = _keyset_page(q, models.Project.updated_at, models.Project.id, limit, cursor)
+    items = [schemas.ProjectSummary(**row._asdict()) for row in rows]
+    return schemas.ProjectPage(items=items, next_cursor=next_cursor)
+
+@router.get("/search", response_model=schemas.SearchResults)
+def search_projects(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    """Ranked full-text matches in the caller's project titles/topics and section titles/content."""
+    return {"query": q, "items": search.search(db, user.id, q, limit, offset)}
+
 @router.post("/", response_model=schemas.ProjectOut)
-def create_project(p: schemas.ProjectCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def create_project(p: schemas.ProjectCreate, db: Session = Depends(get_db), user=Depends(get_current_principal)):
     if p.doc_type not in ("docx", "pptx"):
         raise HTTPException(status_code=400, detail="doc_type must be 'docx' or 'pptx'")
     project = models.Project(
@@ -41,9 +190,27 @@ def create_project(p: schemas.ProjectCreate, db: Session = Depends(get_db), user
     return project
 
 @router.get("/{project_id}", response_model=schemas.ProjectOut)
-def get_project(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def get_project(
+    project_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    version = (
+        db.query(models.Project.version)
+        .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
+        .scalar()
+    )
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    not_modified = _conditional(response, if_none_match, _etag("project", project_id, version))
+    if not_modified:
+        return not_modified
+
     project = (
         db.query(models.Project)
+        .options(selectinload(models.Project.sections))
         .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
         .first()
     )
@@ -52,7 +219,19 @@ def get_project(project_id: int, db: Session = Depends(get_db), user=Depends(get
     return project
 
 @router.post("/{project_id}/generate")
-def generate_content(project_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def generate_content(
+    project_id: int,
+    use_cache: bool = True,
+    images: bool = False,
+    force: bool = False,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_principal),
+):
+    """
+    Generate content for sections that are empty or whose title, the project's
+    topic or doc type changed since they were generated; force=true regenerates
+    every section.
+    """
     project = (
         db.query(models.Project)
         .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
@@ -61,27 +240,115 @@ def generate_content(project_id: int, db: Session = Depends(get_db), user=Depend
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    sections = project.sections
-    for s in sections:
-        base_topic = project.topic or project.title
-        prompt = (
-            f"Generate content for a {'slide' if project.doc_type=='pptx' else 'document section'} titled '{s.title}'.\n"
-            f"Main topic: {base_topic}.\n"
-            "Write clear, structured, business-style content. Use bullet points for PPT, paragraphs for DOCX. "
-            "Make it concise but informative."
-        )
-        s.content = llm_client.call_llm(prompt)
+    sections = content.ordered_sections(project)
+    stale = content.stale_sections(project, sections, force)
+    skipped = len(sections) - len(stale)
+    with_images = content.image_sections(sections, stale) if images else []
+    pending_images = content.start_images(project, with_images, use_cache)
+    errors = []
+    for s, text, error in content.generate_sections(project, stale, use_cache=use_cache):
+        if error:
+            errors.append({"section_id": s.id, "title": s.title, "error": error})
+            continue
+        content.apply_generated(project, s, text)
         db.add(s)
+    content.apply_images(with_images, pending_images)
     db.commit()
-    return {"status": "ok", "message": "Content generated."}
+
+    if stale and len(errors) == len(stale):
+        raise HTTPException(status_code=502, detail={"message": "Content generation failed.", "errors": errors})
+    if errors:
+        return {"status": "partial", "message": f"Generated {len(stale) - len(errors)} of {len(stale)} sections.", "skipped": skipped, "errors": errors}
+    if not stale:
+        return {"status": "ok", "message": "All sections are up to date.", "skipped": skipped}
+    return {"status": "ok", "message": "Content generated.", "skipped": skipped}
+
+@router.get("/{project_id}/generate/stream")
+def generate_content_stream(
+    project_id: int,
+    use_cache: bool = True,
+    images: bool = False,
+    force: bool = False,
+    db: Session = Depends(get_db),
+    user=Depends(get_stream_principal),
+):
+    """
+    Server-Sent Events variant of /generate. Emits `start` (with how many
+    up-to-date sections are skipped), then `section`
+    (with the content) or `error` per section as each finishes, `progress`
+    after each, `image` per section that got one (with images=true) and a
+    final `done`.
+    """
+    project = (
+        db.query(models.Project)
+        .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
+        .first()
+    )
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    # Fail with a 429 up front rather than inside the stream
+    llm_client.provider_scheduler().check(user.id)
+
+    return StreamingResponse(
+        _generation_events(project.id, use_cache, images, force),
+        media_type="text/event-stream",
+        headers=sse.HEADERS,
+    )
+
+def _generation_events(project_id: int, use_cache: bool, images: bool = False, force: bool = False):
+    # The request-scoped session may be closed before the stream is consumed
+    db = SessionLocal()
+    try:
+        project = db.query(models.Project).filter(models.Project.id == project_id).first()
+        sections = content.ordered_sections(project)
+        stale = content.stale_sections(project, sections, force)
+        total = len(stale)
+        done = 0
+        errors = 0
+        yield sse.event("start", {"project_id": project_id, "total": total, "skipped": len(sections) - total})
+        with_images = content.image_sections(sections, stale) if images else []
+        pending_images = content.start_images(project, with_images, use_cache)
+
+        results = content.iter_generate(project, stale, use_cache=use_cache, heartbeat=sse.HEARTBEAT_SECONDS)
+        try:
+            for s, text, error in results:
+                if s is None:
+                    yield sse.comment()
+                    continue
+                done += 1
+                if error:
+                    errors += 1
+                    yield sse.event("error", {"section_id": s.id, "order": s.order, "title": s.title, "error": error})
+                else:
+                    content.apply_generated(project, s, text)
+                    db.add(s)
+                    db.commit()
+                    yield sse.event("section", {"section_id": s.id, "order": s.order, "title": s.title, "content": text})
+                yield sse.event("progress", {"done": done, "total": total, "errors": errors})
+        except QueueFull as e:
+            # Sections not generated yet count as failed
+            errors += total - done
+            yield sse.event("error", {"error": str(e), "retry_after": max(1, round(e.retry_after))})
+
+        if pending_images and content.apply_images(with_images, pending_images):
+            db.commit()
+            for s in with_images:
+                if s.image_id:
+                    yield sse.event("image", {"section_id": s.id, "image_id": s.image_id})
+
+        status = "ok" if not errors else ("error" if errors == total else "partial")
+        yield sse.event("done", {"status": status, "generated": total - errors, "errors": errors})
+    finally:
+        db.close()
 
 @router.post("/{project_id}/sections/{section_id}/refine")
 def refine_section(
     project_id: int,
     section_id: int,
     body: schemas.RefineRequest,
+    use_cache: bool = True,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    user=Depends(get_current_principal),
 ):
     project = (
         db.query(models.Project)
@@ -99,20 +366,8 @@ def refine_section(
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    prompt = (
-        f"Original content:\n{section.content}\n\n"
-        f"Instruction: {body.instruction}\n"
-        "Return ONLY the improved content, without any explanation."
-    )
-    new_content = llm_client.call_llm(prompt)
-
-    try:
-        history = json.loads(section.refinement_history) if section.refinement_history else []
-    except Exception:
-        history = []
-    history.append({"instruction": body.instruction, "result": new_content})
-    section.refinement_history = json.dumps(history)
-    section.content = new_content
+    new_content = _call_llm(content.refine_prompt(section, body.instruction), "Refinement failed.", use_cache=use_cache, user=user.id)
+    content.apply_refinement(section, body.instruction, new_content)
     db.add(section)
     db.commit()
     db.refresh(section)
@@ -124,43 +379,92 @@ def feedback_section(
     section_id: int,
     body: schemas.FeedbackRequest,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    user=Depends(get_current_principal),
 ):
-    project = (
-        db.query(models.Project)
-        .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
-        .first()
-    )
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    section = (
-        db.query(models.Section)
-        .filter(models.Section.id == section_id, models.Section.project_id == project.id)
+    # One ownership check; counters are bumped in SQL without loading the row
+    owned = (
+        db.query(models.Section.id)
+        .join(models.Project)
+        .filter(
+            models.Section.id == section_id,
+            models.Section.project_id == project_id,
+            models.Project.owner_id == user.id,
+        )
         .first()
     )
-    if not section:
+    if not owned:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    if body.action == "like":
-        section.likes = (section.likes or 0) + 1
-    elif body.action == "dislike":
-        section.dislikes = (section.dislikes or 0) + 1
-
+    feedback.record(db, section_id, body.action)
     if body.comment:
-        try:
-            comments = json.loads(section.comments) if section.comments else []
-        except Exception:
-            comments = []
-        comments.append({"comment": body.comment})
-        section.comments = json.dumps(comments)
-
-    db.add(section)
+        db.add(models.SectionComment(section_id=section_id, comment=body.comment))
     db.commit()
     return {"status": "ok"}
 
+@router.get("/{project_id}/sections/{section_id}/image")
+def section_image(
+    project_id: int,
+    section_id: int,
+    variant: str = "page",  # 'page' or 'slide'
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    """The section's image as embedded in exports."""
+    if variant not in images.VARIANTS:
+        raise HTTPException(status_code=400, detail=f"variant must be one of {', '.join(images.VARIANTS)}")
+    section = _owned_section(db, user, project_id, section_id)
+    if not section.image_id:
+        raise HTTPException(status_code=404, detail="Section has no image")
+    # The URL is per section, whose image can be replaced, so clients revalidate;
+    # the ETag is the blob id, so an unchanged image is a 304 without touching the store
+    headers = {"ETag": f'"{section.image_id}.{variant}"', "Cache-Control": "private, no-cache"}
+    if _not_modified(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    found = images.variant(section.image_id, variant)
+    if not found:
+        raise HTTPException(status_code=404, detail="Section has no image")
+    path, _, _, fmt = found
+    return FileResponse(path, media_type="image/png" if fmt == "png" else "image/jpeg", headers=headers)
+
+@router.get("/{project_id}/sections/{section_id}/revisions", response_model=schemas.RevisionPage)
+def list_revisions(
+    project_id: int,
+    section_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    """Refinement history of a section, newest first."""
+    section = _owned_section(db, user, project_id, section_id)
+    q = db.query(models.SectionRevision).filter(models.SectionRevision.section_id == section.id)
+    rows, next_cursor = _keyset_page(q, models.SectionRevision.created_at, models.SectionRevision.id, limit, cursor)
+    return {"items": rows, "next_cursor": next_cursor}
+
+@router.get("/{project_id}/sections/{section_id}/comments", response_model=schemas.CommentPage)
+def list_comments(
+    project_id: int,
+    section_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_principal),
+):
+    """Comments left on a section, newest first."""
+    section = _owned_section(db, user, project_id, section_id)
+    q = db.query(models.SectionComment).filter(models.SectionComment.section_id == section.id)
+    rows, next_cursor = _keyset_page(q, models.SectionComment.created_at, models.SectionComment.id, limit, cursor)
+    return {"items": rows, "next_cursor": next_cursor}
+
 @router.post("/{project_id}/ai-template")
-def ai_template(project_id: int, body: schemas.TemplateRequest, db: Session = Depends(get_db), user=Depends(get_current_user)):
+def ai_template(
+    project_id: int,
+    body: schemas.TemplateRequest,
+    use_cache: bool = True,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_principal),
+):
     project = (
         db.query(models.Project)
         .filter(models.Project.id == project_id, models.Project.owner_id == user.id)
@@ -174,7 +478,7 @@ def ai_template(project_id: int, body: schemas.TemplateRequest, db: Session = De
         f"Type: {'PowerPoint slides' if body.doc_type=='pptx' else 'Word document'}. "
         "Return 6-8 clear section or slide titles as a JSON array of strings."
     )
-    raw = llm_client.call_llm(prompt)
+    raw = _call_llm(prompt, "Outline generation failed.", use_cache=use_cache, user=user.id)
     try:
         titles = json.loads(raw)
         if not isinstance(titles, list):
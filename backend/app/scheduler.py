@@ -0,0 +1,232 @@
+"""
+Fair scheduling of LLM calls across users.
+
+Every provider call takes a slot from its provider's Scheduler first. A slot
+is granted when all of these allow it:
+
+- the provider's concurrency limit (LLM_CONCURRENCY_<PROVIDER>),
+- its request and token rate limits (LLM_RPM_<PROVIDER>, LLM_TPM_<PROVIDER>;
+  0 = unlimited), as token buckets holding up to a minute's allowance,
+- the caller's own concurrency quota (LLM_USER_CONCURRENCY), as long as
+  someone within their quota is waiting; slots nobody else can use go to
+  users over it, so a lone user still gets the whole provider.
+
+Waiting calls are queued per user and served by deficit round-robin, with
+each call costing its estimated tokens, so a user with ten big generations
+queued gets the same share as one refining a single section. When a user's
+queue (LLM_USER_MAX_QUEUE) or the whole queue (LLM_MAX_QUEUE) is full the call
+is rejected with QueueFull, which the API turns into a 429.
+"""
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from . import metrics
+
+load_dotenv()
+
+USER_CONCURRENCY = int(os.getenv("LLM_USER_CONCURRENCY", "0"))  # 0 = half the provider's limit
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "512"))
+USER_MAX_QUEUE = int(os.getenv("LLM_USER_MAX_QUEUE", "64"))
+QUANTUM = int(os.getenv("LLM_SCHED_QUANTUM", "1000"))  # tokens added to a user's deficit per round
+
+SYSTEM_USER = "system"  # calls made without a user (scripts, warm-ups)
+
+
+class QueueFull(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute`, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class _Ticket:
+    __slots__ = ("user", "cost", "granted", "enqueued")
+
+    def __init__(self, user, cost: int):
+        self.user = user
+        self.cost = cost
+        self.granted = threading.Event()
+        self.enqueued = time.perf_counter()
+
+
+class Scheduler:
+    def __init__(self, name: str, concurrency: int, rpm: int = 0, tpm: int = 0,
+                 user_concurrency: int = 0, max_queue: int = MAX_QUEUE,
+                 user_max_queue: int = USER_MAX_QUEUE, quantum: int = QUANTUM):
+        self.name = name
+        self.concurrency = concurrency
+        self.user_concurrency = user_concurrency or max(1, concurrency // 2)
+        self.max_queue = max_queue
+        self.user_max_queue = user_max_queue
+        self.quantum = quantum
+        self._requests = _Bucket(rpm) if rpm > 0 else None
+        self._tokens = _Bucket(tpm) if tpm > 0 else None
+
+        self._lock = threading.Lock()
+        self._queues = {}              # user -> deque of waiting tickets
+        self._order = deque()          # users with waiting tickets, in round-robin order
+        self._deficit = defaultdict(float)
+        self._running = defaultdict(int)
+        self._in_flight = 0
+        self._waiting = 0
+        self._timer = None
+        self._avg_seconds = 1.0        # moving average call time, for Retry-After
+
+    # ---------------- Public ---------------- #
+
+    @contextmanager
+    def slot(self, user, cost: int):
+        """Hold one provider slot for the duration of a call."""
+        ticket = self._acquire(user if user is not None else SYSTEM_USER, cost)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(ticket, time.perf_counter() - start)
+
+    def check(self, user):
+        """Raise QueueFull if a new call from this user would be rejected right now."""
+        with self._lock:
+            self._check_room(user if user is not None else SYSTEM_USER)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "users_waiting": len(self._order),
+            }
+
+    # ---------------- Internals ---------------- #
+
+    def _retry_after(self) -> float:
+        return max(1.0, self._avg_seconds * (self._waiting + 1) / self.concurrency)
+
+    def _check_room(self, user):
+        queued = len(self._queues.get(user, ()))
+        if queued >= self.user_max_queue:
+            metrics.llm_rejected.inc(self.name, "user_queue")
+            raise QueueFull("Too many AI requests queued for this account; try again shortly.", self._retry_after())
+        if self._waiting >= self.max_queue:
+            metrics.llm_rejected.inc(self.name, "queue")
+            raise QueueFull("The AI service is busy; try again shortly.", self._retry_after())
+
+    def _acquire(self, user, cost: int) -> _Ticket:
+        ticket = _Ticket(user, cost)
+        with self._lock:
+            self._check_room(user)
+            queue = self._queues.get(user)
+            if queue is None:
+                queue = self._queues[user] = deque()
+                self._order.append(user)
+            queue.append(ticket)
+            self._waiting += 1
+            metrics.llm_queue_depth.inc(self.name)
+            self._dispatch()
+        ticket.granted.wait()
+        metrics.llm_queue_wait.observe(time.perf_counter() - ticket.enqueued, self.name)
+        return ticket
+
+    def _release(self, ticket: _Ticket, seconds: float):
+        with self._lock:
+            self._in_flight -= 1
+            self._running[ticket.user] -= 1
+            if not self._running[ticket.user]:
+                del self._running[ticket.user]
+            self._avg_seconds += (seconds - self._avg_seconds) * 0.1
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant waiting tickets in deficit round-robin order while limits allow. Caller holds the lock."""
+        blocked = 0  # users in a row skipped because they are at their quota
+        borrow = False  # every waiting user is at their quota; lend them the idle slots
+        while self._order and self._in_flight < self.concurrency:
+            if blocked >= len(self._order):
+                borrow = True
+                blocked = 0
+            user = self._order[0]
+            queue = self._queues[user]
+            ticket = queue[0]
+            if not borrow and self._running[user] >= self.user_concurrency:
+                self._order.rotate(-1)
+                blocked += 1
+                continue
+            if self._deficit[user] < ticket.cost:
+                # Not enough credit this round: top up and move on to the next user
+                self._deficit[user] += self.quantum
+                self._order.rotate(-1)
+                blocked = 0
+                continue
+
+            wait = self._rate_wait(ticket.cost)
+            if wait > 0:
+                self._wake_in(wait)
+                return
+
+            queue.popleft()
+            self._deficit[user] -= ticket.cost
+            if not queue:
+                # Idle users don't bank credit
+                del self._queues[user]
+                del self._deficit[user]
+                self._order.popleft()
+            self._waiting -= 1
+            self._in_flight += 1
+            self._running[user] += 1
+            blocked = 0
+            metrics.llm_queue_depth.dec(self.name)
+            ticket.granted.set()
+
+    def _rate_wait(self, cost: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        if self._requests:
+            wait = max(wait, self._requests.wait_for(1, now))
+        if self._tokens:
+            wait = max(wait, self._tokens.wait_for(cost, now))
+        if wait == 0:
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(cost)
+        return wait
+
+    def _wake_in(self, seconds: float):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(seconds, self._wake)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _wake(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough token cost of a call: ~4 characters per prompt token plus the completion budget."""
+    return len(prompt) // 4 + max_tokens
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
+from datetime import datetime
 
 # ---------- Auth ----------
 
@@ -37,6 +38,7 @@ class SectionOut(BaseModel):
     order: int
     likes: int
     dislikes: int
+    image_id: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -46,11 +48,62 @@ class ProjectOut(BaseModel):
     title: str
     topic: Optional[str]
     doc_type: str
+    version: int = 1
     sections: List[SectionOut] = []
 
     class Config:
         orm_mode = True
 
+class ProjectSummary(BaseModel):
+    id: int
+    title: str
+    topic: Optional[str]
+    doc_type: str
+    section_count: int
+    updated_at: Optional[datetime]
+    version: int = 1
+
+class ProjectPage(BaseModel):
+    items: List[ProjectSummary]
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    kind: str  # 'project' or 'section'
+    project_id: int
+    section_id: Optional[int] = None
+    title: str
+    snippet: str  # HTML: escaped text with <mark> around matched terms
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    items: List[SearchHit]
+
+class RevisionOut(BaseModel):
+    id: int
+    instruction: str
+    result: str
+    created_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+class RevisionPage(BaseModel):
+    items: List[RevisionOut]
+    next_cursor: Optional[str] = None
+
+class CommentOut(BaseModel):
+    id: int
+    comment: str
+    created_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+class CommentPage(BaseModel):
+    items: List[CommentOut]
+    next_cursor: Optional[str] = None
+
 class RefineRequest(BaseModel):
     instruction: str
 
@@ -61,3 +114,28 @@ class FeedbackRequest(BaseModel):
 class TemplateRequest(BaseModel):
     topic: str
     doc_type: str
+
+# ---------- Jobs ----------
+
+class JobCreate(BaseModel):
+    kind: str  # 'generate', 'refine_all' or 'export'
+    project_id: int
+    instruction: Optional[str] = None  # refine_all
+    format: str = "auto"  # export: 'docx', 'pptx' or 'auto'
+    template: Optional[str] = None  # export: brand template name
+    images: bool = False  # generate: also attach an image per section
+    force: bool = False  # generate: also regenerate sections that are up to date
+    use_cache: bool = True
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    project_id: int
+    status: str
+    progress: int
+    total: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
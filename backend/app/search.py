@@ -0,0 +1,270 @@
+"""
+Full-text search over a user's projects and sections.
+
+On SQLite this is an FTS5 table, `search_index`, with one row per project
+(title, topic) and one per section (title, content). Rows are written in the
+same transaction as the ORM change that caused them, from session flush
+hooks, so generate, refine, create and jobs keep it current without calling
+in here. Each row carries an `owner` token (u<id>). Every query is ANDed with
+it, so FTS itself does the owner scoping instead of a post-filter.
+
+Migrations create the index (ensure_index) and rebuild it if it has drifted;
+app startup only detects it (detect), so it is used even when migrations run
+as a separate step.
+
+Other databases fall back to an unranked LIKE query.
+"""
+import html
+import re
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from . import models
+
+TABLE = "search_index"
+# Titles count for more than body text when ranking
+TITLE_WEIGHT = 10.0
+
+_CREATE = (
+    f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, project_id UNINDEXED, owner, title, body, "
+    "tokenize='porter unicode61')"
+)
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# FTS marks matches with these private-use characters; the text is escaped
+# first and they become <mark> tags afterwards, so snippets are safe HTML
+_MARK_START, _MARK_END = "\ue000", "\ue001"
+_NO_MARKS = {ord(_MARK_START): None, ord(_MARK_END): None}
+
+_enabled = False
+
+_FIELDS = {
+    models.Project: ("title", "topic", "owner_id"),
+    models.Section: ("title", "content", "project_id"),
+}
+
+
+def _rowid(kind: str, ref_id: int) -> int:
+    # Stable rowids so an update is a delete + insert of one known row
+    return ref_id * 2 + (1 if kind == "project" else 0)
+
+
+def _owner_token(owner_id) -> str:
+    return f"u{owner_id}"
+
+
+# ---------------- Schema ---------------- #
+
+def _exists(conn) -> bool:
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": TABLE}).first() is not None
+
+
+def detect(conn) -> bool:
+    """
+    Use the index if it exists, without creating or checking it (startup when
+    migrations run separately); returns whether search is FTS-backed.
+    """
+    global _enabled
+    _enabled = conn.dialect.name == "sqlite" and _exists(conn)
+    return _enabled
+
+
+def _in_sync(conn) -> bool:
+    # Every project and every section of a project has exactly one row
+    indexed = conn.execute(text(f"SELECT count(*) FROM {TABLE}")).scalar()
+    projects = models.Project.__table__
+    sections = models.Section.__table__
+    expected = conn.execute(select(func.count()).select_from(projects)).scalar()
+    expected += conn.execute(
+        select(func.count()).select_from(sections.join(projects, projects.c.id == sections.c.project_id))
+    ).scalar()
+    return indexed == expected
+
+
+def ensure_index(conn) -> bool:
+    """
+    Create and fill the index if missing, or rebuild it when its row count
+    has drifted from the tables (e.g. rows written while search was off);
+    returns whether search is FTS-backed.
+    """
+    global _enabled
+    if conn.dialect.name != "sqlite":
+        _enabled = False
+        return False
+    if not _exists(conn):
+        try:
+            conn.execute(text(_CREATE))
+        except Exception:
+            # SQLite built without FTS5
+            _enabled = False
+            return False
+        _rebuild(conn)
+    elif not _in_sync(conn):
+        _rebuild(conn)
+    _enabled = True
+    return True
+
+
+def _rebuild(conn):
+    conn.execute(text(f"DELETE FROM {TABLE}"))
+    projects = models.Project.__table__
+    sections = models.Section.__table__
+    rows = [
+        _row("project", p.id, p.id, p.owner_id, p.title, p.topic)
+        for p in conn.execute(select(projects.c.id, projects.c.owner_id, projects.c.title, projects.c.topic))
+    ]
+    rows += [
+        _row("section", s.id, s.project_id, s.owner_id, s.title, s.content)
+        for s in conn.execute(
+            select(sections.c.id, sections.c.project_id, sections.c.title, sections.c.content, projects.c.owner_id)
+            .join(projects, projects.c.id == sections.c.project_id)
+        )
+    ]
+    if rows:
+        conn.execute(_INSERT, rows)
+
+
+# ---------------- Incremental updates ---------------- #
+
+_INSERT = text(
+    f"INSERT INTO {TABLE}(rowid, kind, ref_id, project_id, owner, title, body) "
+    "VALUES (:rowid, :kind, :ref_id, :project_id, :owner, :title, :body)"
+)
+_DELETE = text(f"DELETE FROM {TABLE} WHERE rowid = :rowid")
+
+
+def _row(kind, ref_id, project_id, owner_id, title, body) -> dict:
+    return {
+        "rowid": _rowid(kind, ref_id),
+        "kind": kind,
+        "ref_id": ref_id,
+        "project_id": project_id,
+        "owner": _owner_token(owner_id),
+        # Stored text never contains the mark characters, so only FTS adds them
+        "title": (title or "").translate(_NO_MARKS),
+        "body": (body or "").translate(_NO_MARKS),
+    }
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changes(session, flush_context, instances):
+    if not _enabled:
+        return
+    pending = session.info.setdefault("search_pending", {"upsert": set(), "delete": set()})
+    for obj in list(session.new) + list(session.dirty):
+        fields = _FIELDS.get(type(obj))
+        if not fields:
+            continue
+        if obj in session.dirty:
+            state = inspect(obj)
+            if not any(state.attrs[f].history.has_changes() for f in fields):
+                continue
+        pending["upsert"].add(obj)
+    for obj in session.deleted:
+        if type(obj) in _FIELDS:
+            kind = "project" if isinstance(obj, models.Project) else "section"
+            pending["delete"].add(_rowid(kind, obj.id))
+
+
+@event.listens_for(Session, "after_flush")
+def _write_changes(session, flush_context):
+    pending = session.info.pop("search_pending", None)
+    if not pending:
+        return
+    conn = session.connection()
+    projects = [o for o in pending["upsert"] if isinstance(o, models.Project)]
+    sections = [o for o in pending["upsert"] if isinstance(o, models.Section) and o.project_id is not None]
+
+    owners = {p.id: p.owner_id for p in projects}
+    missing = {s.project_id for s in sections} - owners.keys()
+    if missing:
+        table = models.Project.__table__
+        owners.update(conn.execute(select(table.c.id, table.c.owner_id).where(table.c.id.in_(missing))).all())
+
+    rows = [_row("project", p.id, p.id, p.owner_id, p.title, p.topic) for p in projects]
+    rows += [_row("section", s.id, s.project_id, owners.get(s.project_id), s.title, s.content) for s in sections]
+    deletes = [{"rowid": r["rowid"]} for r in rows] + [{"rowid": rowid} for rowid in pending["delete"]]
+    if deletes:
+        conn.execute(_DELETE, deletes)
+    if rows:
+        conn.execute(_INSERT, rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("search_pending", None)
+
+
+# ---------------- Queries ---------------- #
+
+def _match_expression(query: str, owner_id: int):
+    terms = _TOKEN_RE.findall(query)
+    if not terms:
+        return None
+    # Quote every term so user input is never parsed as FTS syntax; the last
+    # one is a prefix so results show up while typing
+    phrase = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+    return f'owner:"{_owner_token(owner_id)}" AND {{title body}}:({phrase.strip()})'
+
+
+def search(db, owner_id: int, query: str, limit: int = 20, offset: int = 0):
+    """Ranked hits as dicts: kind, project_id, section_id, title, snippet, score."""
+    if not _enabled:
+        return _search_like(db, owner_id, query, limit, offset)
+    match = _match_expression(query, owner_id)
+    if match is None:
+        return []
+    # Rank first, then build snippets for the returned page only
+    rows = db.execute(
+        text(
+            f"SELECT kind, ref_id, project_id, title, score, "
+            f"snippet({TABLE}, 5, :start, :end, '…', 12) AS snippet, "
+            f"highlight({TABLE}, 4, :start, :end) AS title_snippet "
+            f"FROM {TABLE} JOIN ("
+            f"  SELECT rowid AS hit, bm25({TABLE}, 0, 0, 0, 0, {TITLE_WEIGHT}, 1.0) AS score "
+            f"  FROM {TABLE} WHERE {TABLE} MATCH :match ORDER BY score LIMIT :limit OFFSET :offset"
+            f") ON {TABLE}.rowid = hit "
+            f"WHERE {TABLE} MATCH :match ORDER BY score"
+        ),
+        {"match": match, "limit": limit, "offset": offset, "start": _MARK_START, "end": _MARK_END},
+    ).all()
+    return [
+        {
+            "kind": r.kind,
+            "project_id": r.project_id,
+            "section_id": r.ref_id if r.kind == "section" else None,
+            "title": r.title,
+            # Fall back to the highlighted title when the match was only there
+            "snippet": _marked_html(r.snippet if _MARK_START in r.snippet else r.title_snippet),
+            "score": -r.score,  # bm25 is lower-is-better
+        }
+        for r in rows
+    ]
+
+
+def _marked_html(snippet: str) -> str:
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def _search_like(db, owner_id: int, query: str, limit: int, offset: int):
+    terms = _TOKEN_RE.findall(query)
+    if not terms:
+        return []
+    pattern = f"%{' '.join(terms)}%"
+    rows = (
+        db.query(models.Section.id, models.Section.project_id, models.Section.title, models.Section.content)
+        .join(models.Project)
+        .filter(
+            models.Project.owner_id == owner_id,
+            models.Section.title.ilike(pattern) | models.Section.content.ilike(pattern),
+        )
+        .order_by(models.Section.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"kind": "section", "project_id": r.project_id, "section_id": r.id, "title": r.title,
+         "snippet": html.escape((r.content or "")[:200]), "score": 0.0}
+        for r in rows
+    ]
@@ -0,0 +1,58 @@
+"""
+Single-flight: concurrent calls with the same key share one execution.
+
+The first caller for a key (the leader) runs the work; callers that arrive
+while it is running wait for it and get the same result or exception. Nothing
+is remembered afterwards, so this only merges overlapping work (double
+clicks, several open tabs); caching is left to llm_cache / export_cache.
+"""
+import threading
+
+from . import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once per key among concurrent callers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.singleflight_calls.inc(self.name, "shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.singleflight_calls.inc(self.name, "leader")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
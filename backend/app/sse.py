@@ -0,0 +1,17 @@
+import json
+
+# Seconds between keep-alive comments while waiting on slow work
+HEARTBEAT_SECONDS = 15
+
+HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
+
+
+def event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def comment(text: str = "keep-alive") -> str:
+    return f": {text}\n\n"
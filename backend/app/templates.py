@@ -0,0 +1,250 @@
+"""
+Registry of DOCX/PPTX prototypes used by the exporters.
+
+Each template is loaded and parsed once per process, and again when its file
+changes (modification time or size). Exports get a deep copy
+of the parsed prototype, which is much cheaper than Document() /
+Presentation() re-reading a package from disk. The built-in prototypes carry
+our house fonts in their styles, so the exporters no longer style every run.
+
+Brand templates are .dotx/.docx and .potx/.pptx files in TEMPLATE_DIR, named
+by file stem (e.g. templates/acme.potx -> template=acme). Their own styles
+are used as-is.
+
+python-docx and python-pptx (and lxml) are imported on first use rather than
+with this module, which keeps them out of worker start-up; warm_up() can load
+them ahead of the first export.
+"""
+import copy
+import hashlib
+import os
+import re
+import threading
+import zipfile
+from io import BytesIO
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", "./templates")
+FONT_NAME = "Segoe UI"
+
+TOPIC_STYLE = "Topic"
+
+_EXTENSIONS = {"docx": (".dotx", ".docx"), "pptx": (".potx", ".pptx")}
+# Templates declare a different main content type than documents; python-docx
+# and python-pptx only open the latter
+_TEMPLATE_CONTENT_TYPES = {
+    b"application/vnd.openxmlformats-officedocument.wordprocessingml.template.main+xml":
+        b"application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml",
+    b"application/vnd.openxmlformats-officedocument.presentationml.template.main+xml":
+        b"application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml",
+}
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_prototypes = {}  # (kind, name) -> (file stamp, (parsed prototype, package bytes, fingerprint))
+_lock = threading.Lock()
+
+
+class TemplateNotFound(KeyError):
+    pass
+
+
+def available() -> dict:
+    """Brand template names per format found in TEMPLATE_DIR."""
+    found = {"docx": [], "pptx": []}
+    if os.path.isdir(TEMPLATE_DIR):
+        for filename in sorted(os.listdir(TEMPLATE_DIR)):
+            stem, ext = os.path.splitext(filename)
+            for kind, exts in _EXTENSIONS.items():
+                if ext.lower() in exts and _NAME_RE.match(stem) and stem not in found[kind]:
+                    found[kind].append(stem)
+    return found
+
+
+def _template_file(kind: str, name: str) -> str:
+    if not _NAME_RE.match(name):
+        raise TemplateNotFound(name)
+    for ext in _EXTENSIONS[kind]:
+        path = os.path.join(TEMPLATE_DIR, name + ext)
+        if os.path.isfile(path):
+            return path
+    raise TemplateNotFound(name)
+
+
+def _as_document_package(path: str) -> bytes:
+    """Read a template/document package, rewriting a template content type if needed."""
+    with open(path, "rb") as f:
+        src = BytesIO(f.read())
+    out = BytesIO()
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if info.filename == "[Content_Types].xml":
+                for old, new in _TEMPLATE_CONTENT_TYPES.items():
+                    data = data.replace(old, new)
+            zout.writestr(info, data)
+    return out.getvalue()
+
+
+# ---------------- House styles ---------------- #
+
+def _set_docx_style_font(style, size_pt: int):
+    from docx.oxml.ns import qn
+    from docx.shared import Pt
+
+    style.font.name = FONT_NAME
+    style.font.size = Pt(size_pt)
+    # Theme font attributes win over explicit names in Word; drop them
+    rfonts = style.element.rPr.find(qn("w:rFonts"))
+    for attr in ("w:asciiTheme", "w:hAnsiTheme", "w:eastAsiaTheme", "w:cstheme"):
+        rfonts.attrib.pop(qn(attr), None)
+
+
+def _apply_docx_house_styles(doc):
+    styles = doc.styles
+    _set_docx_style_font(styles["Normal"], 12)
+    _set_docx_style_font(styles["Heading 1"], 28)
+    _set_docx_style_font(styles["Heading 2"], 20)
+    _set_docx_style_font(styles["Heading 3"], 15)
+    _set_docx_style_font(styles["List Bullet"], 11)
+    _set_docx_style_font(styles["List Bullet 2"], 11)
+    _set_docx_style_font(_ensure_topic_style(doc), 13)
+
+
+def _ensure_topic_style(doc):
+    try:
+        return doc.styles[TOPIC_STYLE]
+    except KeyError:
+        from docx.enum.style import WD_STYLE_TYPE
+
+        style = doc.styles.add_style(TOPIC_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = doc.styles["Normal"]
+        return style
+
+
+def _apply_pptx_house_styles(prs):
+    from pptx.oxml.ns import qn as pptx_qn
+
+    # Body text (bullets) in every master: 24pt Segoe UI
+    for master in prs.slide_masters:
+        body_style = master.element.find(pptx_qn("p:txStyles")).find(pptx_qn("p:bodyStyle"))
+        def_rpr = body_style.find(pptx_qn("a:lvl1pPr")).find(pptx_qn("a:defRPr"))
+        def_rpr.set("sz", "2400")
+        def_rpr.get_or_add_latin().set("typeface", FONT_NAME)
+
+
+# ---------------- Prototypes ---------------- #
+
+def _build(kind: str, name: str | None):
+    if kind == "docx":
+        from docx import Document
+    else:
+        from pptx import Presentation
+
+    if name is None:
+        proto = Document() if kind == "docx" else Presentation()
+        if kind == "docx":
+            _apply_docx_house_styles(proto)
+        else:
+            _apply_pptx_house_styles(proto)
+        bio = BytesIO()
+        proto.save(bio)
+        package = bio.getvalue()
+    else:
+        package = _as_document_package(_template_file(kind, name))
+        proto = Document(BytesIO(package)) if kind == "docx" else Presentation(BytesIO(package))
+        if kind == "pptx" and not len(proto.slide_layouts):
+            # Nothing to add slides from; report it like a missing template
+            raise TemplateNotFound(name)
+        if kind == "docx":
+            _ensure_topic_style(proto)
+            bio = BytesIO()
+            proto.save(bio)
+            package = bio.getvalue()
+    return proto, package, _content_hash(package)
+
+
+def _content_hash(package: bytes) -> str:
+    # Parts' names and bytes only: a re-saved package carries new zip timestamps
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(BytesIO(package)) as z:
+        for info in z.infolist():
+            digest.update(info.filename.encode() + b"\0")
+            digest.update(z.read(info) + b"\0")
+    return digest.hexdigest()[:16]
+
+
+def _stamp(kind: str, name: str | None):
+    """Which version of a brand template's file is on disk; None for the built-ins."""
+    if name is None:
+        return None
+    path = _template_file(kind, name)
+    st = os.stat(path)
+    return path, st.st_mtime_ns, st.st_size
+
+
+def _prototype(kind: str, name: str | None):
+    key = (kind, name or None)
+    stamp = _stamp(kind, name or None)
+    entry = _prototypes.get(key)
+    if entry is None or entry[0] != stamp:
+        with _lock:
+            entry = _prototypes.get(key)
+            if entry is None or entry[0] != stamp:
+                entry = (stamp, _build(kind, name or None))
+                _prototypes[key] = entry
+    return entry[1]
+
+
+def document(name: str | None = None):
+    """A fresh python-docx Document cloned from the (cached) prototype."""
+    return copy.deepcopy(_prototype("docx", name)[0])
+
+
+def presentation(name: str | None = None):
+    """A fresh python-pptx Presentation cloned from the (cached) prototype."""
+    return copy.deepcopy(_prototype("pptx", name)[0])
+
+
+def docx_style_ids(name: str | None = None) -> dict:
+    """Style ids the exporters use, falling back to Normal when a template lacks one."""
+    doc = _prototype("docx", name)[0]
+    ids = {}
+    for key, style_name in (
+        ("title", "Heading 1"),
+        ("heading", "Heading 2"),
+        ("subheading", "Heading 3"),
+        ("bullet", "List Bullet"),
+        ("bullet2", "List Bullet 2"),
+        ("topic", TOPIC_STYLE),
+    ):
+        try:
+            ids[key] = doc.styles[style_name].style_id
+        except KeyError:
+            ids[key] = doc.styles["Normal"].style_id
+    return ids
+
+
+def package_bytes(kind: str, name: str | None = None) -> bytes:
+    """The prototype saved as a package (used by the streaming DOCX writer)."""
+    return _prototype(kind, name)[1]
+
+
+def fingerprint(kind: str, name: str | None = None) -> str:
+    """Changes whenever the template content does; part of export cache keys."""
+    return _prototype(kind, name)[2]
+
+
+def warm_up(kinds=("docx", "pptx")):
+    """Load the built-in prototypes and every brand template up front."""
+    brands = available()
+    for kind in kinds:
+        _prototype(kind, None)
+        for name in brands[kind]:
+            _prototype(kind, name)
+
+
+def clear():
+    with _lock:
+        _prototypes.clear()
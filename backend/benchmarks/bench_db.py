@@ -0,0 +1,159 @@
+"""
+Concurrent reads and writes against SQLite, default engine vs the tuned one.
+
+'default' is the old create_engine(DATABASE_URL) used for everything.
+'tuned' is app.database: WAL and pragmas, with reads on the separate
+read engine. Each run gets a fresh database file in its own subprocess.
+
+    cd backend
+    python benchmarks/bench_db.py --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 2)
+
+
+def _run(mode: str, args, queue):
+    tmp = tempfile.mkdtemp(prefix="bench_db_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ.pop("DATABASE_READ_URL", None)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker, selectinload
+    from app import database, migrations, models
+
+    migrations.upgrade()
+    if mode == "default":
+        engine = create_engine(database.DATABASE_URL, connect_args={"check_same_thread": False})
+        WriteSession = ReadSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    else:
+        WriteSession, ReadSession = database.SessionLocal, database.ReadSessionLocal
+
+    db = WriteSession()
+    user = models.User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    project_ids = []
+    for p in range(args.projects):
+        project = models.Project(title=f"Project {p}", topic="Benchmark", doc_type="docx", owner_id=user.id)
+        db.add(project)
+        db.flush()
+        project_ids.append(project.id)
+        for s in range(args.sections):
+            db.add(models.Section(project_id=project.id, title=f"Section {s}", order=s, content="lorem ipsum " * 200))
+    db.commit()
+    section_ids = [row.id for row in db.query(models.Section.id).all()]
+    db.close()
+
+    stop = threading.Event()
+    stats = {"read": [], "write": [], "errors": 0}
+    lock = threading.Lock()
+
+    def reader(i):
+        n = i
+        while not stop.is_set():
+            start = time.perf_counter()
+            session = ReadSession()
+            try:
+                (
+                    session.query(models.Project)
+                    .options(selectinload(models.Project.sections))
+                    .filter(models.Project.id == project_ids[n % len(project_ids)])
+                    .first()
+                )
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats["read"].append(elapsed)
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+            finally:
+                session.close()
+            n += 1
+
+    def writer(i):
+        n = i
+        while not stop.is_set():
+            start = time.perf_counter()
+            session = WriteSession()
+            try:
+                section = session.get(models.Section, section_ids[n % len(section_ids)])
+                section.content = f"revision {n} " + "lorem ipsum " * 200
+                session.commit()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats["write"].append(elapsed)
+            except OperationalError:
+                session.rollback()
+                with lock:
+                    stats["errors"] += 1
+            finally:
+                session.close()
+            n += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    queue.put({
+        "mode": mode,
+        "reads_per_second": round(len(stats["read"]) / args.seconds, 1),
+        "writes_per_second": round(len(stats["write"]) / args.seconds, 1),
+        "read_p95_ms": _percentile(stats["read"], 95),
+        "write_p95_ms": _percentile(stats["write"], 95),
+        "errors": stats["errors"],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for mode in ("default", "tuned"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(mode, args, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s")
+    print(f"{'mode':<8} {'reads/s':>9} {'writes/s':>9} {'read p95 ms':>12} {'write p95 ms':>13} {'errors':>7}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['reads_per_second']:>9} {r['writes_per_second']:>9} "
+              f"{r['read_p95_ms']:>12} {r['write_p95_ms']:>13} {r['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
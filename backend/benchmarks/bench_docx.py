@@ -0,0 +1,94 @@
+"""
+Compare generator.assemble_docx with the streaming docx_stream writer.
+
+Each writer runs in a fresh subprocess so peak RSS is not shared between them.
+
+    cd backend
+    python benchmarks/bench_docx.py --sections 300 --lines 20
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def make_project(n_sections: int, n_lines: int):
+    project = SimpleNamespace(id=1, title="Benchmark report", topic="Quarterly business review")
+    line = "Revenue grew steadily across all regions, driven by new enterprise accounts and renewals."
+    content = "\n".join(f"- {line}" if i % 3 else line for i in range(n_lines))
+    sections = [SimpleNamespace(order=i, title=f"Section {i + 1}", content=content) for i in range(n_sections)]
+    return project, sections
+
+
+def _run(writer: str, n_sections: int, n_lines: int, queue):
+    from app import templates
+    from app.generator import assemble_docx
+    from app.docx_stream import iter_docx
+
+    # Template prototypes are parsed once per process; keep that out of the numbers
+    templates.warm_up(("docx",))
+
+    project, sections = make_project(n_sections, n_lines)
+
+    def render():
+        if writer == "python-docx":
+            return len(assemble_docx(project, sections).getvalue())
+        # Drop chunks as they are produced, like a StreamingResponse would
+        return sum(len(chunk) for chunk in iter_docx(project, sections))
+
+    # Timed pass first: tracemalloc slows allocation-heavy code considerably
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = render()
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    render()
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queue.put({
+        "writer": writer,
+        "seconds": round(elapsed, 4),
+        "bytes": size,
+        "python_peak_mb": round(py_peak / 2**20, 2),
+        "rss_growth_mb": round((rss_after - rss_before) / 1024, 2),  # ru_maxrss is KiB on Linux
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for writer in ("python-docx", "stream"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(writer, args.sections, args.lines, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    print(f"{args.sections} sections x {args.lines} lines")
+    print(f"{'writer':<12} {'seconds':>9} {'KB':>9} {'py peak MB':>11} {'rss +MB':>9}")
+    for r in results:
+        print(f"{r['writer']:<12} {r['seconds']:>9} {r['bytes'] // 1024:>9} {r['python_peak_mb']:>11} {r['rss_growth_mb']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"sections": args.sections, "lines": args.lines, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
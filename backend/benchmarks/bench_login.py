@@ -0,0 +1,145 @@
+"""
+Login throughput under concurrency, with and without the hashing process pool.
+
+For each PASSWORD_HASH_WORKERS value a fresh uvicorn server is started on a
+temporary database. Concurrent clients then log in repeatedly while a probe
+polls /api/health, which shows how much unrelated requests stall.
+
+    cd backend
+    python benchmarks/bench_login.py --workers 0,4 --concurrency 32 --requests 400
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PASSWORD = "benchmark-password"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base: str, proc, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            requests.get(f"{base}/api/health", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 1)
+
+
+def run(workers: int, args) -> dict:
+    tmp = tempfile.mkdtemp(prefix="bench_login_")
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+        PASSWORD_HASH_WORKERS=str(workers),
+        PASSWORD_HASH_ROUNDS=str(args.rounds),
+        PASSWORD_HASH_MAX_PENDING=str(args.max_pending),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(base, proc)
+        emails = [f"user{i}@example.com" for i in range(args.users)]
+        session = requests.Session()
+        for email in emails:
+            session.post(f"{base}/api/auth/register", json={"email": email, "password": PASSWORD}).raise_for_status()
+
+        latencies, statuses, probe = [], {}, []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def login(i):
+            start = time.perf_counter()
+            r = requests.post(f"{base}/api/auth/login", json={"email": emails[i % len(emails)], "password": PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code == 200:
+                    latencies.append(elapsed)
+
+        def poll_health():
+            while not done.is_set():
+                start = time.perf_counter()
+                requests.get(f"{base}/api/health")
+                probe.append(time.perf_counter() - start)
+                time.sleep(0.02)
+
+        prober = threading.Thread(target=poll_health)
+        prober.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(login, range(args.requests)))
+        wall = time.perf_counter() - start
+        done.set()
+        prober.join()
+
+        return {
+            "hash_workers": workers,
+            "seconds": round(wall, 3),
+            "logins_per_second": round(len(latencies) / wall, 1),
+            "statuses": statuses,
+            "login_p50_ms": _percentile(latencies, 50),
+            "login_p95_ms": _percentile(latencies, 95),
+            "health_p50_ms": _percentile(probe, 50),
+            "health_p95_ms": _percentile(probe, 95),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="0,4", help="comma-separated PASSWORD_HASH_WORKERS values")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=29000)
+    parser.add_argument("--max-pending", type=int, default=256)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = [run(int(w), args) for w in args.workers.split(",")]
+
+    print(f"{args.requests} logins, {args.concurrency} concurrent, {args.rounds} rounds")
+    print(f"{'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'health p50':>11} {'health p95':>11}  statuses")
+    for r in results:
+        print(f"{r['hash_workers']:>7} {r['logins_per_second']:>9} {r['login_p50_ms']:>8} {r['login_p95_ms']:>8} "
+              f"{r['health_p50_ms']:>11} {r['health_p95_ms']:>11}  {r['statuses']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Search latency on a large index.
+
+Seeds a fresh SQLite database with --sections sections for the searching user
+(plus the same number spread over other users), builds the FTS index and
+times /api/projects/search queries at the search.search level.
+
+    cd backend
+    python benchmarks/bench_search.py --sections 30000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+WORDS = (
+    "revenue growth market customer pipeline forecast budget margin churn retention onboarding "
+    "pricing strategy roadmap hiring compliance security audit platform migration latency "
+    "quarterly annual region partner channel campaign launch product feature adoption"
+).split()
+
+# Long tail of rarer terms (Zipf-like), which is what most real queries hit
+RARE = [f"term{i}x" for i in range(20000)]
+RARE_WEIGHTS = [1 / (i + 1) for i in range(len(RARE))]
+
+QUERIES = [
+    "term50x",                # frequent rare-vocabulary term
+    "term2000x",
+    "term300x term4000x",
+    "term1999",               # prefix of a few terms
+    "revenue",                # in ~every section: worst case, scores every match
+    "nonexistentterm",
+]
+
+
+def _text(rng, n):
+    common = max(1, n // 10)
+    words = [rng.choice(WORDS) for _ in range(common)] + rng.choices(RARE, RARE_WEIGHTS, k=n - common)
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=30000, help="sections owned by the searching user")
+    parser.add_argument("--per-project", type=int, default=20)
+    parser.add_argument("--others", type=int, default=4, help="other users with as many sections each / 4")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_search_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    from app import database, migrations, models, search
+
+    migrations.upgrade()
+    rng = random.Random(1)
+    users = [1 + i for i in range(1 + args.others)]
+    with database.engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [{"id": u, "email": f"u{u}@example.com", "hashed_password": "x"} for u in users])
+        project_id = section_id = 0
+        for u in users:
+            n_sections = args.sections if u == 1 else args.sections // 4
+            projects, sections = [], []
+            for _ in range(max(1, n_sections // args.per_project)):
+                project_id += 1
+                projects.append({"id": project_id, "owner_id": u, "title": _text(rng, 4), "topic": _text(rng, 3), "doc_type": "docx"})
+                for order in range(args.per_project):
+                    section_id += 1
+                    sections.append({"id": section_id, "project_id": project_id, "title": _text(rng, 3), "content": _text(rng, 150), "order": order})
+            conn.execute(models.Project.__table__.insert(), projects)
+            conn.execute(models.Section.__table__.insert(), sections)
+        start = time.perf_counter()
+        search._rebuild(conn)
+        build_seconds = time.perf_counter() - start
+
+    results = []
+    db = database.ReadSessionLocal()
+    try:
+        for q in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                hits = search.search(db, 1, q, limit=20)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            results.append({
+                "query": q,
+                "hits": len(hits),
+                "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1] * 1000, 2),
+            })
+    finally:
+        db.close()
+
+    print(f"{args.sections} sections for the searching user, {section_id} total; index built in {build_seconds:.1f}s")
+    print(f"{'query':<26} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['query']:<26} {r['hits']:>5} {r['p50_ms']:>8} {r['p95_ms']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "build_seconds": round(build_seconds, 2), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Cold import time of the API, from `python -X importtime`.
+
+Imports app.main in fresh interpreters --repeat times and reports the median
+total plus the slowest modules (cumulative time, including their imports).
+Use --baseline with an earlier --output file to spot start-up regressions,
+e.g. a heavy library creeping back into module-level imports.
+
+    cd backend
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --output new.json --baseline old.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in ms per module for one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    runs = defaultdict(list)
+    for _ in range(args.repeat):
+        for name, ms in import_times(args.module).items():
+            runs[name].append(ms)
+    median = {name: round(statistics.median(v), 1) for name, v in runs.items()}
+    total = median[args.module]
+    top = sorted(((n, ms) for n, ms in median.items() if n != args.module), key=lambda x: -x[1])[:args.top]
+
+    base = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)["modules"]
+    old = base.get(args.module)
+    print(f"import {args.module}: {total} ms median of {args.repeat}" + (f" (baseline {old} ms, {(total - old) / old * 100:+.0f}%)" if old else ""))
+    print(f"{'module':<44} {'ms':>8}" + ("  baseline" if base else ""))
+    for name, ms in top:
+        print(f"{name:<44} {ms:>8}" + (f"  {base.get(name, '-'):>8}" if base else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "total_ms": total, "modules": median}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
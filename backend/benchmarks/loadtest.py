@@ -0,0 +1,222 @@
+"""
+In-process load test of the API against the mock LLM provider.
+
+Runs the FastAPI app in this process (httpx ASGI transport, lifespan
+included) on a throwaway database. Virtual users register and log in, then
+loop over a weighted mix of create, get, summary, search, generate, refine,
+feedback and export. Reports throughput and p50/p95/p99 per endpoint, and
+writes everything to a JSON file so runs can be compared across commits.
+Needs httpx (pip install -r requirements-dev.txt).
+
+    cd backend
+    python benchmarks/loadtest.py --users 20 --duration 30 --latency-ms 200 --jitter-ms 100
+    python benchmarks/loadtest.py --output new.json --baseline old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_MIX = "get=20,summary=10,search=10,feedback=20,refine=10,generate=5,export=10,create=5"
+PASSWORD = "loadtest-password"
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 2)
+
+
+def _parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+            status = r.status_code
+        except Exception as e:
+            r, status = None, type(e).__name__
+        self.timings[label].append(time.perf_counter() - start)
+        self.statuses[label][status] += 1
+        return r
+
+    def report(self, seconds: float) -> dict:
+        out = {}
+        for label in sorted(self.timings):
+            t = self.timings[label]
+            statuses = dict(self.statuses[label])
+            out[label] = {
+                "count": len(t),
+                "errors": sum(n for s, n in statuses.items() if not (isinstance(s, int) and s < 400)),
+                "rps": round(len(t) / seconds, 2),
+                "p50_ms": _percentile(t, 50),
+                "p95_ms": _percentile(t, 95),
+                "p99_ms": _percentile(t, 99),
+                "statuses": {str(s): n for s, n in statuses.items()},
+            }
+        return out
+
+
+async def virtual_user(n, client, rec, mix, deadline, args, rng):
+    email = f"load{n}@example.com"
+    await rec.request(client, "POST /api/auth/register", "POST", "/api/auth/register", json={"email": email, "password": PASSWORD})
+    r = await rec.request(client, "POST /api/auth/login", "POST", "/api/auth/login", json={"email": email, "password": PASSWORD})
+    if r is None or r.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    projects = []  # [(project_id, [section ids])]
+
+    async def create():
+        outline = [{"title": f"Section {i + 1}", "order": i} for i in range(args.sections)]
+        body = {"title": f"Load test {n}-{len(projects)}", "topic": rng.choice(["growth", "hiring", "pricing"]),
+                "doc_type": rng.choice(["docx", "pptx"]), "outline": outline}
+        r = await rec.request(client, "POST /api/projects/", "POST", "/api/projects/", json=body, headers=headers)
+        if r is not None and r.status_code == 200:
+            data = r.json()
+            projects.append((data["id"], [s["id"] for s in data["sections"]]))
+
+    await create()
+    actions = list(mix)
+    weights = [mix[a] for a in actions]
+    while time.perf_counter() < deadline and projects:
+        action = rng.choices(actions, weights)[0]
+        pid, sids = rng.choice(projects)
+        sid = rng.choice(sids) if sids else None
+        if action == "create":
+            await create()
+        elif action == "get":
+            await rec.request(client, "GET /api/projects/{id}", "GET", f"/api/projects/{pid}", headers=headers)
+        elif action == "summary":
+            await rec.request(client, "GET /api/projects/summary", "GET", "/api/projects/summary", headers=headers)
+        elif action == "search":
+            await rec.request(client, "GET /api/projects/search", "GET", "/api/projects/search",
+                              params={"q": rng.choice(["section", "growth", "mock", "load"])}, headers=headers)
+        elif action == "generate":
+            await rec.request(client, "POST /api/projects/{id}/generate", "POST", f"/api/projects/{pid}/generate",
+                              params={"use_cache": "false"}, headers=headers)
+        elif action == "refine" and sid:
+            await rec.request(client, "POST .../refine", "POST", f"/api/projects/{pid}/sections/{sid}/refine",
+                              json={"instruction": rng.choice(["shorter", "more formal", "add examples"])},
+                              params={"use_cache": "false"}, headers=headers)
+        elif action == "feedback" and sid:
+            await rec.request(client, "POST .../feedback", "POST", f"/api/projects/{pid}/sections/{sid}/feedback",
+                              json={"action": rng.choice(["like", "dislike"])}, headers=headers)
+        elif action == "export":
+            await rec.request(client, "GET /api/export/{id}", "GET", f"/api/export/{pid}", headers=headers)
+        if args.think_ms:
+            await asyncio.sleep(rng.uniform(0, args.think_ms) / 1000)
+
+
+async def run(args) -> dict:
+    from httpx import ASGITransport, AsyncClient
+    from app.main import app
+
+    rec = Recorder()
+    mix = _parse_mix(args.mix)
+    async with app.router.lifespan_context(app):
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        async with AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(
+                virtual_user(i, client, rec, mix, deadline, args, random.Random(args.seed + i))
+                for i in range(args.users)
+            ))
+            elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 2), "endpoints": rec.report(elapsed)}
+
+
+def _configure_env(args):
+    tmp = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{tmp}/loadtest.db",
+        "LLM_PROVIDER": "mock",
+        "LLM_CACHE": "1" if args.llm_cache else "0",
+        "LLM_CACHE_PATH": f"{tmp}/llm_cache.db",
+        "EXPORT_CACHE_DIR": f"{tmp}/export_cache",
+        "JOB_RESULT_DIR": f"{tmp}/job_results",
+        "LLM_MOCK_LATENCY_MS": str(args.latency_ms),
+        "LLM_MOCK_JITTER_MS": str(args.jitter_ms),
+        "LLM_MOCK_ERROR_RATE": str(args.error_rate),
+    })
+
+
+def _print_report(result, baseline=None):
+    base = (baseline or {}).get("result", {}).get("endpoints", {})
+    print(f"{'endpoint':<36} {'count':>6} {'err':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}" + ("  p95 vs base" if base else ""))
+    for label, r in result["endpoints"].items():
+        line = f"{label:<36} {r['count']:>6} {r['errors']:>5} {r['rps']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}"
+        old = base.get(label, {}).get("p95_ms")
+        if old:
+            line += f"  {(r['p95_ms'] - old) / old * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted actions, e.g. 'get=5,export=1'")
+    parser.add_argument("--sections", type=int, default=6, help="sections per created project")
+    parser.add_argument("--think-ms", type=float, default=0, help="random pause between a user's requests")
+    parser.add_argument("--latency-ms", type=float, default=100, help="mock LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="extra random mock LLM latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock LLM failure probability")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare p95 against")
+    args = parser.parse_args()
+
+    _configure_env(args)
+    result = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(f"{args.users} users, {result['seconds']}s, mock latency {args.latency_ms}+{args.jitter_ms}ms, "
+          f"error rate {args.error_rate}")
+    _print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "args": vars(args),
+                "result": result,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Shared test setup. Settings are read at import time, so everything the app
+writes (database, caches, stores) is pointed at a temporary directory before
+any app module is imported. The mock LLM and the stub image provider stand in
+for the real providers.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="aidocs-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_tmp}/app.db",
+    "LLM_PROVIDER": "mock",
+    "IMAGE_PROVIDER": "stub",
+    "LLM_CACHE_PATH": os.path.join(_tmp, "llm_cache.db"),
+    "EXPORT_CACHE_DIR": os.path.join(_tmp, "export_cache"),
+    "IMAGE_STORE_DIR": os.path.join(_tmp, "image_store"),
+    "JOB_RESULT_DIR": os.path.join(_tmp, "job_results"),
+    "PROFILE_DIR": os.path.join(_tmp, "profiles"),
+    "TEMPLATE_DIR": os.path.join(_tmp, "templates"),
+    "PASSWORD_HASH_WORKERS": "0",
+    "PASSWORD_HASH_ROUNDS": "1000",
+})
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def auth(client):
+    """Authorization headers for a freshly registered user."""
+    r = client.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex}@example.com", "password": "pw"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.fixture
+def make_project(client, auth):
+    def make(sections: int = 3, doc_type: str = "pptx", topic: str | None = None, title: str = "Project"):
+        body = {
+            "title": title,
+            # Unique by default so LLM calls don't hit another test's cache entries
+            "topic": topic or uuid.uuid4().hex,
+            "doc_type": doc_type,
+            "outline": [{"title": f"S{i}", "order": i} for i in range(sections)],
+        }
+        r = client.post("/api/projects/", json=body, headers=auth)
+        assert r.status_code == 200, r.text
+        return r.json()
+    return make
@@ -0,0 +1,63 @@
+import os
+import re
+
+import pytest
+
+from app import blocks
+
+SECTION_CONTENT_JS = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "src", "components", "SectionContent.js")
+
+
+@pytest.mark.parametrize("text", [
+    "Use **kwargs and *args in f(*a, **k)",
+    "2*3*4 = 24",
+    "5 * 3",
+    "a ** b ** c",
+    "snake_case_name",
+    "glob *.py files",
+])
+def test_no_emphasis(text):
+    assert blocks.parse_inline(text) == ((text, 0),)
+
+
+@pytest.mark.parametrize("text, runs", [
+    ("**Note:** done", (("Note:", blocks.BOLD), (" done", 0))),
+    ("an *important* step", (("an ", 0), ("important", blocks.ITALIC), (" step", 0))),
+    ("***both***.", (("both", blocks.BOLD | blocks.ITALIC), (".", 0))),
+    ("(*aside*)", (("(", 0), ("aside", blocks.ITALIC), (")", 0))),
+])
+def test_emphasis(text, runs):
+    assert blocks.parse_inline(text) == runs
+
+
+def test_tab_indented_bullet_is_nested():
+    parsed = blocks.parse("- top\n\t- nested\n    - also nested\n - not nested")
+    assert [b.level for b in parsed] == [0, 1, 1, 0]
+
+
+def test_normalize_round_trips():
+    text = "# Title\nIntro with **bold**, *italic* and f(*args, **kwargs).\n* one\n\t* two\n1) first\n---\n2*3*4"
+    canonical = blocks.normalize(text)
+    assert canonical == (
+        "# Title\nIntro with **bold**, *italic* and f(*args, **kwargs).\n- one\n  - two\n1. first\n2*3*4"
+    )
+    assert blocks.normalize(canonical) == canonical
+    assert blocks.parse(canonical) == tuple(blocks.iter_blocks(text.splitlines()))
+
+
+@pytest.mark.skipif(not os.path.exists(SECTION_CONTENT_JS), reason="frontend not checked out")
+def test_frontend_uses_the_same_patterns():
+    with open(SECTION_CONTENT_JS, encoding="utf-8") as f:
+        js = f.read()
+
+    def js_pattern(name):
+        m = re.search(rf"^const {name} = /(.*)/g?;$", js, re.M)
+        assert m, name
+        return m.group(1)
+
+    # re.match anchors at the start; the JS patterns spell out the ^
+    assert js_pattern("HEADING") == "^" + blocks._HEADING.pattern
+    assert js_pattern("BULLET") == "^" + blocks._BULLET.pattern
+    assert js_pattern("NUMBER") == "^" + blocks._NUMBER.pattern
+    assert js_pattern("EMPHASIS") == blocks._EMPHASIS.pattern
+    assert re.search(rf"^const TAB_SIZE = {blocks.TAB_SIZE};$", js, re.M)
@@ -0,0 +1,28 @@
+from sqlalchemy import text
+
+from app import models
+from app.database import SessionLocal, engine, read_engine
+
+
+def test_sqlite_enforces_foreign_keys():
+    for eng in {engine, read_engine}:
+        with eng.connect() as conn:
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def test_deleting_a_section_cascades_to_its_history(client, auth, make_project):
+    project = make_project(sections=1)
+    sid = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"][0]["id"]
+    client.post(f"/api/projects/{project['id']}/sections/{sid}/refine", json={"instruction": "shorter"}, headers=auth)
+    client.post(f"/api/projects/{project['id']}/sections/{sid}/feedback", json={"action": "like", "comment": "ok"}, headers=auth)
+
+    db = SessionLocal()
+    try:
+        assert db.query(models.SectionRevision).filter_by(section_id=sid).count() == 1
+        assert db.query(models.SectionComment).filter_by(section_id=sid).count() == 1
+        db.delete(db.get(models.Section, sid))
+        db.commit()
+        assert db.query(models.SectionRevision).filter_by(section_id=sid).count() == 0
+        assert db.query(models.SectionComment).filter_by(section_id=sid).count() == 0
+    finally:
+        db.close()
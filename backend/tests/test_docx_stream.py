@@ -0,0 +1,60 @@
+import io
+import uuid
+import zipfile
+from types import SimpleNamespace
+
+from docx import Document
+
+from app import docx_stream, generator, images, llm_client
+
+CONTENT = """## Overview
+Plain text with **bold**, *italic* and ***both***.
+- First point
+  - Nested point
+- Second point
+1. Step one
+2. Step two
+Tabs\tand <escaped> & characters"""
+
+
+def _project(sections: int = 25):
+    image_ids = [images.put(llm_client._stub_image(uuid.uuid4().hex)) for _ in range(2)]
+    project = SimpleNamespace(id=1, title="Streamed report", topic="Otters & rivers", doc_type="docx")
+    rows = [
+        # Every third section has an image; two of them share one blob
+        SimpleNamespace(id=i, order=i, title=f"Section {i}", content=CONTENT,
+                        image_id=image_ids[i // 3 % 2] if i % 3 == 0 else None)
+        for i in reversed(range(sections))  # out of order on purpose
+    ]
+    return project, rows
+
+
+def _paragraphs(doc):
+    return [
+        (p.style.name, p.text, tuple((r.text, bool(r.bold), bool(r.italic)) for r in p.runs if r.text))
+        for p in doc.paragraphs
+    ]
+
+
+def test_streamed_docx_matches_python_docx():
+    project, sections = _project()
+    streamed = b"".join(docx_stream.iter_docx(project, sections, chunk_size=4096))
+    built = generator.assemble_docx(project, sections).getvalue()
+
+    assert zipfile.ZipFile(io.BytesIO(streamed)).testzip() is None
+    streamed_doc, built_doc = Document(io.BytesIO(streamed)), Document(io.BytesIO(built))
+    assert _paragraphs(streamed_doc) == _paragraphs(built_doc)
+
+    styles = {name for name, _, _ in _paragraphs(streamed_doc)}
+    assert {"Heading 1", "Heading 2", "Heading 3", "List Bullet", "List Bullet 2", "Topic"} <= styles
+    assert len(streamed_doc.inline_shapes) == len(built_doc.inline_shapes) == 9
+
+
+def test_streamed_docx_embeds_each_image_once():
+    project, sections = _project()
+    streamed = b"".join(docx_stream.iter_docx(project, sections))
+    with zipfile.ZipFile(io.BytesIO(streamed)) as z:
+        media = [n for n in z.namelist() if n.startswith("word/media/")]
+        stored = {open(images.variant(s.image_id, "page")[0], "rb").read() for s in sections if s.image_id}
+        assert len(media) == 2
+        assert {z.read(n) for n in media} == stored
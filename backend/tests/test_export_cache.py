@@ -0,0 +1,61 @@
+import io
+import os
+import zipfile
+
+from app import export_cache, models
+from app.database import SessionLocal
+
+
+def test_export_etag_and_304(client, auth, make_project):
+    project = make_project(sections=2)
+    client.post(f"/api/projects/{project['id']}/generate", headers=auth)
+    r = client.get(f"/api/export/{project['id']}", headers=auth)
+    assert r.status_code == 200
+    assert zipfile.is_zipfile(io.BytesIO(r.content))
+    assert r.headers["content-length"] == str(len(r.content))
+    etag = r.headers["etag"]
+
+    r = client.get(f"/api/export/{project['id']}", headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 304
+
+    sid = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"][0]["id"]
+    client.post(f"/api/projects/{project['id']}/sections/{sid}/refine", json={"instruction": "shorter"}, headers=auth)
+    r = client.get(f"/api/export/{project['id']}", headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_export_survives_invalidation_before_open(client, auth, make_project, monkeypatch):
+    project = make_project(sections=2)
+    real = export_cache.render
+    removed = []
+
+    def render_then_invalidate(*args, **kwargs):
+        result = real(*args, **kwargs)
+        if not removed:
+            # A concurrent commit invalidates the artifact right after lookup
+            export_cache.invalidate(project["id"])
+            removed.append(result[0])
+        return result
+
+    monkeypatch.setattr(export_cache, "render", render_then_invalidate)
+    r = client.get(f"/api/export/{project['id']}", headers=auth)
+    assert r.status_code == 200
+    assert removed
+    assert zipfile.is_zipfile(io.BytesIO(r.content))
+
+
+def test_open_artifact_stays_readable_after_invalidation(make_project):
+    project_id = make_project(sections=2)["id"]
+    db = SessionLocal()
+    try:
+        project = db.get(models.Project, project_id)
+        f, _, _, _ = export_cache.open_render(project, project.sections)
+        path = f.name
+        export_cache.invalidate(project_id)
+        assert not os.path.exists(path)
+        data = b"".join(export_cache.iter_file(f))
+    finally:
+        db.close()
+    assert f.closed
+    assert zipfile.is_zipfile(io.BytesIO(data))
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app import feedback, models
+from app.database import SessionLocal
+
+
+def _counts(section_id):
+    db = SessionLocal()
+    try:
+        section = db.get(models.Section, section_id)
+        return section.likes, section.dislikes
+    finally:
+        db.close()
+
+
+def _first_section(client, auth, project_id):
+    return client.get(f"/api/projects/{project_id}", headers=auth).json()["sections"][0]["id"]
+
+
+def test_concurrent_likes_all_count(client, auth, make_project):
+    project_id = make_project(sections=1)["id"]
+    section_id = _first_section(client, auth, project_id)
+    url = f"/api/projects/{project_id}/sections/{section_id}/feedback"
+    n = 20
+
+    def like(_):
+        return client.post(url, json={"action": "like"}, headers=auth).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(like, range(n))) == [200] * n
+    assert _counts(section_id) == (n, 0)
+
+
+def test_buffered_clicks_are_written_on_shutdown(client, auth, make_project, monkeypatch):
+    project_id = make_project(sections=1)["id"]
+    section_id = _first_section(client, auth, project_id)
+    # Long enough that only shutdown() writes them
+    monkeypatch.setattr(feedback, "FLUSH_MS", 60_000)
+
+    db = SessionLocal()
+    try:
+        for action in ("like", "like", "dislike", "comment"):
+            feedback.record(db, section_id, action)
+        db.commit()
+    finally:
+        db.close()
+    assert _counts(section_id) == (0, 0)
+    assert feedback._flusher is not None
+
+    feedback.shutdown()
+    assert feedback._flusher is None
+    assert feedback._pending == {}
+    assert _counts(section_id) == (2, 1)
@@ -0,0 +1,85 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app import content, llm_client
+
+
+@pytest.mark.parametrize("text", [
+    '{"1": "Alpha", "2": "Beta"}',
+    'Here is the content:\n```json\n{"1": "Alpha", "2": "Beta"}\n```\nLet me know if you need more.',
+    '["Alpha", "Beta"]',
+    '{"1.": "Alpha", " 2 ": "Beta"}',
+])
+def test_parse_batch_valid(text):
+    assert content.parse_batch(text, 2) == {1: "Alpha", 2: "Beta"}
+
+
+def test_parse_batch_keeps_well_formed_entries_only():
+    text = json.dumps({"1": "Alpha", "2": "", "3": ["not", "a", "string"], "4": "Out of range", "x": "No number"})
+    assert content.parse_batch(text, 3) == {1: "Alpha"}
+
+
+def test_parse_batch_cleans_markdown_per_entry():
+    assert content.parse_batch('{"1": "* one\\n* two"}', 1) == {1: "- one\n- two"}
+
+
+@pytest.mark.parametrize("text", ["Sorry, I can't help with that.", "{not json}", '"just a string"', ""])
+def test_parse_batch_non_json(text):
+    assert content.parse_batch(text, 2) == {}
+
+
+def _sections(n):
+    return [SimpleNamespace(id=i, order=i, title=f"Topic {i}", content="", fingerprint=None) for i in range(n)]
+
+
+def _fake_provider(batch_answer):
+    single_calls = []
+
+    def provider(prompt, max_tokens, temperature):
+        if "JSON object" in prompt:
+            return batch_answer(prompt)
+        single_calls.append(re.search(r"titled '(.*?)'", prompt).group(1))
+        return f"single {single_calls[-1]}"
+
+    return provider, single_calls
+
+
+def test_batch_falls_back_only_for_missing_sections(monkeypatch):
+    monkeypatch.setattr(content, "GENERATE_BATCH", True)
+    # The provider answers items 1 and 3 and leaves out 2
+    provider, single_calls = _fake_provider(lambda prompt: '{"1": "batched A", "3": "batched C"}')
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    project = SimpleNamespace(title="P", topic="Batch fallback", doc_type="docx", owner_id=None)
+    sections = _sections(3)
+
+    results = content.generate_sections(project, sections, use_cache=False)
+    assert [(s.title, text, error) for s, text, error in results] == [
+        ("Topic 0", "batched A", None),
+        ("Topic 1", "single Topic 1", None),
+        ("Topic 2", "batched C", None),
+    ]
+    assert single_calls == ["Topic 1"]
+
+
+def test_unparseable_batch_falls_back_for_every_section(monkeypatch):
+    monkeypatch.setattr(content, "GENERATE_BATCH", True)
+    provider, single_calls = _fake_provider(lambda prompt: "I could not produce JSON.")
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    project = SimpleNamespace(title="P", topic="Batch failure", doc_type="docx", owner_id=None)
+
+    results = content.generate_sections(project, _sections(3), use_cache=False)
+    assert [text for _, text, _ in results] == ["single Topic 0", "single Topic 1", "single Topic 2"]
+    assert sorted(single_calls) == ["Topic 0", "Topic 1", "Topic 2"]
+
+
+def test_small_projects_are_not_batched(monkeypatch):
+    monkeypatch.setattr(content, "GENERATE_BATCH", True)
+    provider, single_calls = _fake_provider(lambda prompt: pytest.fail("batched a small project"))
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    project = SimpleNamespace(title="P", topic="Small", doc_type="docx", owner_id=None)
+
+    content.generate_sections(project, _sections(content.BATCH_MIN_SECTIONS - 1), use_cache=False)
+    assert len(single_calls) == content.BATCH_MIN_SECTIONS - 1
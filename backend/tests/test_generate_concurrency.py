@@ -0,0 +1,63 @@
+import threading
+import time
+
+from app import llm_client
+
+
+def test_calls_run_concurrently_and_keep_prompt_order(monkeypatch):
+    monkeypatch.setattr(llm_client, "MOCK_LATENCY_MS", 200)
+    prompts = [f"concurrency prompt {i}" for i in range(8)]
+    start = time.perf_counter()
+    results = llm_client.call_llm_many(prompts, use_cache=False)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.2 * len(prompts) / 2
+    for prompt, (text, error) in zip(prompts, results):
+        assert error is None
+        assert prompt in text
+
+
+def test_concurrency_is_capped_per_provider(monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY_MOCK", "3")
+    monkeypatch.setattr(llm_client, "_schedulers", {})
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def provider(prompt, max_tokens, temperature):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return prompt
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    llm_client.call_llm_many([f"capped {i}" for i in range(12)], use_cache=False)
+    assert 1 <= peak[0] <= 3
+
+
+def test_generate_reports_failures_per_section(client, auth, make_project, monkeypatch):
+    project = make_project(sections=4)
+    real = llm_client._call_provider
+
+    def provider(prompt, max_tokens, temperature):
+        if "'S2'" in prompt:
+            raise RuntimeError("provider down")
+        return real(prompt, max_tokens, temperature)
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    r = client.post(f"/api/projects/{project['id']}/generate", headers=auth)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "partial"
+    assert [e["title"] for e in body["errors"]] == ["S2"]
+
+    sections = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"]
+    for s in sections:
+        if s["title"] == "S2":
+            assert s["content"] == ""
+        else:
+            # Each result was written back to its own section
+            assert f"'{s['title']}'" in s["content"]
@@ -0,0 +1,91 @@
+import re
+
+import pytest
+
+from app import fingerprints, llm_client, models
+from app.database import SessionLocal
+
+
+@pytest.fixture
+def provider_calls(monkeypatch):
+    """Titles of the sections the provider was asked for."""
+    calls = []
+
+    def provider(prompt, max_tokens, temperature):
+        calls.append(re.search(r"titled '(.*?)'", prompt).group(1))
+        return f"content for {calls[-1]}"
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    return calls
+
+
+def _generate(client, auth, project, **params):
+    r = client.post(f"/api/projects/{project['id']}/generate", params={"use_cache": "false", **params}, headers=auth)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _update_section(section_id, **values):
+    db = SessionLocal()
+    try:
+        section = db.get(models.Section, section_id)
+        for name, value in values.items():
+            setattr(section, name, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_second_generate_skips_everything(client, auth, make_project, provider_calls):
+    project = make_project(sections=3)
+    assert _generate(client, auth, project)["skipped"] == 0
+    assert sorted(provider_calls) == ["S0", "S1", "S2"]
+
+    body = _generate(client, auth, project)
+    assert body["skipped"] == 3
+    assert body["message"] == "All sections are up to date."
+    assert len(provider_calls) == 3
+
+
+def test_retitled_section_is_the_only_one_regenerated(client, auth, make_project, provider_calls):
+    project = make_project(sections=3)
+    _generate(client, auth, project)
+    sections = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"]
+    _update_section(sections[1]["id"], title="Renamed")
+    provider_calls.clear()
+
+    assert _generate(client, auth, project)["skipped"] == 2
+    assert provider_calls == ["Renamed"]
+    after = {s["id"]: s["content"] for s in client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"]}
+    assert after[sections[1]["id"]] == "content for Renamed"
+    assert after[sections[0]["id"]] == sections[0]["content"]
+
+
+def test_emptied_section_is_regenerated(client, auth, make_project, provider_calls):
+    project = make_project(sections=2)
+    _generate(client, auth, project)
+    section_id = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"][0]["id"]
+    _update_section(section_id, content="")
+    provider_calls.clear()
+
+    assert _generate(client, auth, project)["skipped"] == 1
+    assert provider_calls == ["S0"]
+
+
+def test_force_regenerates_everything(client, auth, make_project, provider_calls):
+    project = make_project(sections=3)
+    _generate(client, auth, project)
+    provider_calls.clear()
+
+    assert _generate(client, auth, project, force="true")["skipped"] == 0
+    assert sorted(provider_calls) == ["S0", "S1", "S2"]
+
+
+def test_prompt_version_bump_regenerates(client, auth, make_project, provider_calls, monkeypatch):
+    project = make_project(sections=2)
+    _generate(client, auth, project)
+    provider_calls.clear()
+
+    monkeypatch.setattr(fingerprints, "PROMPT_VERSION", fingerprints.PROMPT_VERSION + "-next")
+    assert _generate(client, auth, project)["skipped"] == 0
+    assert sorted(provider_calls) == ["S0", "S1"]
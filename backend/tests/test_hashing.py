@@ -0,0 +1,64 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from passlib.hash import pbkdf2_sha256
+
+from app import hashing, models
+from app.database import SessionLocal
+
+
+def _register(client):
+    email = f"{uuid.uuid4().hex}@example.com"
+    assert client.post("/api/auth/register", json={"email": email, "password": "pw"}).status_code == 200
+    return email
+
+
+def test_full_queue_is_503(client):
+    email = _register(client)
+    taken = 0
+    while hashing._slots.acquire(blocking=False):
+        taken += 1
+    try:
+        r = client.post("/api/auth/login", json={"email": email, "password": "pw"})
+    finally:
+        for _ in range(taken):
+            hashing._slots.release()
+    assert taken == hashing.MAX_PENDING
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+    assert client.post("/api/auth/login", json={"email": email, "password": "pw"}).status_code == 200
+
+
+def test_login_upgrades_weaker_hash(client):
+    email = _register(client)
+    weak = pbkdf2_sha256.using(rounds=hashing.HASH_ROUNDS // 2).hash("pw")
+    db = SessionLocal()
+    try:
+        db.query(models.User).filter(models.User.email == email).one().hashed_password = weak
+        db.commit()
+
+        assert client.post("/api/auth/login", json={"email": email, "password": "pw"}).status_code == 200
+        db.expire_all()
+        stored = db.query(models.User).filter(models.User.email == email).one().hashed_password
+    finally:
+        db.close()
+    assert stored != weak
+    assert stored.split("$")[2] == str(hashing.HASH_ROUNDS)
+    assert pbkdf2_sha256.verify("pw", stored)
+
+
+def test_pool_is_replaced_after_a_worker_dies(monkeypatch):
+    monkeypatch.setattr(hashing, "WORKERS", 1)
+    try:
+        pool = hashing._get_pool()
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result(timeout=30)
+
+        hashed = asyncio.run(hashing.hash_async("pw"))
+        assert hashing.verify_password("pw", hashed)
+        assert hashing._pool is not None and hashing._pool is not pool
+    finally:
+        hashing.shutdown()
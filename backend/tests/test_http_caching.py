@@ -0,0 +1,78 @@
+def test_summary_pages_have_their_own_etags(client, auth, make_project):
+    for _ in range(3):
+        make_project(sections=0)
+    first = client.get("/api/projects/summary?limit=2", headers=auth)
+    cursor = first.json()["next_cursor"]
+    second = client.get(f"/api/projects/summary?limit=2&cursor={cursor}", headers=auth)
+    other_limit = client.get("/api/projects/summary?limit=1", headers=auth)
+    tags = {first.headers["etag"], second.headers["etag"], other_limit.headers["etag"]}
+    assert len(tags) == 3
+
+    # The first page's tag doesn't validate another page
+    r = client.get(f"/api/projects/summary?limit=2&cursor={cursor}", headers={**auth, "If-None-Match": first.headers["etag"]})
+    assert r.status_code == 200
+    assert r.json() == second.json()
+    r = client.get(f"/api/projects/summary?limit=2&cursor={cursor}", headers={**auth, "If-None-Match": second.headers["etag"]})
+    assert r.status_code == 304
+
+
+def test_large_json_is_gzipped_and_images_are_not(client, auth, make_project):
+    project = make_project(sections=12, title="x" * 200)
+    r = client.get(f"/api/projects/{project['id']}", headers={**auth, "Accept-Encoding": "gzip"})
+    assert r.headers.get("content-encoding") == "gzip"
+
+    client.post(f"/api/projects/{project['id']}/generate?images=true", headers=auth)
+    section = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"][0]
+    r = client.get(f"/api/projects/{project['id']}/sections/{section['id']}/image",
+                   headers={**auth, "Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("image/")
+    assert "content-encoding" not in r.headers
+    assert len(r.content) > 1024  # big enough that it would have been compressed
+
+
+def test_gzip_excludes_images():
+    from starlette.middleware.gzip import GZipMiddleware
+    from app.main import app
+
+    gzip_mw = next(m for m in app.user_middleware if m.cls is GZipMiddleware)
+    assert "image/*" in gzip_mw.kwargs["exclude_content_types"]
+
+
+def _project_etag(client, auth, project_id):
+    r = client.get(f"/api/projects/{project_id}", headers=auth)
+    assert r.status_code == 200
+    return r.headers["etag"]
+
+
+def test_unchanged_project_is_304(client, auth, make_project):
+    project = make_project(sections=2)
+    etag = _project_etag(client, auth, project["id"])
+    r = client.get(f"/api/projects/{project['id']}", headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+    assert r.content == b""
+
+
+def test_project_writes_change_the_etag(client, auth, make_project):
+    project = make_project(sections=2)
+    url = f"/api/projects/{project['id']}"
+    etags = [_project_etag(client, auth, project["id"])]
+
+    assert client.post(f"{url}/generate", headers=auth).status_code == 200
+    etags.append(_project_etag(client, auth, project["id"]))
+
+    section_id = client.get(url, headers=auth).json()["sections"][0]["id"]
+    r = client.post(f"{url}/sections/{section_id}/refine", json={"instruction": "shorter"}, headers=auth)
+    assert r.status_code == 200
+    etags.append(_project_etag(client, auth, project["id"]))
+
+    r = client.post(f"{url}/sections/{section_id}/feedback", json={"action": "like"}, headers=auth)
+    assert r.status_code == 200
+    etags.append(_project_etag(client, auth, project["id"]))
+
+    assert len(set(etags)) == len(etags)
+    # The old copy is no longer current
+    r = client.get(url, headers={**auth, "If-None-Match": etags[0]})
+    assert r.status_code == 200
+    assert r.json()["sections"][0]["likes"] == 1
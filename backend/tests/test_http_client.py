@@ -0,0 +1,114 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.http_client import CircuitBreaker, CircuitOpenError, ProviderClient
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        server = self.server
+        server.hits.append(time.monotonic())
+        status, headers = server.script.pop(0) if server.script else (200, {})
+        body = b'{"ok": true}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    """Local provider stand-in; set `stub.script` to a list of (status, headers) to answer with."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.script = []
+    server.hits = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(stub, threshold=5, reset=30.0, **kwargs):
+    kwargs.setdefault("max_retries", 2)
+    kwargs.setdefault("backoff_base", 0.01)
+    return ProviderClient("stub", stub.url, breaker=CircuitBreaker(threshold, reset), **kwargs)
+
+
+def test_retries_on_503(stub):
+    stub.script = [(503, {}), (503, {})]
+    client = _client(stub)
+    resp = client.post("/generate", json={})
+    assert resp.status_code == 200
+    assert len(stub.hits) == 3
+    assert client.breaker.state == "closed"
+
+
+def test_backoff_honours_retry_after(stub):
+    stub.script = [(429, {"Retry-After": "1"})]
+    client = _client(stub)
+    assert client.post("/generate", json={}).status_code == 200
+    assert stub.hits[1] - stub.hits[0] >= 0.9
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.script = [(502, {})] * 5
+    client = _client(stub)
+    assert client.post("/generate", json={}).status_code == 502
+    assert len(stub.hits) == 3
+    assert client.breaker.failures == 1
+
+
+def test_breaker_opens_and_fails_fast(stub):
+    stub.script = [(503, {})] * 10
+    client = _client(stub, threshold=2, max_retries=0)
+    client.post("/generate", json={})
+    client.post("/generate", json={})
+    with pytest.raises(CircuitOpenError) as exc:
+        client.post("/generate", json={})
+    assert exc.value.retry_after > 0
+    assert len(stub.hits) == 2
+
+
+def test_breaker_recovers_after_half_open_trial(stub):
+    stub.script = [(503, {})] * 2
+    client = _client(stub, threshold=2, reset=0.1, max_retries=0)
+    client.post("/generate", json={})
+    client.post("/generate", json={})
+    assert client.breaker.state == "open"
+    time.sleep(0.15)
+    assert client.breaker.state == "half_open"
+    assert client.post("/generate", json={}).status_code == 200
+    assert client.breaker.state == "closed"
+
+
+def test_failed_trial_with_unexpected_error_reopens(stub, monkeypatch):
+    stub.script = [(503, {})] * 2
+    client = _client(stub, threshold=2, reset=0.1, max_retries=0)
+    client.post("/generate", json={})
+    client.post("/generate", json={})
+    time.sleep(0.15)
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("truncated")
+
+    monkeypatch.setattr(client.session, "post", broken)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.post("/generate", json={})
+    # The trial was settled: the circuit reopened rather than staying stuck half-open
+    assert client.breaker.state == "open"
+    monkeypatch.undo()
+    time.sleep(0.15)
+    assert client.post("/generate", json={}).status_code == 200
@@ -0,0 +1,90 @@
+import io
+import os
+import uuid
+import zipfile
+
+from app import images, llm_client, metrics, models
+from app.database import SessionLocal
+
+
+def _blob_files(blob_id):
+    directory = os.path.join(images.STORE_DIR, blob_id[:2])
+    return sorted(f for f in os.listdir(directory) if f.startswith(blob_id))
+
+
+def test_put_deduplicates():
+    data = llm_client._stub_image(uuid.uuid4().hex)
+    blob_id = images.put(data)
+    files = _blob_files(blob_id)
+    assert len(files) == 1 + len(images.VARIANTS)
+    before = metrics.images._values.get(("deduplicated",), 0)
+
+    assert images.put(data) == blob_id
+    assert _blob_files(blob_id) == files
+    assert metrics.images._values.get(("deduplicated",), 0) == before + 1
+
+
+def test_prompt_index_skips_the_provider(monkeypatch):
+    calls = []
+
+    def generate_image(prompt, user=None):
+        calls.append(prompt)
+        return llm_client._stub_image(prompt)
+
+    monkeypatch.setattr(llm_client, "generate_image", generate_image)
+    prompt = uuid.uuid4().hex
+    blob_id = images.for_prompt(prompt)
+    assert images.for_prompt(prompt) == blob_id
+    assert calls == [prompt]
+
+    # Bypassing the index asks again; the same bytes land on the same blob
+    assert images.for_prompt(prompt, use_cache=False) == blob_id
+    assert calls == [prompt, prompt]
+
+
+def _project_with_images(client, auth, make_project, doc_type):
+    project = make_project(sections=1, doc_type=doc_type)
+    r = client.post(f"/api/projects/{project['id']}/generate?images=true", headers=auth)
+    assert r.status_code == 200, r.text
+    section = client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"][0]
+    assert section["image_id"]
+    return project, section
+
+
+def test_exports_embed_stored_variants_byte_for_byte(client, auth, make_project):
+    for doc_type, variant in (("docx", "page"), ("pptx", "slide")):
+        project, section = _project_with_images(client, auth, make_project, doc_type)
+        with open(images.variant(section["image_id"], variant)[0], "rb") as f:
+            stored = f.read()
+        r = client.get(f"/api/export/{project['id']}", headers=auth)
+        assert r.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(r.content)) as z:
+            media = [z.read(n) for n in z.namelist() if "/media/" in n]
+        assert stored in media, doc_type
+
+
+def test_section_image_revalidates(client, auth, make_project):
+    project, section = _project_with_images(client, auth, make_project, "docx")
+    url = f"/api/projects/{project['id']}/sections/{section['id']}/image"
+    r = client.get(url, headers=auth)
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == "private, no-cache"
+    etag = r.headers["etag"]
+    assert section["image_id"] in etag
+
+    r = client.get(url, headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 304
+    # Each variant has its own validator
+    assert client.get(url + "?variant=slide", headers={**auth, "If-None-Match": etag}).status_code == 200
+
+    # A replaced image is served under the same URL with a new ETag
+    other = images.put(llm_client._stub_image(uuid.uuid4().hex))
+    db = SessionLocal()
+    try:
+        db.get(models.Section, section["id"]).image_id = other
+        db.commit()
+    finally:
+        db.close()
+    r = client.get(url, headers={**auth, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert other in r.headers["etag"]
@@ -0,0 +1,122 @@
+import datetime
+import json
+import os
+import time
+
+from app import jobs, models
+from app.database import SessionLocal
+
+
+def _wait(client, auth, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}", headers=auth).json()
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {job}")
+
+
+def _insert_job(project_id, worker, heartbeat_at, status="running"):
+    db = SessionLocal()
+    try:
+        owner_id = db.get(models.Project, project_id).owner_id
+        job = models.Job(
+            owner_id=owner_id,
+            project_id=project_id,
+            kind="generate",
+            params=json.dumps({}),
+            status=status,
+            worker=worker,
+            heartbeat_at=heartbeat_at,
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _job(job_id):
+    db = SessionLocal()
+    try:
+        return db.get(models.Job, job_id)
+    finally:
+        db.close()
+
+
+def test_submitted_job_runs(client, auth, make_project):
+    project = make_project(sections=2)
+    r = client.post("/api/jobs/", json={"kind": "generate", "project_id": project["id"]}, headers=auth)
+    assert r.status_code == 202
+    job = _wait(client, auth, r.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["generated"] == 2
+
+
+def test_recover_leaves_jobs_leased_by_a_live_worker(make_project):
+    project = make_project(sections=1)
+    job_id = _insert_job(project["id"], "other-host:1", datetime.datetime.utcnow())
+    jobs.recover()
+    job = _job(job_id)
+    assert (job.status, job.worker) == ("running", "other-host:1")
+
+
+def test_recover_claims_jobs_with_expired_leases(client, auth, make_project):
+    project = make_project(sections=1)
+    stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=jobs.LEASE_SECONDS * 2)
+    job_id = _insert_job(project["id"], "dead-host:1", stale)
+    assert jobs.recover() >= 1
+    assert _wait(client, auth, job_id)["status"] == "succeeded"
+    assert _job(job_id).worker == jobs.worker_id()
+
+
+def test_run_skips_jobs_owned_by_another_worker(make_project):
+    project = make_project(sections=1)
+    job_id = _insert_job(project["id"], "other-host:1", datetime.datetime.utcnow(), status="queued")
+    jobs.run(job_id)
+    assert _job(job_id).status == "queued"
+
+
+def _finished_export(client, auth, project_id):
+    r = client.post("/api/jobs/", json={"kind": "export", "project_id": project_id}, headers=auth)
+    job = _wait(client, auth, r.json()["id"])
+    assert job["status"] == "succeeded"
+    return job["id"], json.loads(_job(job["id"]).result)["path"]
+
+
+def _age(job_id, hours):
+    db = SessionLocal()
+    try:
+        job = db.get(models.Job, job_id)
+        job.finished_at = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_purge_deletes_old_jobs_and_their_files(client, auth, make_project, monkeypatch):
+    monkeypatch.setattr(jobs, "RETENTION_HOURS", 24)
+    project = make_project(sections=1, doc_type="docx")
+    old_id, old_path = _finished_export(client, auth, project["id"])
+    new_id, new_path = _finished_export(client, auth, project["id"])
+    _age(old_id, 25)
+    running_id = _insert_job(project["id"], "other-host:1", datetime.datetime.utcnow())
+
+    assert jobs.purge() == 1
+    assert _job(old_id) is None
+    assert not os.path.exists(old_path)
+    assert client.get(f"/api/jobs/{old_id}", headers=auth).status_code == 404
+    # Recent and unfinished jobs stay
+    assert _job(new_id) is not None and os.path.exists(new_path)
+    assert _job(running_id).status == "running"
+    assert client.get(f"/api/jobs/{new_id}/result", headers=auth).status_code == 200
+
+
+def test_purge_off_when_retention_is_zero(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1, doc_type="docx")
+    job_id, path = _finished_export(client, auth, project["id"])
+    _age(job_id, 24 * 365)
+    monkeypatch.setattr(jobs, "RETENTION_HOURS", 0)
+    assert jobs.purge() == 0
+    assert _job(job_id) is not None and os.path.exists(path)
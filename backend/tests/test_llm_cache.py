@@ -0,0 +1,77 @@
+import time
+
+from app import llm_cache, llm_client
+from app.cache import TTLCache
+
+
+def _counting_provider(monkeypatch, reply=None):
+    calls = []
+
+    def provider(prompt, max_tokens, temperature):
+        calls.append(prompt)
+        return reply if reply is not None else f"answer to {prompt}"
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    return calls
+
+
+def test_key_covers_every_request_parameter():
+    base = ("openai", "gpt-4o-mini", "prompt", 600, 0.7)
+    keys = {llm_cache.make_key(*base)}
+    for i, changed in enumerate(("gemini", "other-model", "prompt 2", 601, 0.2)):
+        args = list(base)
+        args[i] = changed
+        keys.add(llm_cache.make_key(*args))
+    assert len(keys) == 6
+    assert llm_cache.make_key(*base) == llm_cache.make_key(*base)
+
+
+def test_call_llm_is_cached_and_can_be_bypassed(monkeypatch):
+    calls = _counting_provider(monkeypatch)
+    first = llm_client.call_llm("cache me")
+    assert llm_client.call_llm("cache me") == first
+    assert len(calls) == 1
+
+    llm_client.call_llm("cache me", use_cache=False)
+    assert len(calls) == 2
+
+
+def test_error_responses_are_not_cached(monkeypatch):
+    calls = _counting_provider(monkeypatch, reply="[ERROR] provider said no")
+    llm_client.call_llm("failing prompt")
+    llm_client.call_llm("failing prompt")
+    assert len(calls) == 2
+
+
+def test_disk_tier_survives_memory_eviction():
+    key = llm_cache.make_key("mock", "mock", "persisted", 600, 0.7)
+    llm_cache.put(key, "stored")
+    llm_cache._memory.clear()
+    hits = llm_cache.stats()["disk_hits"]
+    assert llm_cache.get(key) == "stored"
+    assert llm_cache.stats()["disk_hits"] == hits + 1
+
+
+def test_disk_entries_expire(monkeypatch):
+    key = llm_cache.make_key("mock", "mock", "expiring", 600, 0.7)
+    llm_cache.put(key, "stale soon")
+    llm_cache._memory.clear()
+    monkeypatch.setattr(llm_cache, "TTL", 0)
+    time.sleep(0.01)
+    evictions = llm_cache.stats()["disk_evictions"]
+    assert llm_cache.get(key) is None
+    assert llm_cache.stats()["disk_evictions"] == evictions + 1
+
+
+def test_memory_tier_is_lru_with_ttl():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None  # least recently used
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("short", 4, ttl=0)
+    assert cache.get("short") is None
@@ -0,0 +1,52 @@
+import pytest
+
+from app import llm_client
+from app.http_client import CircuitOpenError
+
+
+def _section(client, auth, project):
+    return client.get(f"/api/projects/{project['id']}", headers=auth).json()["sections"][0]
+
+
+@pytest.mark.parametrize("failure", [RuntimeError("boom"), "[ERROR] OPENAI_API_KEY not set"])
+def test_refine_provider_failure_is_502(client, auth, make_project, monkeypatch, failure):
+    project = make_project(sections=1)
+    section = _section(client, auth, project)
+
+    def provider(prompt, max_tokens, temperature):
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    r = client.post(f"/api/projects/{project['id']}/sections/{section['id']}/refine",
+                    json={"instruction": "shorter"}, params={"use_cache": "false"}, headers=auth)
+    assert r.status_code == 502
+    assert r.json()["detail"]["message"] == "Refinement failed."
+    # Nothing was written
+    assert _section(client, auth, project)["content"] == section["content"]
+
+
+def test_ai_template_provider_failure_is_502(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1)
+
+    def provider(prompt, max_tokens, temperature):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    r = client.post(f"/api/projects/{project['id']}/ai-template?use_cache=false",
+                    json={"topic": "Failing outline", "doc_type": "pptx"}, headers=auth)
+    assert r.status_code == 502
+
+
+def test_open_circuit_is_still_503(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1)
+
+    def provider(prompt, max_tokens, temperature):
+        raise CircuitOpenError("mock", 12)
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    r = client.post(f"/api/projects/{project['id']}/ai-template?use_cache=false",
+                    json={"topic": "Circuit open", "doc_type": "pptx"}, headers=auth)
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "12"
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app import content, fingerprints, migrations, models
+from app.database import make_engine
+
+
+def test_migrations_do_not_load_the_llm_client():
+    code = "import sys, app.migrations; print(sorted(m for m in ('app.content', 'app.llm_client', 'app.images') if m in sys.modules))"
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=backend, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+def test_fingerprint_depends_on_generation_inputs():
+    project = SimpleNamespace(title="Deck", topic="Otters", doc_type="pptx")
+    section = SimpleNamespace(title="Habitat")
+    base = fingerprints.fingerprint(project, section)
+    assert content.fingerprint is fingerprints.fingerprint
+    assert fingerprints.fingerprint(project, SimpleNamespace(title="Diet")) != base
+    assert fingerprints.fingerprint(SimpleNamespace(title="Deck", topic="Otters", doc_type="docx"), section) != base
+    # Without a topic the title is what the prompt is about
+    assert fingerprints.fingerprint(SimpleNamespace(title="Otters", topic=None, doc_type="pptx"), section) == base
+
+
+def _legacy_db(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    migrations.upgrade(bind=engine)
+    history = json.dumps([
+        {"instruction": "shorter", "result": "Short."},
+        {"instruction": "formal", "result": "Formal."},
+        "not a dict",
+    ])
+    notes = json.dumps([{"comment": "Nice"}, {"comment": ""}, {"comment": "Add a chart"}])
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), {"id": 1, "email": "a@example.com", "hashed_password": "x"})
+        conn.execute(models.Project.__table__.insert(), {"id": 1, "title": "Deck", "doc_type": "pptx", "owner_id": 1, "version": 1})
+        conn.execute(models.Section.__table__.insert(), [
+            {"id": 1, "project_id": 1, "title": "Intro", "content": "", "refinement_history": history, "comments": notes},
+            {"id": 2, "project_id": 1, "title": "Body", "content": "", "refinement_history": "{broken", "comments": ""},
+            {"id": 3, "project_id": 1, "title": "End", "content": "", "refinement_history": "", "comments": ""},
+        ])
+    return engine
+
+
+def test_section_blobs_move_to_their_tables(tmp_path):
+    engine = _legacy_db(tmp_path)
+    migrations.upgrade(bind=engine)
+    migrations.upgrade(bind=engine)  # Nothing left to move the second time
+
+    revisions, comments, sections = (
+        models.SectionRevision.__table__, models.SectionComment.__table__, models.Section.__table__,
+    )
+    with engine.connect() as conn:
+        moved = conn.execute(select(revisions.c.section_id, revisions.c.instruction, revisions.c.result).order_by(revisions.c.id)).all()
+        notes = conn.execute(select(comments.c.section_id, comments.c.comment).order_by(comments.c.id)).all()
+        blobs = conn.execute(select(sections.c.refinement_history, sections.c.comments)).all()
+    engine.dispose()
+
+    assert [tuple(r) for r in moved] == [(1, "shorter", "Short."), (1, "formal", "Formal.")]
+    assert [tuple(r) for r in notes] == [(1, "Nice"), (1, "Add a chart")]
+    assert all(tuple(b) == ("", "") for b in blobs)
@@ -0,0 +1,71 @@
+import contextlib
+
+from sqlalchemy import event
+
+from app import auth, deps, models
+from app.database import SessionLocal, engine
+
+
+@contextlib.contextmanager
+def _count_user_queries():
+    queries = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            queries.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def _user_id(headers) -> int:
+    token = headers["Authorization"].split()[1]
+    return int(auth.decode_access_token(token)["sub"])
+
+
+def _list(client, headers):
+    return client.get("/api/projects/", headers=headers)
+
+
+def test_repeated_requests_use_the_cache(client, auth):
+    token = auth["Authorization"].split()[1]
+    assert _list(client, auth).status_code == 200
+    assert deps._principals.get((None, token)) is not None
+
+    with _count_user_queries() as queries:
+        for _ in range(3):
+            assert _list(client, auth).status_code == 200
+    assert queries == []
+
+
+def test_password_change_drops_the_cached_principal(client, auth):
+    assert _list(client, auth).status_code == 200
+    db = SessionLocal()
+    try:
+        user = db.get(models.User, _user_id(auth))
+        user.hashed_password = "changed"
+        db.commit()
+    finally:
+        db.close()
+
+    # The token is still a valid JWT, but the principal behind it is looked up again
+    with _count_user_queries() as queries:
+        assert _list(client, auth).status_code == 200
+    assert len(queries) == 1
+
+
+def test_deleted_user_is_rejected_immediately(client, auth):
+    assert _list(client, auth).status_code == 200
+    db = SessionLocal()
+    try:
+        db.delete(db.get(models.User, _user_id(auth)))
+        db.commit()
+    finally:
+        db.close()
+
+    r = _list(client, auth)
+    assert r.status_code == 401
+    assert r.json()["detail"] == "User not found"
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app import main, metrics, profiling
+
+
+def _spin(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def _unrelated_work(stop: threading.Event):
+    while not stop.is_set():
+        _spin(0.001)
+
+
+def _profiled_app(directory):
+    router = APIRouter(route_class=profiling.ProfiledRoute)
+
+    @router.get("/slow")
+    def slow_endpoint():
+        _spin(0.2)
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+    profiler = profiling.SlowRequestProfiler(slow_ms=50, sample_rate=1, interval_ms=2, directory=str(directory))
+    app.add_middleware(metrics.MetricsMiddleware, profiler=profiler)
+    return app
+
+
+def test_profile_only_samples_the_request_thread(tmp_path):
+    stop = threading.Event()
+    other = threading.Thread(target=_unrelated_work, args=(stop,), daemon=True)
+    other.start()
+    try:
+        with TestClient(_profiled_app(tmp_path)) as c:
+            assert c.get("/slow").status_code == 200
+    finally:
+        stop.set()
+        other.join()
+
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and files[0].endswith("-GET-slow.txt")
+    profile = (tmp_path / files[0]).read_text()
+    assert "slow_endpoint (test_profiling.py" in profile
+    assert "_unrelated_work" not in profile
+
+
+def test_fast_requests_are_discarded(tmp_path):
+    app = _profiled_app(tmp_path)
+    with TestClient(app) as c:
+        assert c.get("/missing").status_code == 404
+    assert os.listdir(tmp_path) == []
+
+
+def test_metrics_off_without_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", None)
+    monkeypatch.setattr(main, "METRICS_PUBLIC", False)
+    assert client.get("/api/metrics").status_code == 404
+
+    monkeypatch.setattr(main, "METRICS_PUBLIC", True)
+    assert client.get("/api/metrics").status_code == 200
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "secret")
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    r = client.get("/api/metrics", headers={"Authorization": "Bearer secret"})
+    assert r.status_code == 200
+    assert "http_requests_total" in r.text
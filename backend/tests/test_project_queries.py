@@ -0,0 +1,99 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@contextmanager
+def recorded_queries():
+    """SQL statements run against the projects/sections tables while the block runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Background threads (job leases) also query; only count what the API reads
+        if "projects" in statement or "sections" in statement:
+            statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+
+def _user_with_projects(client, count: int, sections: int = 3):
+    r = client.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex}@example.com", "password": "pw"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    for n in range(count):
+        body = {
+            "title": f"P{n}",
+            "doc_type": "docx",
+            "outline": [{"title": f"S{i}", "order": i} for i in range(sections)],
+        }
+        assert client.post("/api/projects/", json=body, headers=headers).status_code == 200
+    # Warm the principal cache so auth lookups don't count
+    client.get("/api/projects/summary", headers=headers)
+    return headers
+
+
+def _count(client, url, headers):
+    with recorded_queries() as statements:
+        r = client.get(url, headers=headers)
+    assert r.status_code == 200, r.text
+    return statements, r.json()
+
+
+@pytest.mark.parametrize("url", ["/api/projects/summary", "/api/projects/"])
+def test_listing_query_count_is_constant(client, url):
+    few, _ = _count(client, url, _user_with_projects(client, 2))
+    many, body = _count(client, url, _user_with_projects(client, 8))
+    assert len(few) == len(many)
+    assert len(many) <= 3
+
+
+def test_summary_loads_no_sections(client):
+    statements, body = _count(client, "/api/projects/summary", _user_with_projects(client, 4))
+    assert [item["section_count"] for item in body["items"]] == [3, 3, 3, 3]
+    # Sections are only counted in a subquery; their rows and content are never selected
+    assert not any("sections.content" in s for s in statements)
+
+
+def test_get_project_query_count_is_constant(client):
+    headers = _user_with_projects(client, 0)
+    counts = []
+    for sections in (1, 12):
+        body = {
+            "title": "P",
+            "doc_type": "pptx",
+            "outline": [{"title": f"S{i}", "order": i} for i in range(sections)],
+        }
+        project_id = client.post("/api/projects/", json=body, headers=headers).json()["id"]
+        statements, project = _count(client, f"/api/projects/{project_id}", headers)
+        assert len(project["sections"]) == sections
+        counts.append(len(statements))
+    assert counts[0] == counts[1] <= 3
+
+
+def test_summary_cursor_round_trip(client):
+    headers = _user_with_projects(client, 5)
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = "/api/projects/summary?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=headers).json()
+        seen += [item["title"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert pages == 3
+    assert sorted(seen) == [f"P{n}" for n in range(5)]
+    # Newest first
+    assert seen == [f"P{n}" for n in reversed(range(5))]
+
+
+def test_invalid_cursor_is_400(client, auth):
+    assert client.get("/api/projects/summary?cursor=not-a-cursor", headers=auth).status_code == 400
@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import llm_client, scheduler
+
+
+class _Probe:
+    """Counts calls running inside a slot at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def call(self, sched, user, seconds=0.05, cost=1):
+        with sched.slot(user, cost):
+            with self._lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(seconds)
+            with self._lock:
+                self.running -= 1
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_lone_user_gets_every_slot():
+    # The per-user quota (half the limit) must not leave slots idle when nobody else waits
+    sched = scheduler.Scheduler("test", concurrency=4)
+    assert sched.user_concurrency == 2
+    probe = _Probe()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: probe.call(sched, "alice", 0.1), range(8)))
+    assert probe.peak == 4
+
+
+def test_quota_applies_while_others_wait():
+    sched = scheduler.Scheduler("test", concurrency=2, user_concurrency=1)
+    granted = []
+    releases = {}
+
+    def call(user, name):
+        release = releases[name] = threading.Event()
+        with sched.slot(user, 1):
+            granted.append(name)
+            release.wait(5)
+
+    threads = []
+
+    def start(user, name):
+        t = threading.Thread(target=call, args=(user, name))
+        t.start()
+        threads.append(t)
+
+    # alice borrows both slots while she is alone
+    start("alice", "a1")
+    start("alice", "a2")
+    _wait_for(lambda: len(granted) == 2)
+    start("alice", "a3")
+    _wait_for(lambda: sched.stats()["waiting"] == 1)
+    start("bob", "b1")
+    _wait_for(lambda: sched.stats()["waiting"] == 2)
+
+    # The freed slot goes to bob, who is within his quota, not to alice's next call
+    releases["a1"].set()
+    _wait_for(lambda: len(granted) == 3)
+    assert granted[2] == "b1"
+
+    for name in ("a2", "b1"):
+        releases[name].set()
+    _wait_for(lambda: len(granted) == 4)
+    releases["a3"].set()
+    for t in threads:
+        t.join()
+    assert sched.stats() == {"in_flight": 0, "waiting": 0, "users_waiting": 0}
+
+
+def test_rate_limit_delays_calls():
+    sched = scheduler.Scheduler("test", concurrency=4, rpm=120)  # 2 per second once the burst is used
+    sched._requests.level = 0
+    start = time.monotonic()
+    with sched.slot("alice", 1):
+        pass
+    assert time.monotonic() - start >= 0.4
+
+
+def test_token_bucket():
+    bucket = scheduler._Bucket(60)
+    now = bucket.updated
+    assert bucket.wait_for(60, now) == 0
+    bucket.take(60)
+    assert bucket.wait_for(1, now) == pytest.approx(1.0)
+    assert bucket.wait_for(1, now + 1) == pytest.approx(0.0)
+    # Larger than a minute's allowance waits for a full bucket, not forever
+    assert bucket.wait_for(1000, now + 1) == pytest.approx(59.0)
+
+
+def test_queue_full():
+    sched = scheduler.Scheduler("test", concurrency=1, user_max_queue=1, max_queue=2)
+    release = threading.Event()
+
+    def hold(user):
+        with sched.slot(user, 1):
+            release.wait(5)
+
+    threads = [threading.Thread(target=hold, args=(user,)) for user in ("alice", "alice", "bob")]
+    threads[0].start()
+    _wait_for(lambda: sched.stats()["in_flight"] == 1)
+    threads[1].start()
+    _wait_for(lambda: sched.stats()["waiting"] == 1)
+
+    with pytest.raises(scheduler.QueueFull, match="this account"):
+        sched.check("alice")
+    sched.check("bob")
+    threads[2].start()
+    _wait_for(lambda: sched.stats()["waiting"] == 2)
+    with pytest.raises(scheduler.QueueFull, match="busy") as exc:
+        sched.check("carol")
+    assert exc.value.retry_after >= 1
+
+    release.set()
+    for t in threads:
+        t.join()
+
+
+def test_image_calls_take_provider_slots(monkeypatch):
+    sched = scheduler.Scheduler("stub", concurrency=1)
+    monkeypatch.setitem(llm_client._schedulers, "stub", sched)
+    probe = _Probe()
+    real = llm_client._stub_image
+
+    def stub_image(prompt):
+        with probe._lock:
+            probe.running += 1
+            probe.peak = max(probe.peak, probe.running)
+        time.sleep(0.05)
+        with probe._lock:
+            probe.running -= 1
+        return real(prompt)
+
+    monkeypatch.setattr(llm_client, "_stub_image", stub_image)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda i: llm_client.generate_image(f"image {i}", user="alice"), range(3)))
+    assert all(results)
+    assert probe.peak == 1
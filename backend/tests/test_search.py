@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+from app import llm_client, search
+from app.database import engine
+
+
+def _generate_with(client, auth, project, text, monkeypatch):
+    monkeypatch.setattr(llm_client, "_call_provider", lambda prompt, max_tokens, temperature: text)
+    assert client.post(f"/api/projects/{project['id']}/generate?use_cache=false", headers=auth).status_code == 200
+
+
+def test_search_finds_generated_content(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1)
+    _generate_with(client, auth, project, "Golden retrievers are friendly", monkeypatch)
+    hits = client.get("/api/projects/search?q=retriever", headers=auth).json()["items"]
+    assert [h["project_id"] for h in hits] == [project["id"]]
+    assert "<mark>retrievers</mark>" in hits[0]["snippet"]
+
+
+def test_snippets_escape_content(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1)
+    _generate_with(client, auth, project, '<script>alert(1)</script> <img src=x onerror=y> Puppies  play', monkeypatch)
+    snippet = client.get("/api/projects/search?q=puppies", headers=auth).json()["items"][0]["snippet"]
+    assert "<script>" not in snippet and "<img" not in snippet
+    assert "&lt;script&gt;" in snippet
+    assert snippet.count("<mark>") == snippet.count("</mark>") == 1
+
+
+def test_title_only_matches_are_escaped(client, auth, make_project):
+    make_project(sections=0, title="<b>Quarterly</b> plan")
+    snippet = client.get("/api/projects/search?q=quarterly", headers=auth).json()["items"][0]["snippet"]
+    assert snippet == "&lt;b&gt;<mark>Quarterly</mark>&lt;/b&gt; plan"
+
+
+def test_search_is_scoped_to_owner(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1)
+    _generate_with(client, auth, project, "Zebras everywhere", monkeypatch)
+    other = client.post("/api/auth/register", json={"email": "search-other@example.com", "password": "pw"}).json()
+    headers = {"Authorization": f"Bearer {other['access_token']}"}
+    assert client.get("/api/projects/search?q=zebras", headers=headers).json()["items"] == []
+
+
+def test_detect_enables_existing_index(client, monkeypatch):
+    monkeypatch.setattr(search, "_enabled", False)
+    with engine.connect() as conn:
+        assert search.detect(conn)
+    assert search._enabled
+
+
+def test_ensure_index_rebuilds_after_drift(client, auth, make_project, monkeypatch):
+    project = make_project(sections=1)
+    _generate_with(client, auth, project, "Axolotls regrow limbs", monkeypatch)
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {search.TABLE} WHERE project_id = :p"), {"p": project["id"]})
+    assert client.get("/api/projects/search?q=axolotls", headers=auth).json()["items"] == []
+
+    with engine.begin() as conn:
+        assert search.ensure_index(conn)
+    hits = client.get("/api/projects/search?q=axolotls", headers=auth).json()["items"]
+    assert [h["project_id"] for h in hits] == [project["id"]]
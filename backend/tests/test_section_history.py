@@ -0,0 +1,74 @@
+import datetime
+import uuid
+
+from app import models
+from app.database import SessionLocal
+
+
+def _pages(client, auth, url, limit=2):
+    items, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        r = client.get(url, params=params, headers=auth)
+        assert r.status_code == 200
+        body = r.json()
+        assert len(body["items"]) <= limit
+        items += body["items"]
+        pages += 1
+        cursor = body["next_cursor"]
+        if not cursor:
+            return items, pages
+
+
+def _first_section(client, auth, project_id):
+    return client.get(f"/api/projects/{project_id}", headers=auth).json()["sections"][0]["id"]
+
+
+def test_revisions_page_newest_first(client, auth, make_project):
+    project_id = make_project(sections=1)["id"]
+    section_id = _first_section(client, auth, project_id)
+    base = f"/api/projects/{project_id}/sections/{section_id}"
+    assert client.post(f"/api/projects/{project_id}/generate", headers=auth).status_code == 200
+
+    # Migrated revisions all share one timestamp; the id breaks the tie
+    same_time = datetime.datetime(2024, 1, 1)
+    db = SessionLocal()
+    try:
+        db.add_all(models.SectionRevision(section_id=section_id, instruction=f"old {n}", result="", created_at=same_time)
+                   for n in range(3))
+        db.commit()
+    finally:
+        db.close()
+    for n in range(2):
+        r = client.post(f"{base}/refine", json={"instruction": f"new {n}"}, headers=auth)
+        assert r.status_code == 200
+
+    items, pages = _pages(client, auth, f"{base}/revisions")
+    assert [i["instruction"] for i in items] == ["new 1", "new 0", "old 2", "old 1", "old 0"]
+    assert pages == 3
+
+
+def test_comments_page_newest_first(client, auth, make_project):
+    project_id = make_project(sections=1)["id"]
+    section_id = _first_section(client, auth, project_id)
+    base = f"/api/projects/{project_id}/sections/{section_id}"
+    for n in range(4):
+        r = client.post(f"{base}/feedback", json={"action": "like", "comment": f"note {n}"}, headers=auth)
+        assert r.status_code == 200
+
+    items, pages = _pages(client, auth, f"{base}/comments", limit=3)
+    assert [i["comment"] for i in items] == ["note 3", "note 2", "note 1", "note 0"]
+    assert pages == 2
+
+
+def test_history_is_private_and_checks_the_cursor(client, auth, make_project):
+    project_id = make_project(sections=1)["id"]
+    section_id = _first_section(client, auth, project_id)
+    url = f"/api/projects/{project_id}/sections/{section_id}/comments"
+
+    r = client.get(url, params={"cursor": "not-a-cursor"}, headers=auth)
+    assert r.status_code == 400
+
+    other = client.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex}@example.com", "password": "pw"}).json()
+    r = client.get(url, headers={"Authorization": f"Bearer {other['access_token']}"})
+    assert r.status_code == 404
@@ -0,0 +1,147 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import export_cache, llm_client, metrics, models, singleflight
+from app.database import SessionLocal
+
+
+def _shared(group: singleflight.Group) -> float:
+    return metrics.singleflight_calls._values.get((group.name, "shared"), 0)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _run_with_followers(group, fn, followers=4):
+    """Start a leader running fn, then `followers` callers for the same key, then let fn finish."""
+    release = threading.Event()
+
+    def work():
+        release.wait()
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=followers + 1) as pool:
+        futures = [pool.submit(group.do, "key", work)]
+        _wait_for(lambda: group.in_flight() == 1)
+        futures += [pool.submit(group.do, "key", work) for _ in range(followers)]
+        _wait_for(lambda: _shared(group) == followers)
+        release.set()
+        return futures
+
+
+def test_concurrent_callers_share_one_execution():
+    group = singleflight.Group(f"test-{uuid.uuid4().hex}")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return object()
+
+    futures = _run_with_followers(group, fn)
+    results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert group.in_flight() == 0
+
+
+def test_exception_is_shared():
+    group = singleflight.Group(f"test-{uuid.uuid4().hex}")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise ValueError("boom")
+
+    futures = _run_with_followers(group, fn)
+    errors = []
+    for f in futures:
+        with pytest.raises(ValueError) as exc:
+            f.result()
+        errors.append(exc.value)
+    assert len(calls) == 1
+    assert all(e is errors[0] for e in errors)
+    assert group.in_flight() == 0
+
+
+def test_nothing_is_remembered_afterwards():
+    group = singleflight.Group(f"test-{uuid.uuid4().hex}")
+    calls = []
+    assert group.do("key", lambda: calls.append(1) or len(calls)) == 1
+    assert group.do("key", lambda: calls.append(1) or len(calls)) == 2
+
+
+def test_identical_llm_calls_coalesce(monkeypatch):
+    calls = []
+
+    def provider(prompt, max_tokens, temperature):
+        calls.append(prompt)
+        time.sleep(0.3)
+        return "shared answer"
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    prompt = f"coalesce {uuid.uuid4().hex}"
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: llm_client.call_llm(prompt, use_cache=False), range(4)))
+    assert results == ["shared answer"] * 4
+    assert calls == [prompt]
+
+
+def test_concurrent_exports_render_once(make_project, monkeypatch):
+    project_id = make_project(sections=2)["id"]
+    real = export_cache.iter_export
+    renders = []
+
+    def slow_iter_export(*args, **kwargs):
+        renders.append(1)
+        time.sleep(0.3)
+        yield from real(*args, **kwargs)
+
+    monkeypatch.setattr(export_cache, "iter_export", slow_iter_export)
+    db = SessionLocal()
+    try:
+        project = db.get(models.Project, project_id)
+        sections = list(project.sections)
+        start = threading.Barrier(4)
+
+        def export(_):
+            start.wait()
+            return export_cache.render(project, sections)[0]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            paths = list(pool.map(export, range(4)))
+    finally:
+        db.close()
+    assert len(renders) == 1
+    assert len(set(paths)) == 1
+
+
+def test_cached_and_bypass_calls_do_not_share_a_flight(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def provider(prompt, max_tokens, temperature):
+        calls.append(prompt)
+        n = len(calls)
+        release.wait(5)
+        return f"answer {n}"
+
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    prompt = f"bypass {uuid.uuid4().hex}"
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        cached = pool.submit(llm_client.call_llm, prompt)
+        _wait_for(lambda: len(calls) == 1)
+        fresh = pool.submit(llm_client.call_llm, prompt, use_cache=False)
+        # The bypass caller makes its own provider call instead of waiting on the cached one
+        _wait_for(lambda: len(calls) == 2)
+        release.set()
+        assert {cached.result(), fresh.result()} == {"answer 1", "answer 2"}
+    # The cached caller's answer is what got stored
+    assert llm_client.call_llm(prompt) == cached.result()
@@ -0,0 +1,75 @@
+import json
+
+from app import llm_client
+
+
+def _events(body: str):
+    """(name, data) for each event in an SSE body, skipping comments."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def _stream_token(client, auth):
+    r = client.post("/api/auth/stream-token", headers=auth)
+    assert r.status_code == 200
+    return r.json()["access_token"]
+
+
+def test_generate_stream_event_order(client, auth, make_project, monkeypatch):
+    monkeypatch.setattr(llm_client, "MOCK_LATENCY_MS", 20)
+    project = make_project(sections=3)
+    r = client.get(f"/api/projects/{project['id']}/generate/stream?use_cache=false", headers=auth)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(r.text)
+    names = [name for name, _ in events]
+    assert names == ["start"] + ["section", "progress"] * 3 + ["done"]
+    assert events[0][1] == {"project_id": project["id"], "total": 3, "skipped": 0}
+    assert [data["done"] for name, data in events if name == "progress"] == [1, 2, 3]
+    assert sorted(data["title"] for name, data in events if name == "section") == ["S0", "S1", "S2"]
+    assert events[-1][1] == {"status": "ok", "generated": 3, "errors": 0}
+
+
+def test_generate_stream_reports_failed_sections(client, auth, make_project, monkeypatch):
+    real = llm_client._call_provider
+
+    def provider(prompt, max_tokens, temperature):
+        if "titled 'S1'" in prompt:
+            raise RuntimeError("provider down")
+        return real(prompt, max_tokens, temperature)
+
+    monkeypatch.setattr(llm_client, "MOCK_LATENCY_MS", 20)
+    monkeypatch.setattr(llm_client, "_call_provider", provider)
+    project = make_project(sections=3)
+    events = _events(client.get(f"/api/projects/{project['id']}/generate/stream?use_cache=false", headers=auth).text)
+
+    errors = [data for name, data in events if name == "error"]
+    assert [(e["title"], e["error"]) for e in errors] == [("S1", "provider down")]
+    assert [name for name, _ in events].count("section") == 2
+    assert [data["errors"] for name, data in events if name == "progress"][-1] == 1
+    assert events[-1] == ("done", {"status": "partial", "generated": 2, "errors": 1})
+
+
+def test_stream_query_token_must_be_a_stream_token(client, auth, make_project):
+    project = make_project(sections=1)
+    url = f"/api/projects/{project['id']}/generate/stream"
+    login_token = auth["Authorization"].split()[1]
+    assert client.get(url, params={"access_token": login_token}).status_code == 401
+
+    stream_token = _stream_token(client, auth)
+    r = client.get(url, params={"access_token": stream_token})
+    assert r.status_code == 200
+    assert _events(r.text)[-1][0] == "done"
+
+
+def test_stream_token_is_not_a_login_token(client, auth, make_project):
+    project = make_project(sections=1)
+    stream_token = _stream_token(client, auth)
+    assert client.get(f"/api/projects/{project['id']}", headers={"Authorization": f"Bearer {stream_token}"}).status_code == 401
+    # Only event streams take a token from the URL
+    assert client.get(f"/api/projects/{project['id']}", params={"access_token": stream_token}).status_code == 401
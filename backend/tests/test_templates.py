@@ -0,0 +1,84 @@
+import io
+import os
+import zipfile
+
+import pytest
+from pptx import Presentation
+
+from app import templates
+
+
+def _brand_template(name: str, keep: str):
+    """A .pptx brand template with only the named slide layout."""
+    prs = Presentation()
+    for layout in list(prs.slide_layouts):
+        if layout.name != keep:
+            prs.slide_layouts.remove(layout)
+    os.makedirs(templates.TEMPLATE_DIR, exist_ok=True)
+    prs.save(os.path.join(templates.TEMPLATE_DIR, f"{name}.pptx"))
+
+
+@pytest.mark.parametrize("name,layout", [("title_only", "Title Only"), ("blank_only", "Blank")])
+def test_pptx_export_with_sparse_brand_template(client, auth, make_project, name, layout):
+    _brand_template(name, layout)
+    project = make_project(sections=2)
+    client.post(f"/api/projects/{project['id']}/generate", headers=auth)
+
+    r = client.get(f"/api/export/{project['id']}?template={name}", headers=auth)
+    assert r.status_code == 200, r.text
+    slides = list(Presentation(io.BytesIO(r.content)).slides)
+    assert len(slides) == 3
+    text = " ".join(shape.text_frame.text for shape in slides[1].shapes if shape.has_text_frame)
+    assert "S0" in text
+    assert "MOCK LLM RESPONSE" in text
+
+
+def test_unknown_template_is_404(client, auth, make_project):
+    project = make_project(sections=1)
+    r = client.get(f"/api/export/{project['id']}?template=missing", headers=auth)
+    assert r.status_code == 404
+
+
+def test_edited_template_is_reloaded(client, auth, make_project):
+    name = "edited"
+    _brand_template(name, "Title Only")
+    before = templates.fingerprint("pptx", name)
+    assert [l.name for l in templates.presentation(name).slide_layouts] == ["Title Only"]
+
+    project = make_project(sections=1)
+    client.post(f"/api/projects/{project['id']}/generate", headers=auth)
+    first = client.get(f"/api/export/{project['id']}?template={name}", headers=auth)
+    assert first.status_code == 200
+
+    _brand_template(name, "Blank")
+    path = os.path.join(templates.TEMPLATE_DIR, f"{name}.pptx")
+    # Make sure the new file's mtime differs even on coarse-grained filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+    assert templates.fingerprint("pptx", name) != before
+    assert [l.name for l in templates.presentation(name).slide_layouts] == ["Blank"]
+    second = client.get(f"/api/export/{project['id']}?template={name}", headers=auth)
+    assert second.status_code == 200
+    assert second.content != first.content
+    layouts = [l.name for l in Presentation(io.BytesIO(second.content)).slide_layouts]
+    assert layouts == ["Blank"]
+
+
+@pytest.mark.parametrize("kind", ["docx", "pptx"])
+def test_fingerprint_ignores_zip_timestamps(kind, monkeypatch):
+    # Another process (or this one after a restart) must compute the same export cache key
+    real_writestr = zipfile.ZipFile.writestr
+    date_time = None
+
+    def writestr(self, zinfo_or_arcname, data, *args, **kwargs):
+        if isinstance(zinfo_or_arcname, str):
+            zinfo_or_arcname = zipfile.ZipInfo(zinfo_or_arcname, date_time=date_time)
+        return real_writestr(self, zinfo_or_arcname, data, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "writestr", writestr)
+    builds = []
+    for date_time in ((2020, 1, 1, 0, 0, 0), (2021, 6, 1, 12, 0, 0)):
+        builds.append(templates._build(kind, None))
+    assert builds[0][1] != builds[1][1]
+    assert builds[0][2] == builds[1][2]
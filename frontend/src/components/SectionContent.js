@@ -0,0 +1,48 @@
+import React from "react";
+
+// Renders the light markdown sections are stored in (see backend/app/blocks.py):
+// "# " headings, "- " bullets (indented = nested), "1. " items, **bold**, *italic*.
+// The patterns are copies of the ones in blocks.py, which backend/tests/test_blocks.py
+// checks; change both together. (JS \w is ASCII-only, Python's is Unicode.)
+const HEADING = /^(#{1,6})\s+(.*?)(?:\s+#+)?$/;
+const BULLET = /^[-*•+]\s+(.*)$/;
+const NUMBER = /^(\d{1,3})[.)]\s+(.*)$/;
+const EMPHASIS = /(?<![\w*])\*\*\*(?=\S)(.+?)(?<=\S)\*\*\*(?![\w*])|(?<![\w*])\*\*(?=\S)(.+?)(?<=\S)\*\*(?![\w*])|(?<![\w*])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![\w*])/g;
+const TAB_SIZE = 4;
+
+function inline(text) {
+  const out = [];
+  let pos = 0;
+  for (const m of text.matchAll(EMPHASIS)) {
+    if (m.index > pos) out.push(text.slice(pos, m.index));
+    if (m[1] !== undefined) out.push(<strong key={m.index}><em>{m[1]}</em></strong>);
+    else if (m[2] !== undefined) out.push(<strong key={m.index}>{m[2]}</strong>);
+    else out.push(<em key={m.index}>{m[3]}</em>);
+    pos = m.index + m[0].length;
+  }
+  if (pos < text.length) out.push(text.slice(pos));
+  return out;
+}
+
+export default function SectionContent({ text }) {
+  const lines = (text || "").split("\n");
+  return (
+    <div className="editor-content">
+      {lines.map((raw, i) => {
+        const line = raw.trim();
+        if (!line) return null;
+        let m = line.match(HEADING);
+        if (m) return <h4 key={i} className="content-heading">{inline(m[2])}</h4>;
+        m = line.match(BULLET);
+        if (m) {
+          const indent = raw.slice(0, raw.length - raw.trimStart().length).replace(/\t/g, " ".repeat(TAB_SIZE));
+          const nested = indent.length >= 2;
+          return <div key={i} className={nested ? "content-bullet nested" : "content-bullet"}>• {inline(m[1])}</div>;
+        }
+        m = line.match(NUMBER);
+        if (m) return <div key={i} className="content-bullet">{m[1]}. {inline(m[2])}</div>;
+        return <p key={i} className="content-paragraph">{inline(line)}</p>;
+      })}
+    </div>
+  );
+}
@@ -4,16 +4,18 @@ import { api } from "../api";
 
 export default function Dashboard() {
   const [projects, setProjects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const navigate = useNavigate();
 
-  const loadProjects = async () => {
+  const loadProjects = async (cursor = null) => {
     setLoading(true);
     setError("");
     try {
-      const res = await api.get("/projects");
-      setProjects(res.data);
+      const res = await api.get("/projects/summary", { params: { limit: 20, cursor } });
+      setProjects((prev) => (cursor ? [...prev, ...res.data.items] : res.data.items));
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       console.error(err);
       setError(err.response?.data?.detail || "Failed to load projects");
@@ -88,6 +90,12 @@ export default function Dashboard() {
             </div>
           ))}
         </div>
+
+        {nextCursor && !loading && (
+          <button className="btn btn-ghost btn-sm" onClick={() => loadProjects(nextCursor)}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
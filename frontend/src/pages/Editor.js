@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import { api } from "../api";
+import SectionContent from "../components/SectionContent";
 
 export default function Editor() {
   const { id } = useParams();
@@ -114,7 +115,7 @@ export default function Editor() {
           {project.sections.map((s, i) => (
             <div key={s.id} id={`section-${s.id}`} className="editor-section">
               <h3 className="editor-section-title">{i + 1}. {s.title}</h3>
-              <pre className="editor-content">{s.content}</pre>
+              <SectionContent text={s.content} />
 
               {/* Feedback + refine UI */}
               <div className="interaction-panel">